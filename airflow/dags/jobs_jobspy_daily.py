@@ -39,4 +39,11 @@ with DAG(
         bash_command="curl -X POST 'http://api:8000/match/run?job_title=Data%20Engineer'"
     )
 
+    # scores stored candidates against the jobs ingested since their last run only
+    delta_rematch = BashOperator(
+        task_id="delta_rematch",
+        bash_command="curl -fsS -X POST 'http://api:8000/match/delta'"
+    )
+
     collect >> normalize >> match_demo
+    normalize >> delta_rematch
@@ -0,0 +1,296 @@
+import os
+import re
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+from bson import ObjectId
+from fastapi.concurrency import run_in_threadpool
+
+from app.db import (
+    RefreshWatermark, get_candidates_version, iter_candidates, iter_jobs, load_job_matches, save_job_matches,
+)
+from app.llm.matcher_openrouter import rank_candidates_for_job, MODEL as MATCH_MODEL, SHARD_CONCURRENCY
+from app.metrics import log_event, span
+from app.near_dup import one_per_cluster
+from app.retrieval import HashedBM25Index, candidate_text, job_text
+from app.skill_index import SkillIndex, COMPACT_RATIO, NICE_WEIGHT
+from app.skills import canonicalize_skills, enrich_job
+
+# Share of the skill overlap in the local score (the rest is BM25 text similarity)
+SKILL_WEIGHT = float(os.getenv("CANDIDATE_SKILL_WEIGHT", "0.7"))
+# Candidates kept by each local signal before the combined score is computed
+CANDIDATE_PREFILTER_N = int(os.getenv("CANDIDATE_PREFILTER_N", "200"))
+# Jobs matching a title that GET /match ranks candidates for
+MATCH_TITLE_JOBS = int(os.getenv("MATCH_TITLE_JOBS", "5"))
+
+CANDIDATE_PROJECTION = {
+    "full_name": 1, "skills_detected": 1, "skills": 1, "summary": 1, "experiences": 1, "updated_at": 1,
+}
+RERANK_PROJECTION = {"full_name": 1, "skills_detected": 1, "skills": 1, "summary": 1, "experiences": 1}
+JOB_PROJECTION = {
+    "title": 1, "company": 1, "url": 1, "description_text": 1, "skills_required": 1, "skills_nice": 1,
+    "seniority": 1, "digest": 1, "dup_cluster": 1,
+}
+
+
+def candidate_skills(candidate: dict):
+    return canonicalize_skills(candidate.get("skills_detected") or candidate.get("skills") or [])
+
+
+class CandidateIndex:
+    """
+    Precomputed candidate features for reverse matching (job → candidates),
+    row-aligned: canonical skills (a SkillIndex where every skill is
+    "required") and hashed BM25 text. A job is scored against a candidate as
+
+        SKILL_WEIGHT · share of the job's weighted skills the candidate has
+        + (1 - SKILL_WEIGHT) · BM25 of the job text, relative to the best hit
+    """
+
+    def __init__(self, skill_weight: float = SKILL_WEIGHT):
+        self.skill_weight = skill_weight
+        # rows stay aligned with names/skill_sets: no compaction (the
+        # whole index is rebuilt instead, see get_candidate_index)
+        self.skills = SkillIndex(compact_ratio=0)
+        self.text = HashedBM25Index(compact_ratio=0)
+        self.rows = {}
+        self.names = []
+        self.skill_sets = []
+        self.updated = {}   # candidate_id -> updated_at of its indexed version
+        self.retired = 0    # rows replaced by a newer version of their candidate
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, candidate_id: str, candidate: dict):
+        """
+        Index a candidate. Re-adding a known id is a no-op unless its
+        `updated_at` changed (re-saved by a retried CV job): the new version
+        gets a new row and the old one is retired.
+        """
+        skills = candidate_skills(candidate)
+        with self._lock:
+            if candidate_id in self.rows:
+                if self.updated.get(candidate_id) == candidate.get("updated_at"):
+                    return
+                self.retired += 1
+            self.updated[candidate_id] = candidate.get("updated_at")
+            self.rows[candidate_id] = len(self.names)
+            self.names.append(candidate.get("full_name") or "")
+            self.skill_sets.append({s.lower() for s in skills})
+            # both sub-indexes get the same row: added under the same lock
+            self.skills.add(candidate_id, skills)
+            self.text.add(candidate_id, candidate_text(SimpleNamespace(**candidate)))
+
+    def search(self, job: dict, top_k: int = 10, prefilter_n: int = CANDIDATE_PREFILTER_N):
+        """Top `top_k` candidates for `job`, best first, as result dicts."""
+        required = canonicalize_skills(job.get("skills_required") or [])
+        nice = [s for s in canonicalize_skills(job.get("skills_nice") or []) if s not in required]
+        with self._lock:
+            n_docs = len(self.names)
+            if not n_docs:
+                return []
+
+            total = len(required) + NICE_WEIGHT * len(nice)
+            skill_score = np.zeros(n_docs, dtype=np.float32)
+            if total:
+                skill_score += self.skills.counts(required)
+                skill_score += NICE_WEIGHT * self.skills.counts(nice)
+                skill_score /= total
+
+            text_score = np.zeros(n_docs, dtype=np.float32)
+            hits = self.text.search(job_text(job), top_n=prefilter_n)
+            if hits:
+                best = hits[0][1]
+                for candidate_id, score in hits:
+                    text_score[self.rows[candidate_id]] = score / best
+
+            # shortlist: best rows of each signal, then the combined score
+            n = min(prefilter_n, n_docs)
+            shortlist = np.union1d(
+                np.argpartition(skill_score, n_docs - n)[n_docs - n:],
+                np.fromiter((self.rows[c] for c, _ in hits), dtype=np.int64, count=len(hits)),
+            )
+            combined = self.skill_weight * skill_score[shortlist] + (1 - self.skill_weight) * text_score[shortlist]
+            order = np.lexsort((shortlist, -combined))[:top_k]
+
+            wanted = {s.lower(): s for s in required + nice}
+            results = []
+            for i in order:
+                row = int(shortlist[i])
+                if combined[i] <= 0:
+                    continue
+                results.append({
+                    "candidate_id": self.skills.doc_ids[row],
+                    "full_name": self.names[row],
+                    "score": round(float(combined[i]), 4),
+                    "skill_score": round(float(skill_score[row]), 4),
+                    "text_score": round(float(text_score[row]), 4),
+                    "matched_skills": [wanted[k] for k in wanted if k in self.skill_sets[row]],
+                })
+            return results
+
+
+# ============================
+# CANDIDATES INDEX (whole collection)
+# ============================
+_candidate_index = None
+_candidate_index_watermark = None
+_candidate_index_lock = threading.Lock()
+
+
+def get_candidate_index() -> CandidateIndex:
+    """
+    Candidate index over the whole `candidates` collection. Built once,
+    then refreshed with candidates saved or re-saved (updated_at) since the
+    last refresh; rebuilt from Mongo once retired rows exceed COMPACT_RATIO.
+    """
+    global _candidate_index, _candidate_index_watermark
+    with _candidate_index_lock:
+        index = _candidate_index
+        if index is None or (COMPACT_RATIO and index.retired > COMPACT_RATIO * len(index.names)):
+            _candidate_index = CandidateIndex()
+            _candidate_index_watermark = RefreshWatermark("updated_at")
+        watermark = _candidate_index_watermark
+        for candidate in iter_candidates(watermark.query(), projection=CANDIDATE_PROJECTION, sort=watermark.sort()):
+            if not watermark.seen(candidate):
+                _candidate_index.add(str(candidate["_id"]), candidate)
+        return _candidate_index
+
+
+def index_candidates(saved):
+    """
+    Add just-saved candidates [(candidate_id, cv_data)] to the index when it
+    is loaded; otherwise they are read from Mongo when it is first built.
+    Tokenizes under the index lock: call it from a worker thread.
+    """
+    if _candidate_index is None:
+        return
+    for candidate_id, cv_data in saved:
+        _candidate_index.add(candidate_id, cv_data)
+
+
+# ============================
+# REVERSE MATCHING (job title → candidates)
+# ============================
+def ranker_key(rerank: bool) -> str:
+    return f"local+{MATCH_MODEL}" if rerank else "local"
+
+
+def find_jobs_by_title(job_title: str, limit: int = None):
+    """Jobs whose title contains `job_title` (case-insensitive), newest first, enriched with skills."""
+    query = {"title": {"$regex": re.escape(job_title.strip()), "$options": "i"}}
+    cursor = iter_jobs(query, projection=JOB_PROJECTION, sort=[("ingested_at", -1)])
+    if limit:
+        cursor = cursor.limit(limit)
+    return [enrich_job(job) for job in cursor]
+
+
+async def rerank_candidates(job: dict, ranked: list) -> list:
+    """
+    Reorder the local top-k with one LLM prompt. Candidates the LLM did not
+    score keep their local order after the scored ones; on failure the
+    local ranking is returned unchanged.
+    """
+    if not ranked:
+        return ranked
+    ids = [r["candidate_id"] for r in ranked]
+    docs = await run_in_threadpool(
+        lambda: {str(d["_id"]): d for d in iter_candidates(
+            {"_id": {"$in": [ObjectId(i) for i in ids]}}, projection=RERANK_PROJECTION
+        )}
+    )
+    try:
+        scores = await rank_candidates_for_job(job, [docs.get(i, {}) for i in ids])
+    except Exception as e:
+        log_event("candidate_rerank_error", sample=False, error=f"{type(e).__name__}: {e}"[:200], candidates=len(ids))
+        scores = None
+    if not scores:
+        return ranked
+
+    llm = dict(scores)
+    for i, r in enumerate(ranked):
+        if i in llm:
+            r["llm_score"] = llm[i]
+    return sorted(ranked, key=lambda r: ("llm_score" not in r, -r.get("llm_score", 0.0)))
+
+
+def _job_summary(job: dict) -> dict:
+    return {"job_id": str(job["_id"]), "title": job.get("title"), "company": job.get("company"), "url": job.get("url")}
+
+
+async def match_title(job_title: str, k: int = 10, rerank: bool = False, max_jobs: int = MATCH_TITLE_JOBS):
+    """
+    Top `k` candidates for the newest jobs matching `job_title` (one per
+    near-duplicate cluster). Results materialized by run_title_matches are
+    served while no candidate was saved since they were computed.
+    """
+    version = await run_in_threadpool(get_candidates_version)
+    index = await run_in_threadpool(get_candidate_index)
+    jobs = one_per_cluster(await run_in_threadpool(find_jobs_by_title, job_title, 4 * max_jobs), limit=max_jobs)
+    ranker = ranker_key(rerank)
+    stored = await run_in_threadpool(load_job_matches, [str(j["_id"]) for j in jobs], ranker)
+
+    results = []
+    for job in jobs:
+        doc = stored.get(str(job["_id"]))
+        if doc and doc.get("candidates_version") == version and doc["k"] >= k:
+            results.append({**_job_summary(job), "candidates": doc["candidates"][:k], "cached": True})
+            continue
+        with span("candidate_prefilter"):
+            ranked = await run_in_threadpool(index.search, job, k)
+        if rerank:
+            with span("candidate_rerank_llm", candidates=len(ranked)):
+                ranked = await rerank_candidates(job, ranked)
+        results.append({**_job_summary(job), "candidates": ranked, "cached": False})
+    return {"job_title": job_title, "ranker": ranker, "candidates_indexed": len(index), "jobs": results}
+
+
+async def run_title_matches(job_title: str, k: int = 10, rerank: bool = False):
+    """
+    Rank candidates for every job matching `job_title` in one pass: one
+    cursor over the jobs, local ranking against the in-memory index (LLM
+    reranks at most SHARD_CONCURRENCY at a time) and a single bulk write of
+    the results into `job_matches`.
+    """
+    start = time.perf_counter()
+    # read before the refresh: a candidate saved meanwhile makes the results stale
+    version = await run_in_threadpool(get_candidates_version)
+    index = await run_in_threadpool(get_candidate_index)
+    jobs = await run_in_threadpool(find_jobs_by_title, job_title)
+    ranker = ranker_key(rerank)
+    semaphore = asyncio.Semaphore(SHARD_CONCURRENCY)
+
+    with span("candidate_prefilter", jobs=len(jobs)):
+        local = await run_in_threadpool(lambda: [index.search(job, top_k=k) for job in jobs])
+
+    async def one(job, ranked):
+        if rerank:
+            async with semaphore:
+                ranked = await rerank_candidates(job, ranked)
+        return {
+            "job_id": str(job["_id"]),
+            "ranker": ranker,
+            "title": job.get("title"),
+            "k": k,
+            "candidates_indexed": len(index),
+            "candidates_version": version,
+            "candidates": ranked,
+        }
+
+    with span("candidate_rerank_llm", jobs=len(jobs), enabled=rerank):
+        docs = await asyncio.gather(*(one(job, ranked) for job, ranked in zip(jobs, local)))
+    with span("job_matches_store"):
+        stored = await run_in_threadpool(save_job_matches, docs)
+    return {
+        "job_title": job_title,
+        "ranker": ranker,
+        "jobs": len(jobs),
+        "stored": stored,
+        "candidates_indexed": len(index),
+        "took_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
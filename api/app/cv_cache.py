@@ -0,0 +1,64 @@
+import os
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+
+from app.db import load_cv_cache, save_cv_cache
+from app.metrics import CACHE_LOOKUPS
+
+LRU_SIZE = int(os.getenv("CV_CACHE_LRU_SIZE", "512"))
+
+# hit/miss counters, exposed on /cache/stats
+stats = {"lru_hits": 0, "mongo_hits": 0, "misses": 0}
+
+_lru = OrderedDict()
+_lock = threading.Lock()
+
+
+def cache_key(pdf_bytes: bytes, model: str, prompt_version: str, mode: str = "", parser_version: str = "") -> str:
+    """Content address of an extraction: PDF bytes + model + prompt version (+ extraction mode, parser version)."""
+    digest = hashlib.sha256(pdf_bytes).hexdigest()
+    return hashlib.sha256(f"{digest}:{model}:{prompt_version}:{mode}:{parser_version}".encode("utf-8")).hexdigest()
+
+
+def _lru_put(key: str, value: dict):
+    with _lock:
+        _lru[key] = value
+        _lru.move_to_end(key)
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def get(key: str):
+    """In-process LRU first, then the Mongo tier. Returns a copy or None."""
+    with _lock:
+        value = _lru.get(key)
+        if value is not None:
+            _lru.move_to_end(key)
+            stats["lru_hits"] += 1
+            CACHE_LOOKUPS.labels("cv_extraction", "lru_hit").inc()
+            return copy.deepcopy(value)
+
+    value = load_cv_cache(key)
+    if value is None:
+        stats["misses"] += 1
+        CACHE_LOOKUPS.labels("cv_extraction", "miss").inc()
+        return None
+
+    stats["mongo_hits"] += 1
+    CACHE_LOOKUPS.labels("cv_extraction", "mongo_hit").inc()
+    _lru_put(key, value)
+    return copy.deepcopy(value)
+
+
+def put(key: str, value: dict, **meta):
+    value = copy.deepcopy(value)
+    _lru_put(key, value)
+    save_cv_cache(key, value, **meta)
+
+
+def get_stats() -> dict:
+    hits = stats["lru_hits"] + stats["mongo_hits"]
+    total = hits + stats["misses"]
+    return {**stats, "lru_size": len(_lru), "hit_ratio": round(hits / total, 4) if total else None}
@@ -0,0 +1,298 @@
+import os
+import re
+
+from app.skills import TAXONOMY_VERSION, extract_skills, normalize
+
+# Bump whenever the section/field heuristics below change: cached extractions
+# are keyed on it (together with the skills taxonomy digest)
+PARSER_VERSION = f"1+{TAXONOMY_VERSION}"
+
+# Fields at or above this confidence are kept from the local parser; the
+# others are asked to the LLM (app.llm.extract_cv_openrouter.extract_cv_tiered)
+FIELD_CONFIDENCE = float(os.getenv("CV_FIELD_CONFIDENCE", "0.7"))
+
+# Fields the parser fills; full_name comes from the upload form in the pipeline
+FIELDS = ("skills", "experiences", "education", "languages", "summary")
+
+SECTION_HEADINGS = {
+    "summary": r"profil|profile|summary|resume|about me|a propos( de moi)?|objecti(f|ve)|presentation",
+    "skills": r"(technical |hard |soft )?skills|competences( techniques| cles)?|technologies|outils|stack( technique)?|savoir[- ]faire",
+    "experiences": r"(work |professional )?experiences?( professionnelles?)?|employment|parcours( professionnel)?|emplois?",
+    "education": r"education|formations?|diplomes?|etudes|cursus|academic( background)?",
+    "languages": r"languages?|langues?",
+}
+HEADING_RE = {name: re.compile(rf"^(?:{p})$") for name, p in SECTION_HEADINGS.items()}
+
+BULLET_RE = re.compile(r"^[\s\-*•·▪►–—]+")
+# "/" is part of skill names (CI/CD, TCP/IP, PL/SQL): it only separates languages
+ITEM_SPLIT_RE = re.compile(r"\s*[,;•|·▪]\s*")
+LANGUAGE_SPLIT_RE = re.compile(r"\s*[,;•|·▪/]\s*")
+YEAR_RE = re.compile(r"\b(19[6-9]\d|20[0-4]\d)\b")
+PERIOD_RE = re.compile(
+    r"\b((?:19|20)\d{2})\s*(?:[-–—]|to|a|à|au)\s*((?:19|20)\d{2}|present|now|current|aujourd'?hui|actuel|ce jour)",
+    re.I,
+)
+# "Title - Company (2019 - 2021)", "Title | Company, 2020", "Title at/chez Company"
+ENTRY_RE = re.compile(r"^(?P<left>.+?)\s+(?:[-–—|@]|at|chez)\s+(?P<right>.+)$")
+DEGREE_RE = re.compile(
+    r"\b(master|mba|msc|bsc|bachelor|licence|license|bts|dut|but|deug|doctorat|phd|doctorate|"
+    r"ingenieur|engineer(ing)? degree|diplome|baccalaureat|bac\b|cap\b|dea|dess|m1|m2|l3)",
+)
+SCHOOL_RE = re.compile(r"\b(universit|ecole|school|institut|college|lycee|iut|faculte|academy|academie|polytech)")
+
+LANGUAGES = {
+    "francais": "Français", "french": "French", "anglais": "Anglais", "english": "English",
+    "arabe": "Arabe", "arabic": "Arabic", "espagnol": "Espagnol", "spanish": "Spanish",
+    "allemand": "Allemand", "german": "German", "italien": "Italien", "italian": "Italian",
+    "portugais": "Portugais", "portuguese": "Portuguese", "chinois": "Chinois", "chinese": "Chinese",
+    "mandarin": "Mandarin", "japonais": "Japonais", "japanese": "Japanese", "russe": "Russe",
+    "russian": "Russian", "neerlandais": "Néerlandais", "dutch": "Dutch", "turc": "Turc",
+    "turkish": "Turkish", "amazigh": "Amazigh", "berbere": "Berbère", "hindi": "Hindi",
+}
+LANGUAGE_RE = re.compile(r"\b(" + "|".join(LANGUAGES) + r")\b")
+LANGUAGE_NAMES = set(LANGUAGES) | {normalize(v) for v in LANGUAGES.values()}
+LEVEL_RE = re.compile(
+    r"\b([abc][12]|native|maternelle?|natif|bilingue|bilingual|fluent|courant|professional|professionnel|"
+    r"intermediate|intermediaire|advanced|avance|notions|basic|debutant|scolaire)\b"
+)
+
+SUMMARY_CHARS = 600
+
+
+def _clean(line: str) -> str:
+    return BULLET_RE.sub("", line).strip()
+
+
+def _heading(line: str):
+    """(section, inline content) when `line` opens a section, else None."""
+    head, sep, rest = line.partition(":")
+    norm = normalize(head).strip(" .-:")
+    if len(norm) > 40:
+        return None
+    for name, pattern in HEADING_RE.items():
+        if pattern.match(norm):
+            return name, rest.strip() if sep else ""
+    return None
+
+
+def split_sections(text: str) -> dict:
+    """
+    {section: [lines]} following the CV headings; lines before the first
+    heading go to "header", lines of unknown sections to "other".
+    """
+    sections = {"header": []}
+    current = "header"
+    for raw in (text or "").splitlines():
+        line = _clean(raw)
+        if not line:
+            continue
+        found = _heading(line)
+        if found:
+            current, inline = found
+            sections.setdefault(current, [])
+            if inline:
+                sections[current].append(inline)
+            continue
+        # an all-caps short line after real content is a heading we do not know
+        if current != "header" and len(line) <= 30 and line.isupper() and len(line.split()) <= 3:
+            current = "other"
+            sections.setdefault(current, [])
+            continue
+        sections.setdefault(current, []).append(line)
+    return sections
+
+
+# ============================
+# FIELD PARSERS: (value, confidence)
+# ============================
+def _skills(sections: dict, text: str):
+    items, seen = [], set()
+    for line in sections.get("skills", []):
+        for item in ITEM_SPLIT_RE.split(line):
+            item = item.strip(" .:")
+            if 1 <= len(item) <= 40 and len(item.split()) <= 4 and item.lower() not in seen:
+                seen.add(item.lower())
+                items.append(item)
+    from_section = len(items)
+    # taxonomy skills from the rest of the CV ("English" in a languages list is not a skill)
+    required, nice = extract_skills(text)
+    for skill in required + nice:
+        if skill.lower() not in seen and normalize(skill) not in LANGUAGE_NAMES:
+            seen.add(skill.lower())
+            items.append(skill)
+    if from_section >= 3:
+        return items, 0.9
+    return items, 0.6 if len(items) >= 3 else 0.2
+
+
+def _period(line: str):
+    m = PERIOD_RE.search(line)
+    if m:
+        return f"{m.group(1)} - {m.group(2)}"
+    years = YEAR_RE.findall(line)
+    return years[-1] if years else None
+
+
+def _strip_period(line: str) -> str:
+    line = PERIOD_RE.sub("", line)
+    line = YEAR_RE.sub("", line)
+    return re.sub(r"\(\s*[-–—,]?\s*\)|[\s,(|–—-]+$", "", line).strip()
+
+
+def _experiences(sections: dict):
+    lines = sections.get("experiences")
+    if not lines:
+        return [], 0.2
+    entries = []
+    for line in lines:
+        # description sentences are not entries
+        if len(line) > 120 or line.endswith("."):
+            continue
+        m = ENTRY_RE.match(_strip_period(line))
+        if m:
+            entries.append({"title": m.group("left").strip(), "company": m.group("right").strip(), "years": _period(line)})
+        elif _period(line) and len(line) <= 80:
+            entries.append({"title": _strip_period(line), "company": None, "years": _period(line)})
+    if not entries:
+        return [], 0.3
+    complete = sum(1 for e in entries if e["company"])
+    return entries, 0.85 if complete == len(entries) else 0.6
+
+
+def _education(sections: dict):
+    lines = sections.get("education")
+    if not lines:
+        return [], 0.2
+    entries = []
+    for line in lines:
+        if len(line) > 160:
+            continue
+        norm = normalize(line)
+        if not (DEGREE_RE.search(norm) or SCHOOL_RE.search(norm)):
+            continue
+        base = _strip_period(line)
+        m = ENTRY_RE.match(base)
+        degree, school = (m.group("left"), m.group("right")) if m else (base, None)
+        if school is None and SCHOOL_RE.search(normalize(degree)) and "," in degree:
+            degree, school = (p.strip() for p in degree.split(",", 1))
+        years = YEAR_RE.findall(line)
+        entries.append({"degree": degree.strip(), "school": school and school.strip(), "year": years[-1] if years else None})
+    if not entries:
+        return [], 0.3
+    return entries, 0.85
+
+
+def _languages(sections: dict, text: str):
+    lines = sections.get("languages")
+    confidence = 0.9
+    if not lines:
+        # mentioned elsewhere ("Anglais courant" in a summary): less reliable
+        lines, confidence = text.splitlines(), 0.5
+    found, seen = [], set()
+    for line in lines:
+        for segment in LANGUAGE_SPLIT_RE.split(line):
+            norm = normalize(segment)
+            m = LANGUAGE_RE.search(norm)
+            if not m or m.group(1) in seen:
+                continue
+            seen.add(m.group(1))
+            level = LEVEL_RE.search(norm[m.end():]) or LEVEL_RE.search(norm)
+            level = level.group(1) if level else None
+            # CEFR levels upper-cased (C1), words kept as written (courant)
+            found.append({"name": LANGUAGES[m.group(1)], "level": level.upper() if level and len(level) == 2 else level})
+    if not found:
+        return [], 0.2
+    return found, confidence
+
+
+def _summary(sections: dict, experiences: list, skills: list):
+    lines = sections.get("summary")
+    if lines:
+        text = " ".join(lines)
+        return text[:SUMMARY_CHARS].rsplit(" ", 1)[0] if len(text) > SUMMARY_CHARS else text, 0.85
+    # no profile section: a short factual summary from the headline and parsed fields
+    header = [l for l in sections.get("header", []) if "@" not in l and not re.search(r"\d{6,}", l)]
+    headline = header[1] if len(header) > 1 else ""
+    parts = [headline] if headline and len(headline) <= 80 else []
+    if experiences and experiences[0].get("title"):
+        parts.append(f"Latest role: {experiences[0]['title']}")
+    if skills:
+        parts.append(f"Skills: {', '.join(skills[:8])}")
+    if not parts:
+        return None, 0.2
+    return ". ".join(p.rstrip(".") for p in parts), 0.7 if headline else 0.5
+
+
+def _full_name(sections: dict):
+    for line in sections.get("header", [])[:3]:
+        words = line.split()
+        if 2 <= len(words) <= 5 and "@" not in line and not any(c in line for c in ":/|"):
+            return line, 0.6
+    return "", 0.0
+
+
+class ParsedCV:
+    """Local extraction result: CV fields, per-field confidence and the CV sections."""
+
+    def __init__(self, data: dict, confidence: dict, sections: dict):
+        self.data = data
+        self.confidence = confidence
+        self.sections = sections
+
+    def gaps(self, threshold: float = FIELD_CONFIDENCE):
+        """Fields whose confidence is below `threshold`."""
+        return [f for f in FIELDS if self.confidence.get(f, 0.0) < threshold]
+
+
+def parse_cv(text: str) -> ParsedCV:
+    """
+    Fill the CV schema from section headings and patterns only (no LLM).
+    Same keys as the LLM extraction (skills, languages, experiences,
+    education, summary, full_name).
+    """
+    sections = split_sections(text)
+    skills, c_skills = _skills(sections, text)
+    experiences, c_exp = _experiences(sections)
+    education, c_edu = _education(sections)
+    languages, c_lang = _languages(sections, text)
+    summary, c_summary = _summary(sections, experiences, skills)
+    full_name, c_name = _full_name(sections)
+    data = {
+        "full_name": full_name,
+        "skills": skills,
+        "languages": languages,
+        "experiences": experiences,
+        "education": education,
+        "summary": summary,
+    }
+    confidence = {
+        "full_name": c_name, "skills": c_skills, "experiences": c_exp,
+        "education": c_edu, "languages": c_lang, "summary": c_summary,
+    }
+    return ParsedCV(data, confidence, sections)
+
+
+# Sections the LLM sees for each missing field (in CV order); "other"/"header"
+# stand in when the CV has no such section
+FIELD_SECTIONS = {
+    "skills": ("skills", "summary", "experiences"),
+    "experiences": ("experiences",),
+    "education": ("education",),
+    "languages": ("languages",),
+    "summary": ("summary", "header", "experiences"),
+}
+SECTION_ORDER = ("header", "summary", "skills", "experiences", "education", "languages", "other")
+
+
+def gap_text(parsed: ParsedCV, fields, max_chars: int) -> str:
+    """The CV sections relevant to `fields`, capped at `max_chars`."""
+    wanted = set()
+    for field in fields:
+        names = [s for s in FIELD_SECTIONS[field] if parsed.sections.get(s)]
+        wanted.update(names or ("header", "summary", "other"))
+    blocks = []
+    for name in SECTION_ORDER:
+        if name in wanted and parsed.sections.get(name):
+            title = "" if name == "header" else f"{name.upper()}:\n"
+            blocks.append(title + "\n".join(parsed.sections[name]))
+    return "\n\n".join(blocks)[:max_chars]
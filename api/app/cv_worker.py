@@ -0,0 +1,100 @@
+import os
+import uuid
+import socket
+import asyncio
+from datetime import datetime, timedelta
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.db import claim_cv_job, update_cv_job_stage, finish_cv_job, fail_cv_job
+from app.metrics import CV_JOBS, log_event
+from app.pipeline import run_cv_pipeline
+from app.pdf import PDFTooLarge
+
+CV_WORKERS = int(os.getenv("CV_WORKERS", "2"))
+LEASE_SECONDS = int(os.getenv("CV_JOB_LEASE_SECONDS", "300"))
+POLL_INTERVAL = float(os.getenv("CV_JOB_POLL_INTERVAL", "1.0"))
+RETRY_BACKOFF = int(os.getenv("CV_JOB_RETRY_BACKOFF", "30"))
+
+
+class LeaseLost(Exception):
+    pass
+
+
+async def process_one(worker_id: str) -> bool:
+    """Claim and run one queued CV job. Returns False when the queue is empty."""
+    job = await run_in_threadpool(claim_cv_job, worker_id, LEASE_SECONDS)
+    if job is None:
+        return False
+
+    async def on_stage(stage, info):
+        ok = await run_in_threadpool(update_cv_job_stage, job["_id"], worker_id, stage, info, LEASE_SECONDS)
+        if not ok:
+            raise LeaseLost(f"lease on {job['_id']} lost during '{stage}'")
+
+    if job["attempts"] > job.get("max_attempts", 3):
+        # reclaimed after its last allowed attempt lost its lease
+        await run_in_threadpool(fail_cv_job, job["_id"], worker_id, "max attempts exceeded", None)
+        CV_JOBS.labels("failed").inc()
+        return True
+
+    try:
+        result = await run_cv_pipeline(bytes(job["pdf"]), job["full_name"], on_stage=on_stage, cv_job_id=job["_id"])
+        await run_in_threadpool(finish_cv_job, job["_id"], worker_id, result)
+        CV_JOBS.labels("done").inc()
+    except LeaseLost as e:
+        CV_JOBS.labels("lease_lost").inc()
+        log_event("cv_job_lease_lost", sample=False, job_id=job["_id"], worker=worker_id, detail=str(e))
+    except Exception as e:
+        permanent = isinstance(e, PDFTooLarge) or job["attempts"] >= job.get("max_attempts", 3)
+        retry_at = None if permanent else datetime.utcnow() + timedelta(seconds=RETRY_BACKOFF * job["attempts"])
+        CV_JOBS.labels("failed" if permanent else "retry").inc()
+        log_event(
+            "cv_job_error", sample=False, job_id=job["_id"], worker=worker_id, attempt=job["attempts"],
+            permanent=permanent, error=f"{type(e).__name__}: {e}"[:200],
+        )
+        await run_in_threadpool(fail_cv_job, job["_id"], worker_id, f"{type(e).__name__}: {e}", retry_at)
+    return True
+
+
+async def worker_loop(worker_id: str):
+    while True:
+        try:
+            busy = await process_one(worker_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            CV_JOBS.labels("worker_error").inc()
+            log_event("cv_worker_error", sample=False, worker=worker_id, error=f"{type(e).__name__}: {e}"[:200])
+            busy = False
+        if not busy:
+            await asyncio.sleep(POLL_INTERVAL)
+
+
+# ============================
+# LIFECYCLE
+# ============================
+_tasks = []
+
+
+def start_workers(n: int = CV_WORKERS):
+    prefix = f"{socket.gethostname()}-{uuid.uuid4().hex[:6]}"
+    for i in range(n):
+        _tasks.append(asyncio.create_task(worker_loop(f"{prefix}-{i}")))
+
+
+async def stop_workers():
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+
+
+async def _run_forever(n: int):
+    start_workers(n)
+    await asyncio.gather(*_tasks)
+
+
+if __name__ == "__main__":
+    # Standalone worker process: `python -m app.cv_worker` (set CV_WORKERS=0 on the API)
+    asyncio.run(_run_forever(max(CV_WORKERS, 1)))
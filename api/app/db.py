@@ -1,6 +1,11 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne, ReturnDocument, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError, OperationFailure
 import os
-from datetime import datetime
+import sys
+import json
+import hashlib
+from bson import ObjectId, Binary
+from datetime import datetime, timedelta
 
 # MongoDB connection
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://mongo:27017")
@@ -9,16 +14,123 @@ DB_NAME = os.getenv("DB_NAME", "matcher")
 client = MongoClient(MONGO_URL)
 db = client[DB_NAME]
 
+# Cursor batch size used when streaming large collections
+BATCH_SIZE = int(os.getenv("MONGO_BATCH_SIZE", "1000"))
+
+CV_CACHE_TTL_SECONDS = int(os.getenv("CV_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+
+# -------------------------------
+# INDEXES
+# -------------------------------
+
+# collection -> [(keys, options)], created at API startup by ensure_indexes()
+INDEXES = {
+    "jobs": [
+        # one document per offer url; jobs without url ("") are not constrained
+        ([("url", ASCENDING)], {
+            "name": "url_unique",
+            "unique": True,
+            # $gt "" only matches non-empty strings (type bracketing)
+            "partialFilterExpression": {"url": {"$gt": ""}},
+        }),
+        # jobs without url: one document per content (a retried ingest is a no-op)
+        ([("content_hash", ASCENDING)], {
+            "name": "content_hash_unique",
+            "unique": True,
+            "partialFilterExpression": {"content_hash": {"$exists": True}},
+        }),
+        ([("ingested_at", ASCENDING)], {"name": "ingested_at"}),
+        # in-memory index refresh: jobs inserted or changed since the last one
+        ([("updated_at", ASCENDING)], {"name": "updated_at"}),
+        ([("source", ASCENDING), ("ingested_at", DESCENDING)], {"name": "source_ingested_at"}),
+        ([("location.country", ASCENDING), ("location.city", ASCENDING)], {"name": "location"}),
+    ],
+    "candidates": [
+        ([("created_at", DESCENDING)], {"name": "created_at"}),
+        # in-memory candidate index refresh: candidates saved or re-saved since the last one
+        ([("updated_at", ASCENDING)], {"name": "updated_at"}),
+        # one candidate per queued upload (retries upsert on it)
+        ([("cv_job_id", ASCENDING)], {
+            "name": "cv_job_id_unique",
+            "unique": True,
+            "partialFilterExpression": {"cv_job_id": {"$exists": True}},
+        }),
+    ],
+    "matches": [
+        ([("candidate_id", ASCENDING), ("jobs_version", ASCENDING), ("model", ASCENDING)], {
+            "name": "candidate_version_model", "unique": True,
+        }),
+    ],
+    "job_matches": [
+        ([("job_id", ASCENDING), ("ranker", ASCENDING)], {"name": "job_ranker", "unique": True}),
+    ],
+    "candidate_topk": [
+        ([("candidate_id", ASCENDING)], {"name": "candidate_id_unique", "unique": True}),
+        ([("watermark", ASCENDING)], {"name": "watermark"}),
+    ],
+    "cv_jobs": [
+        ([("status", ASCENDING), ("available_at", ASCENDING)], {"name": "status_available_at"}),
+        ([("status", ASCENDING), ("lease_expires_at", ASCENDING)], {"name": "status_lease"}),
+    ],
+    "cv_cache": [
+        # TTL: cached extractions expire CV_CACHE_TTL_SECONDS after they were written
+        ([("created_at", ASCENDING)], {"name": "created_at_ttl", "expireAfterSeconds": CV_CACHE_TTL_SECONDS}),
+    ],
+}
+
+
+def ensure_indexes():
+    """Create every declared index; a failing one is reported, not fatal."""
+    for collection, specs in INDEXES.items():
+        for keys, options in specs:
+            try:
+                db[collection].create_index(keys, **options)
+            except OperationFailure as e:
+                print(f"[WARN] index {collection}.{options.get('name')} not created: {e}")
+
 
 # -------------------------------
 # CANDIDATE CV STORAGE
 # -------------------------------
 
-def save_candidate(cv_data: dict):
-    """Save extracted CV in MongoDB."""
-    cv_data["created_at"] = datetime.utcnow()
-    result = db.candidates.insert_one(cv_data)
-    return str(result.inserted_id)
+def save_candidate(cv_data: dict, cv_job_id=None):
+    """
+    Save extracted CV in MongoDB. With `cv_job_id` (queued uploads) the
+    candidate is upserted on it, so a retried job updates the candidate
+    saved by its previous attempt instead of creating a second one.
+    Every save stamps `updated_at` and bumps the candidates version.
+    """
+    now = datetime.utcnow()
+    cv_data["updated_at"] = now
+    if cv_job_id is None:
+        cv_data["created_at"] = now
+        result = db.candidates.insert_one(cv_data)
+        bump_candidates_version()
+        return str(result.inserted_id)
+    fields = {k: v for k, v in cv_data.items() if k not in ("_id", "created_at")}
+    doc = db.candidates.find_one_and_update(
+        {"cv_job_id": cv_job_id},
+        {"$set": {**fields, "cv_job_id": cv_job_id}, "$setOnInsert": {"created_at": now}},
+        projection={"created_at": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    bump_candidates_version()
+    cv_data["created_at"] = doc["created_at"]
+    return str(doc["_id"])
+
+
+def save_candidates_bulk(cvs: list) -> list:
+    """Save many extracted CVs with a single insert_many; returns their ids in order."""
+    if not cvs:
+        return []
+    now = datetime.utcnow()
+    for cv_data in cvs:
+        cv_data["created_at"] = cv_data["updated_at"] = now
+    result = db.candidates.insert_many(cvs)
+    bump_candidates_version()
+    return [str(i) for i in result.inserted_ids]
 
 
 def load_last_candidate():
@@ -26,15 +138,499 @@ def load_last_candidate():
     return db.candidates.find_one(sort=[("created_at", -1)])
 
 
+def load_candidate(candidate_id: str):
+    if not ObjectId.is_valid(candidate_id):
+        return None
+    return db.candidates.find_one({"_id": ObjectId(candidate_id)})
+
+
 # -------------------------------
 # JOB OFFERS STORAGE
 # -------------------------------
 
+# Set when a job is first stored only: its near-duplicate cluster is assigned on first sight
+JOB_INSERT_ONLY_FIELDS = ("minhash", "dup_cluster", "dup_similarity")
+JOB_TIMESTAMPS = ("ingested_at", "updated_at")
+
+
+def _stored_jobs(urls) -> dict:
+    """Stored fields of the jobs with these urls, {url: fields} (no timestamps, no near-dup fields)."""
+    if not urls:
+        return {}
+    exclude = {k: 0 for k in ("_id",) + JOB_TIMESTAMPS + JOB_INSERT_ONLY_FIELDS}
+    return {d["url"]: d for d in db.jobs.find({"url": {"$in": list(urls)}}, exclude)}
+
+
+def job_content_hash(job: dict) -> str:
+    """Identity of a job without url: hash of its fields (timestamps and near-dup fields excluded)."""
+    fields = {k: v for k, v in job.items() if k not in JOB_TIMESTAMPS + JOB_INSERT_ONLY_FIELDS + ("_id", "content_hash")}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _job_write(job: dict, stored: dict, now):
+    """
+    Write op of one job: upsert on url, or on its content hash when it has
+    no url (inserted once, so a retried ingest does not duplicate it). None
+    when the stored document already has the same fields (a re-ingested
+    unchanged offer is not a write and does not bump the jobs version).
+    """
+    job = {k: v for k, v in job.items() if k not in JOB_TIMESTAMPS}
+    if not job.get("url"):
+        content_hash = job.get("content_hash") or job_content_hash(job)
+        return UpdateOne(
+            {"content_hash": content_hash},
+            {"$setOnInsert": {**job, "content_hash": content_hash, "ingested_at": now, "updated_at": now}},
+            upsert=True,
+        )
+    fields = {k: v for k, v in job.items() if k not in JOB_INSERT_ONLY_FIELDS}
+    current = stored.get(job["url"])
+    if current is not None and all(current.get(k) == v for k, v in fields.items()):
+        return None
+    on_insert = {k: job[k] for k in JOB_INSERT_ONLY_FIELDS if k in job}
+    return UpdateOne(
+        {"url": job["url"]},
+        {"$set": {**fields, "updated_at": now}, "$setOnInsert": {**on_insert, "ingested_at": now}},
+        upsert=True,
+    )
+
+
 def save_job(job: dict):
-    job["ingested_at"] = datetime.utcnow()
-    db.jobs.insert_one(job)
+    now = datetime.utcnow()
+    op = _job_write(job, _stored_jobs([job["url"]] if job.get("url") else []), now)
+    if op is None:
+        return
+    db.jobs.bulk_write([op])
+    bump_jobs_version()
+
+
+def save_jobs_bulk(jobs: list):
+    """
+    Unordered bulk upsert of job offers keyed on `url` (on the content hash
+    when a job has no url); rows identical to the stored offer are skipped.
+    Returns counters plus per-row errors indexed like `jobs`.
+    """
+    if not jobs:
+        return {"inserted": 0, "updated": 0, "unchanged": 0, "errors": []}
+
+    now = datetime.utcnow()
+    stored = _stored_jobs({j["url"] for j in jobs if j.get("url")})
+    ops, positions, hashes = [], [], set()
+    for i, job in enumerate(jobs):
+        if not job.get("url"):
+            job = {**job, "content_hash": job_content_hash(job)}
+            if job["content_hash"] in hashes:
+                continue  # same url-less offer twice in the batch
+            hashes.add(job["content_hash"])
+        op = _job_write(job, stored, now)
+        if op is not None:
+            ops.append(op)
+            positions.append(i)
+    unchanged = len(jobs) - len(ops)
+    if not ops:
+        return {"inserted": 0, "updated": 0, "unchanged": unchanged, "errors": []}
+
+    errors = []
+    try:
+        result = db.jobs.bulk_write(ops, ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+        errors = [
+            {"index": positions[err["index"]], "error": err.get("errmsg", "")}
+            for err in details.get("writeErrors", [])
+        ]
+
+    inserted = details.get("nInserted", 0) + details.get("nUpserted", 0)
+    updated = details.get("nModified", 0)
+    # url-less offers already stored match their content hash without a change
+    unchanged += details.get("nMatched", 0) - updated
+    if inserted or updated:
+        bump_jobs_version()
+
+    return {"inserted": inserted, "updated": updated, "unchanged": unchanged, "errors": errors}
+
+
+def load_jobs(limit=50, projection=None):
+    """Load job offers (limit to avoid LLM overload), most recent first."""
+    return list(db.jobs.find({}, projection).sort("ingested_at", DESCENDING).limit(limit))
+
+
+def iter_jobs(query=None, projection=None, sort=None, batch_size=BATCH_SIZE):
+    """Stream job offers matching `query` in cursor batches, without building a list."""
+    cursor = db.jobs.find(query or {}, projection, batch_size=batch_size)
+    if sort:
+        cursor = cursor.sort(sort)
+    return cursor
+
+
+class RefreshWatermark:
+    """
+    Position of an incremental refresh over a timestamp field. The next
+    refresh reads documents with `field` >= the last value seen ($gte: a
+    bulk write stamps many documents with one value, and some of them may
+    be written after the refresh read the others); `seen` skips the ones
+    already read at exactly that value. Documents without the field
+    (stored before it existed) are read by the first refresh only.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self.value = None
+        self._ids = set()
+        self._started = False
+
+    def query(self) -> dict:
+        if self.value is not None:
+            return {self.field: {"$gte": self.value}}
+        # after a first read of field-less documents only: not read again
+        return {self.field: {"$ne": None}} if self._started else {}
+
+    def sort(self):
+        return [(self.field, ASCENDING)]
+
+    def seen(self, doc: dict) -> bool:
+        """True when `doc` was already read at the current position; otherwise the position moves to it."""
+        self._started = True
+        value = doc.get(self.field)
+        if value is None:
+            return False
+        if value == self.value:
+            if doc["_id"] in self._ids:
+                return True
+            self._ids.add(doc["_id"])
+        elif self.value is None or value > self.value:
+            self.value = value
+            self._ids = {doc["_id"]}
+        return False
+
+
+def set_job_fields(updates) -> int:
+    """Bulk `$set` of derived fields: updates is [(job_id, fields)]. Returns modified count."""
+    if not updates:
+        return 0
+    result = db.jobs.bulk_write([UpdateOne({"_id": _id}, {"$set": fields}) for _id, fields in updates], ordered=False)
+    return result.modified_count
+
+
+def iter_candidates(query=None, projection=None, sort=None, batch_size=BATCH_SIZE):
+    """Stream candidates matching `query` in cursor batches."""
+    cursor = db.candidates.find(query or {}, projection, batch_size=batch_size)
+    if sort:
+        cursor = cursor.sort(sort)
+    return cursor
+
+
+def remove_duplicate_job_urls() -> int:
+    """Keep the most recently ingested job per url; needed before url_unique can be built."""
+    removed = 0
+    duplicates = db.jobs.aggregate([
+        {"$match": {"url": {"$gt": ""}}},
+        {"$sort": {"ingested_at": -1}},
+        {"$group": {"_id": "$url", "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ], allowDiskUse=True)
+    for dup in duplicates:
+        removed += db.jobs.delete_many({"_id": {"$in": dup["ids"][1:]}}).deleted_count
+    return removed
+
+
+# -------------------------------
+# JOBS / CANDIDATES SNAPSHOT VERSIONS
+# -------------------------------
+
+def _get_version(name: str) -> int:
+    doc = db.meta.find_one({"_id": name})
+    return doc["version"] if doc else 0
+
+
+def _bump_version(name: str) -> int:
+    doc = db.meta.find_one_and_update(
+        {"_id": name},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return doc["version"]
+
+
+def get_jobs_version() -> int:
+    """Monotonic version of the jobs corpus, bumped on every write to `jobs`."""
+    return _get_version("jobs_snapshot")
+
+
+def bump_jobs_version() -> int:
+    return _bump_version("jobs_snapshot")
+
+
+def get_candidates_version() -> int:
+    """Monotonic version of the candidates, bumped on every candidate save."""
+    return _get_version("candidates_snapshot")
+
+
+def bump_candidates_version() -> int:
+    return _bump_version("candidates_snapshot")
+
+
+# -------------------------------
+# MATERIALIZED MATCH RESULTS
+# -------------------------------
+
+def load_matches(candidate_id: str, jobs_version: int, model: str):
+    return db.matches.find_one(
+        {"candidate_id": candidate_id, "jobs_version": jobs_version, "model": model},
+        {"_id": 0},
+    )
+
+
+def save_matches(candidate_id: str, jobs_version: int, model: str, candidate_hash: str, matches: list):
+    db.matches.replace_one(
+        {"candidate_id": candidate_id, "jobs_version": jobs_version, "model": model},
+        {
+            "candidate_id": candidate_id,
+            "jobs_version": jobs_version,
+            "model": model,
+            "candidate_hash": candidate_hash,
+            "matches": matches,
+            "created_at": datetime.utcnow(),
+        },
+        upsert=True,
+    )
+    # older snapshots of the same candidate/model are now stale
+    db.matches.delete_many(
+        {"candidate_id": candidate_id, "model": model, "jobs_version": {"$lt": jobs_version}}
+    )
+
+
+def load_job_matches(job_ids: list, ranker: str) -> dict:
+    """Stored top candidates of each job, {job_id: document}."""
+    docs = db.job_matches.find({"job_id": {"$in": job_ids}, "ranker": ranker}, {"_id": 0})
+    return {d["job_id"]: d for d in docs}
+
+
+def save_job_matches(docs: list) -> int:
+    """Upsert the top candidates of many jobs in one bulk write, keyed on (job_id, ranker)."""
+    if not docs:
+        return 0
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne({"job_id": d["job_id"], "ranker": d["ranker"]}, {"$set": {**d, "updated_at": now}}, upsert=True)
+        for d in docs
+    ]
+    result = db.job_matches.bulk_write(ops, ordered=False)
+    return result.upserted_count + result.modified_count
+
+
+def latest_job_updated_at():
+    job = db.jobs.find_one({"updated_at": {"$ne": None}}, {"updated_at": 1}, sort=[("updated_at", -1)])
+    return job["updated_at"] if job else None
+
+
+def min_topk_watermark():
+    """Oldest delta-matching watermark among candidates (None before the first run)."""
+    doc = db.candidate_topk.find_one({"watermark": {"$ne": None}}, {"watermark": 1}, sort=[("watermark", 1)])
+    return doc["watermark"] if doc else None
+
+
+def prune_candidate_topk(live_ids: set) -> int:
+    """Drop the top-k of candidates no longer stored (their watermark would hold the delta back)."""
+    stale = [d["candidate_id"] for d in db.candidate_topk.find({}, {"candidate_id": 1}) if d["candidate_id"] not in live_ids]
+    if not stale:
+        return 0
+    return db.candidate_topk.delete_many({"candidate_id": {"$in": stale}}).deleted_count
+
+
+def get_delta_state() -> dict:
+    """Watermark of the last delta-matching run and the ids of the jobs it read at exactly that time."""
+    doc = db.meta.find_one({"_id": "delta_matching"})
+    return {"watermark": doc["watermark"], "ids": doc["ids"]} if doc else {"watermark": None, "ids": []}
+
+
+def save_delta_state(watermark, ids: list):
+    db.meta.update_one(
+        {"_id": "delta_matching"},
+        {"$set": {"watermark": watermark, "ids": ids, "updated_at": datetime.utcnow()}},
+        upsert=True,
+    )
+
+
+def load_candidate_topk(candidate_ids: list) -> dict:
+    """Persisted top-k of each candidate, {candidate_id: document}."""
+    docs = db.candidate_topk.find({"candidate_id": {"$in": candidate_ids}}, {"_id": 0})
+    return {d["candidate_id"]: d for d in docs}
+
+
+def save_candidate_topk(docs: list) -> int:
+    """Upsert many candidates' top-k (and watermark) in one bulk write."""
+    if not docs:
+        return 0
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne({"candidate_id": d["candidate_id"]}, {"$set": {**d, "updated_at": now}}, upsert=True)
+        for d in docs
+    ]
+    result = db.candidate_topk.bulk_write(ops, ordered=False)
+    return result.upserted_count + result.modified_count
+
+
+# -------------------------------
+# CV PROCESSING QUEUE
+# -------------------------------
+
+def enqueue_cv_job(pdf: bytes, full_name: str, filename: str = None, max_attempts: int = 3) -> str:
+    now = datetime.utcnow()
+    result = db.cv_jobs.insert_one({
+        "status": "queued",
+        "full_name": full_name,
+        "filename": filename,
+        "pdf": Binary(pdf),
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "available_at": now,
+        "stages": {},
+        "created_at": now,
+        "updated_at": now,
+    })
+    return str(result.inserted_id)
+
+
+def claim_cv_job(worker_id: str, lease_seconds: int):
+    """
+    Atomically lease the oldest runnable job: queued and due, or running
+    with an expired lease (its worker died).
+    """
+    now = datetime.utcnow()
+    return db.cv_jobs.find_one_and_update(
+        {"$or": [
+            {"status": "queued", "available_at": {"$lte": now}},
+            {"status": "running", "lease_expires_at": {"$lt": now}},
+        ]},
+        {
+            "$set": {
+                "status": "running",
+                "lease_owner": worker_id,
+                "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                "updated_at": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("available_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def update_cv_job_stage(job_id, worker_id: str, stage: str, info: dict, lease_seconds: int) -> bool:
+    """Record a finished stage and renew the lease. False if the lease was lost."""
+    now = datetime.utcnow()
+    result = db.cv_jobs.update_one(
+        {"_id": job_id, "lease_owner": worker_id, "status": "running"},
+        {"$set": {
+            f"stages.{stage}": {**info, "at": now},
+            "lease_expires_at": now + timedelta(seconds=lease_seconds),
+            "updated_at": now,
+        }},
+    )
+    return result.matched_count == 1
+
+
+def finish_cv_job(job_id, worker_id: str, result: dict):
+    db.cv_jobs.update_one(
+        {"_id": job_id, "lease_owner": worker_id},
+        {
+            "$set": {"status": "done", "result": result, "updated_at": datetime.utcnow()},
+            "$unset": {"pdf": "", "lease_expires_at": ""},
+        },
+    )
+
+
+def fail_cv_job(job_id, worker_id: str, error: str, retry_at=None):
+    """Requeue the job for `retry_at`, or mark it failed when None."""
+    update = {"error": error, "updated_at": datetime.utcnow()}
+    if retry_at is None:
+        update["status"] = "failed"
+        unset = {"pdf": "", "lease_expires_at": ""}
+    else:
+        update.update({"status": "queued", "available_at": retry_at})
+        unset = {"lease_expires_at": ""}
+    db.cv_jobs.update_one({"_id": job_id, "lease_owner": worker_id}, {"$set": update, "$unset": unset})
+
+
+def load_cv_job(job_id: str):
+    if not ObjectId.is_valid(job_id):
+        return None
+    return db.cv_jobs.find_one({"_id": ObjectId(job_id)}, {"pdf": 0})
+
+
+# -------------------------------
+# CV EXTRACTION CACHE
+# -------------------------------
+
+def load_cv_cache(key: str):
+    doc = db.cv_cache.find_one({"_id": key}, {"data": 1})
+    return doc["data"] if doc else None
+
+
+def save_cv_cache(key: str, data: dict, **meta):
+    db.cv_cache.replace_one(
+        {"_id": key},
+        {"data": data, "created_at": datetime.utcnow(), **meta},
+        upsert=True,
+    )
+
+
+# -------------------------------
+# QUERY PLAN CHECK
+# -------------------------------
+
+def _hot_queries():
+    """(name, collection, filter, sort) of the queries on the request path."""
+    now = datetime.utcnow()
+    return [
+        ("last_candidate", "candidates", {}, [("created_at", DESCENDING)]),
+        ("job_by_url", "jobs", {"url": "https://example.invalid/job"}, None),
+        ("jobs_since", "jobs", {"ingested_at": {"$gte": now}}, [("ingested_at", ASCENDING)]),
+        ("jobs_changed_since", "jobs", {"updated_at": {"$gte": now}}, [("updated_at", ASCENDING)]),
+        ("jobs_by_source", "jobs", {"source": "indeed"}, [("ingested_at", DESCENDING)]),
+        ("jobs_by_location", "jobs", {"location.country": "france", "location.city": "Paris"}, None),
+        ("matches_lookup", "matches", {"candidate_id": "x", "jobs_version": 1, "model": "m"}, None),
+        ("cv_jobs_claim", "cv_jobs", {"status": "queued", "available_at": {"$lte": now}}, [("available_at", ASCENDING)]),
+    ]
+
+
+def _plan_stages(plan):
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+
+def explain_hot_queries():
+    """
+    Return {query: {"stages": [...], "uses_index": bool}} from the winning
+    plans. A query only passes with an IXSCAN, no COLLSCAN and no in-memory SORT.
+    """
+    report = {}
+    for name, collection, query, sort in _hot_queries():
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        stages = _plan_stages(cursor.explain()["queryPlanner"]["winningPlan"])
+        uses_index = "IXSCAN" in stages and "COLLSCAN" not in stages and "SORT" not in stages
+        report[name] = {"stages": stages, "uses_index": uses_index}
+    return report
 
 
-def load_jobs(limit=50):
-    """Load job offers (limit to avoid LLM overload)."""
-    return list(db.jobs.find().limit(limit))
+if __name__ == "__main__":
+    # python -m app.db [--dedupe-urls] [--ensure-indexes] [--explain]
+    if "--dedupe-urls" in sys.argv:
+        print(f"[INFO] removed {remove_duplicate_job_urls()} duplicate jobs")
+    if "--ensure-indexes" in sys.argv:
+        ensure_indexes()
+    if "--explain" in sys.argv:
+        ok = True
+        for name, r in explain_hot_queries().items():
+            ok &= r["uses_index"]
+            print(f"[{'OK' if r['uses_index'] else 'FAIL'}] {name}: {' <- '.join(r['stages'])}")
+        sys.exit(0 if ok else 1)
@@ -0,0 +1,192 @@
+import os
+import time
+import argparse
+from bisect import bisect_left, bisect_right
+
+from app.candidate_index import candidate_skills
+from app.db import (
+    iter_candidates, iter_jobs, latest_job_updated_at, min_topk_watermark, prune_candidate_topk,
+    load_candidate_topk, save_candidate_topk, get_delta_state, save_delta_state,
+)
+from app.metrics import span
+from app.near_dup import one_per_cluster
+from app.skill_index import SkillIndex, SKILL_PROJECTION, get_skill_index
+from app.skills import enrich_job
+
+# Jobs kept per candidate in the persisted top-k
+DELTA_TOP_K = int(os.getenv("DELTA_TOP_K", "20"))
+# Candidates scored, then written, per bulk write
+DELTA_BATCH = int(os.getenv("DELTA_BATCH", "500"))
+
+DELTA_JOB_PROJECTION = {**SKILL_PROJECTION, "company": 1, "url": 1, "dup_cluster": 1}
+MATCH_FIELDS = ("title", "company", "url", "dup_cluster")
+CANDIDATE_PROJECTION = {"skills_detected": 1, "skills": 1}
+
+
+class DeltaJobs:
+    """
+    Skill index over the jobs written (inserted or changed) in [`since`,
+    `until`] by updated_at, rows in that order, so that the jobs a candidate
+    has not scored yet are the rows from its watermark on. `since` is
+    inclusive: a bulk write stamps many jobs with one updated_at and some
+    may land after a run read the others; `seen` holds the ids the run that
+    set watermark `seen_at` read at exactly that time, which are skipped.
+    """
+
+    def __init__(self, since, until, seen_at=None, seen=()):
+        # rows must stay aligned with `times`: no compaction (ids are unique here)
+        self.index = SkillIndex(compact_ratio=0)
+        self.times = []
+        self.ids = []
+        self.rows = {}   # str(job id) -> row
+        self.jobs = {}
+        self._seen_at = seen_at
+        self._seen = set(seen)
+        self._unseen = {}
+        query = {"updated_at": {"$gte": since, "$lte": until}}
+        for job in iter_jobs(query, projection=DELTA_JOB_PROJECTION, sort=[("updated_at", 1), ("_id", 1)]):
+            enrich_job(job)
+            self.index.add(job["_id"], job.get("skills_required") or [], job.get("skills_nice") or [])
+            self.rows[str(job["_id"])] = len(self.times)
+            self.times.append(job["updated_at"])
+            self.ids.append(str(job["_id"]))
+            self.jobs[job["_id"]] = {k: job.get(k) for k in MATCH_FIELDS}
+
+    def __len__(self):
+        return len(self.times)
+
+    def unseen(self, watermark) -> int:
+        """
+        First row a candidate at `watermark` has not scored: the rows after
+        it, or from it when a job written at exactly `watermark` was not read
+        by the run that set it.
+        """
+        if watermark not in self._unseen:
+            first, after = bisect_left(self.times, watermark), bisect_right(self.times, watermark)
+            seen = self._seen if watermark == self._seen_at else ()
+            self._unseen[watermark] = after if all(i in seen for i in self.ids[first:after]) else first
+        return self._unseen[watermark]
+
+    def read_at(self, time) -> list:
+        """Ids of the rows written at exactly `time`."""
+        return self.ids[bisect_left(self.times, time):bisect_right(self.times, time)]
+
+
+def merge_topk(previous: list, new: list, top_k: int = DELTA_TOP_K) -> list:
+    """Previous and new matches merged by job (new scores win), one per near-dup cluster."""
+    by_job = {m["job_id"]: m for m in previous}
+    by_job.update((m["job_id"], m) for m in new)
+    ranked = sorted(by_job.values(), key=lambda m: (-m["score"], -m["matched_weight"], m["job_id"]))
+    return one_per_cluster(ranked, limit=top_k)
+
+
+def _to_matches(hits, jobs: dict) -> list:
+    matches = []
+    for job_id, score, matched in hits:
+        job = jobs.get(job_id)
+        if job is not None:
+            matches.append({"job_id": str(job_id), "score": round(score, 4), "matched_weight": matched, **job})
+    return matches
+
+
+def run_delta_matching(top_k: int = DELTA_TOP_K) -> dict:
+    """
+    Score every stored candidate against the jobs ingested since its own
+    watermark only, merge into its persisted top-k and move the watermark to
+    the newest job write at the start of the run. Jobs changed since (a
+    re-upserted offer) are scored again, and their previous score dropped.
+    Candidates without a watermark (never delta-matched) are scored once
+    against the whole corpus. The top-k of deleted candidates is removed
+    first, so that it does not hold the oldest watermark back.
+
+    The delta index holds the jobs after the oldest watermark, so the cost
+    of a nightly run follows the number of new jobs, not the corpus size.
+    """
+    start = time.perf_counter()
+    until = latest_job_updated_at()
+    stats = {
+        "candidates": 0, "first_run": 0, "unchanged": 0, "delta_jobs": 0, "jobs_scored": 0, "written": 0, "pruned": 0,
+    }
+    if until is None:
+        return {**stats, "took_s": 0.0}
+
+    stats["pruned"] = prune_candidate_topk({str(c["_id"]) for c in iter_candidates({}, projection={"_id": 1})})
+    since = min_topk_watermark()
+    state = get_delta_state()
+    with span("delta_jobs_load"):
+        # without any watermark yet, only the jobs at `until` (their ids are kept for the next run)
+        delta = DeltaJobs(since if since is not None else until, until, state["watermark"], state["ids"])
+    stats["delta_jobs"] = len(delta) if since is not None else 0
+    full = None
+
+    def process(batch):
+        nonlocal full
+        stored = load_candidate_topk([str(c["_id"]) for c in batch])
+        docs, pending = [], []
+        for candidate in batch:
+            candidate_id = str(candidate["_id"])
+            skills = candidate_skills(candidate)
+            previous = stored.get(candidate_id)
+            watermark = previous.get("watermark") if previous else None
+
+            if watermark is None:
+                # first run for this candidate: whole corpus, through the shared job skill index
+                if full is None:
+                    full = get_skill_index()
+                stats["first_run"] += 1
+                stats["jobs_scored"] += len(full)
+                pending.append((candidate_id, full.search(skills, top_k=2 * top_k)))
+                continue
+
+            row = delta.unseen(watermark)
+            if row >= len(delta):
+                stats["unchanged"] += 1
+                if watermark < until:
+                    # nothing new for it: only the watermark moves (the oldest one bounds the next delta)
+                    docs.append({"candidate_id": candidate_id, "watermark": until})
+                continue
+            stats["jobs_scored"] += len(delta) - row
+            hits = delta.index.search(skills, top_k=2 * top_k, min_row=row)
+            # a job changed since its previous score is only kept when it is still a hit
+            kept = [m for m in previous.get("matches") or [] if delta.rows.get(m["job_id"], -1) < row]
+            docs.append({
+                "candidate_id": candidate_id,
+                "watermark": until,
+                "matches": merge_topk(kept, _to_matches(hits, delta.jobs), top_k),
+            })
+
+        if pending:
+            ids = list({job_id for _, hits in pending for job_id, _, _ in hits})
+            jobs = {
+                j["_id"]: {k: j.get(k) for k in MATCH_FIELDS}
+                for j in iter_jobs({"_id": {"$in": ids}}, projection=DELTA_JOB_PROJECTION)
+            }
+            for candidate_id, hits in pending:
+                docs.append({
+                    "candidate_id": candidate_id,
+                    "watermark": until,
+                    "matches": merge_topk([], _to_matches(hits, jobs), top_k),
+                })
+        stats["written"] += save_candidate_topk(docs)
+
+    with span("delta_matching"):
+        batch = []
+        for candidate in iter_candidates({}, projection=CANDIDATE_PROJECTION):
+            stats["candidates"] += 1
+            batch.append(candidate)
+            if len(batch) >= DELTA_BATCH:
+                process(batch)
+                batch = []
+        if batch:
+            process(batch)
+    save_delta_state(until, delta.read_at(until))
+
+    return {**stats, "watermark": until, "took_s": round(time.perf_counter() - start, 3)}
+
+
+if __name__ == "__main__":
+    # python -m app.delta_matching   (nightly, after normalize_jobspy)
+    p = argparse.ArgumentParser("Delta re-matching of stored candidates")
+    p.add_argument("--top-k", type=int, default=DELTA_TOP_K)
+    args = p.parse_args()
+    print(f"[DONE] {run_delta_matching(args.top_k)}")
@@ -0,0 +1,184 @@
+import os
+import re
+import argparse
+
+from app.skills import normalize
+
+# Length cap of the digest summary, in characters (~4 characters per token)
+SUMMARY_CHARS = int(os.getenv("DIGEST_SUMMARY_CHARS", "600"))
+DIGEST_SKILLS = int(os.getenv("DIGEST_SKILLS", "10"))
+CHARS_PER_TOKEN = 4
+
+# Sections that never help ranking (matched on normalized heading text)
+BOILERPLATE_HEADINGS = re.compile(
+    r"about (us|the company)|who we are|why (join|work)|our (values|culture|benefits)|benefits|perks|"
+    r"what we offer|how to apply|equal opportunit|diversity|"
+    r"a propos|qui sommes[- ]nous|pourquoi nous rejoindre|nos valeurs|avantages|ce que nous (vous )?offrons|"
+    r"processus de recrutement|comment postuler|l'entreprise|notre entreprise|informations complementaires"
+)
+# Single lines dropped wherever they appear
+BOILERPLATE_LINES = re.compile(
+    r"equal opportunity|without regard to|reasonable accommodation|apply (now|today)|click (here|apply)|"
+    r"situation de handicap|diversite|postulez|envoyez (votre|vos) cv|candidature spontanee|"
+    r"tickets? restaurant|mutuelle|rgpd|donnees personnelles"
+)
+
+# Keywords of a job title
+SENIORITY_PATTERNS = [
+    ("intern", re.compile(r"\b(stage|stagiaire|intern|internship|alternance|alternant|apprentie?s?)\b")),
+    ("lead", re.compile(r"\b(lead|principal|head of|manager|responsable|chef de|directeur|director)\b")),
+    ("senior", re.compile(r"\b(senior|sr|confirme|experimente|expert)\b")),
+    ("junior", re.compile(r"\b(junior|jr|debutant|entry level|graduate|jeune diplome)\b")),
+]
+# Descriptions use some of these words in other senses ("lead the migration",
+# "early-stage startup", "work with senior engineers", "expert support team"):
+# only phrases about the role itself count there. Seniority words must sit next
+# to a singular role noun ("senior data engineer", "profil confirme", "poste
+# junior") or before years of experience ("senior (5+ ans)")
+ROLE = (
+    r"(developer|developpeur|developpeuse|dev|engineer|ingenieur|ingenieure|analyst|analyste|scientist|"
+    r"consultant|consultante|architect|architecte|designer|administrator|administrateur|"
+    r"profil|candidat|candidate|poste|position|role|niveau)"
+)
+DESCRIPTION_SENIORITY_PATTERNS = [
+    ("intern", re.compile(
+        r"\b(stagiaire|intern|internship|alternance|alternant|apprentie?s?)\b|"
+        r"\b(en|de|du|un|offre de) stage\b|\bstage (de|d'|en|pfe|fin)\b"
+    )),
+    ("lead", re.compile(
+        r"\b(tech|team|technical) lead\b|\blead (developer|engineer|dev|data|architect|designer)|"
+        r"\bhead of\b|\bprincipal (engineer|developer|architect)|\b(engineering|team) manager\b|"
+        r"\bchef de projet\b|\bresponsable d'equipe\b"
+    )),
+    ("senior", re.compile(
+        rf"\b(senior|sr|confirme|experimente|expert)\s+([\w-]+\s+){{0,2}}{ROLE}\b|"
+        rf"\b{ROLE}\s+([\w-]+\s+){{0,2}}(senior|confirme|experimente|expert)\b|"
+        r"\b(senior|confirme|experimente)\s*[(,]?\s*(avec |with )?\d{1,2}\s*\+?\s*(ans|years)\b"
+    )),
+    ("junior", re.compile(
+        rf"\b(junior|jr|debutant|debutante)\s+([\w-]+\s+){{0,2}}{ROLE}\b|"
+        rf"\b{ROLE}\s+([\w-]+\s+){{0,2}}(junior|debutant|debutante)\b|"
+        r"\b(entry level|jeune diplome|debutants? acceptes?|graduate (program|programme|scheme))\b"
+    )),
+]
+YEARS_RE = re.compile(r"(\d{1,2})\s*\+?\s*(?:ans|an|years?|yrs)\b")
+
+MD_LINK_RE = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+MD_ESCAPE_RE = re.compile(r"\\([\\`*_{}\[\]()#+\-.!|>~])")
+MD_MARKUP_RE = re.compile(r"(\*\*|__|`|^#+\s*|^\s*[-*+•]\s+|^\s*\d+[.)]\s+)", re.M)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _is_heading(raw: str, line: str) -> bool:
+    stripped = raw.strip()
+    return (
+        stripped.startswith("#")
+        or (stripped.startswith("**") and stripped.rstrip(":").endswith("**"))
+        or (len(line) <= 60 and line.endswith(":"))
+    )
+
+
+def strip_boilerplate(text: str) -> str:
+    """Markdown → plain lines, without company/benefits/EEO boilerplate."""
+    text = MD_LINK_RE.sub(r"\1", MD_ESCAPE_RE.sub(r"\1", text or ""))
+    kept, skipping = [], False
+    for raw in text.splitlines():
+        line = MD_MARKUP_RE.sub("", raw).strip()
+        if not line:
+            continue
+        norm = normalize(line)
+        if _is_heading(raw, line):
+            skipping = bool(BOILERPLATE_HEADINGS.search(norm))
+            if not skipping:
+                kept.append(line.rstrip(":") + ":")
+            continue
+        if skipping or BOILERPLATE_LINES.search(norm):
+            continue
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def detect_seniority(title: str, text: str = ""):
+    """Seniority from the title first, then from the description (keywords, years of experience)."""
+    for source, patterns in ((normalize(title), SENIORITY_PATTERNS), (normalize(text), DESCRIPTION_SENIORITY_PATTERNS)):
+        for level, pattern in patterns:
+            if pattern.search(source):
+                return level
+    years = [int(y) for y in YEARS_RE.findall(normalize(text)) if int(y) <= 30]
+    if years:
+        y = min(years)
+        return "junior" if y < 2 else "mid" if y < 5 else "senior"
+    return None
+
+
+def truncate(text: str, max_chars: int) -> str:
+    """Cut at a word boundary, marking the cut with an ellipsis."""
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut + "…"
+
+
+def build_digest(job: dict, summary_chars: int = SUMMARY_CHARS) -> dict:
+    """
+    Compact view of a job for ranking prompts: title, seniority, key skills
+    and a boilerplate-stripped summary capped at `summary_chars`.
+    `source_tokens` is the estimated size of the full description.
+    """
+    description = job.get("description_text") or ""
+    body = strip_boilerplate(description)
+    skills = list(job.get("skills_required") or [])[:DIGEST_SKILLS]
+    skills += list(job.get("skills_nice") or [])[:max(0, DIGEST_SKILLS - len(skills))]
+    return {
+        "title": job.get("title") or "",
+        "seniority": job.get("seniority") or detect_seniority(job.get("title") or "", body),
+        "skills": skills,
+        "summary": truncate(body, summary_chars),
+        "source_tokens": estimate_tokens(description),
+    }
+
+
+def attach_digest(job: dict) -> dict:
+    """Store the digest on a job document about to be saved."""
+    job["digest"] = build_digest(job)
+    return job
+
+
+def render_digest(digest: dict, max_tokens: int = None) -> str:
+    """Prompt lines for one job; the summary is shortened to fit `max_tokens`."""
+    head = f"Title: {digest.get('title')}"
+    if digest.get("seniority"):
+        head += f"\nSeniority: {digest['seniority']}"
+    if digest.get("skills"):
+        head += f"\nSkills: {', '.join(digest['skills'])}"
+    summary = digest.get("summary") or ""
+    if max_tokens is not None:
+        room = (max_tokens - estimate_tokens(head)) * CHARS_PER_TOKEN - len("\nSummary: ")
+        summary = truncate(summary, room) if room > 40 else ""
+    return f"{head}\nSummary: {summary}" if summary else head
+
+
+if __name__ == "__main__":
+    # python -m app.digest --backfill   (jobs ingested before digests existed)
+    from app.db import iter_jobs, set_job_fields
+
+    p = argparse.ArgumentParser("Job digests")
+    p.add_argument("--backfill", action="store_true", help="Compute digests of jobs that have none")
+    p.add_argument("--all", action="store_true", help="With --backfill: recompute every digest")
+    args = p.parse_args()
+
+    if args.backfill:
+        query = {} if args.all else {"digest": {"$exists": False}}
+        projection = {"title": 1, "description_text": 1, "seniority": 1, "skills_required": 1, "skills_nice": 1}
+        updates, done = [], 0
+        for job in iter_jobs(query, projection=projection):
+            updates.append((job["_id"], {"digest": build_digest(job)}))
+            if len(updates) >= 1000:
+                done += set_job_fields(updates)
+                updates = []
+        done += set_job_fields(updates)
+        print(f"[DONE] {done} digests written")
@@ -1,28 +1,45 @@
 import os
-import requests
 import json
+from contextlib import nullcontext
+
+from app.cv_parser import FIELDS, parse_cv, gap_text
+from app.digest import estimate_tokens
+from app.llm.openrouter_client import chat_completion
+from app.metrics import CV_EXTRACTIONS, CV_EXTRACT_TOKENS_AVOIDED, JSON_FALLBACKS, log_event, span
 
-OPENROUTER_API_KEY = os.environ["OPENROUTER_API_KEY"]
-BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 MODEL = "qwen/qwen-2.5-7b-instruct"
+# Bump whenever the prompt below changes: cached extractions are keyed on it
+PROMPT_VERSION = "v2"
+
+# "tiered": local parser, LLM only for low-confidence fields; "llm": always the full LLM extraction
+EXTRACT_MODE = os.getenv("CV_EXTRACT_MODE", "tiered")
+# Cap of the CV sections sent for the missing fields
+GAP_MAX_CHARS = int(os.getenv("CV_GAP_MAX_CHARS", "4000"))
+
+# JSON skeleton of each field in the extraction prompt
+STRUCTURE = {
+    "full_name": '""',
+    "skills": "[]",
+    "languages": '[{"name": "", "level": ""}]',
+    "experiences": '[{"title": "", "company": "", "years": ""}]',
+    "education": '[{"degree": "", "school": "", "year": ""}]',
+    "summary": '""',
+}
 
-HEADERS = {
-    "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-    "HTTP-Referer": os.getenv("OPENROUTER_HTTP_REFERRER", "http://resume-analyser"),
-    "X-Title": os.getenv("OPENROUTER_X_TITLE", "resume-analyser")
+# tier counters, exposed on /extract/stats
+stats = {
+    "cvs": 0, "local_only": 0, "partial": 0, "local_fallback": 0, "full_llm": 0,
+    "llm_calls_avoided": 0, "prompt_tokens_avoided": 0,
 }
 
-def extract_cv_data(text: str):
-    prompt = f"""
+
+def _prompt(fields, text: str) -> str:
+    structure = ",\n".join(f'  "{f}": {STRUCTURE[f]}' for f in fields)
+    return f"""
 Extract ONLY valid JSON with this structure:
 
 {{
-  "full_name": "",
-  "skills": [],
-  "languages": [{{"name": "", "level": ""}}],
-  "experiences": [{{"title": "", "company": "", "years": ""}}],
-  "education": [{{"degree": "", "school": "", "year": ""}}],
-  "summary": ""
+{structure}
 }}
 
 Do NOT add explanations. Do NOT add comments.
@@ -32,24 +49,8 @@ CV TEXT:
 {text}
 """
 
-    payload = {
-        "model": MODEL,
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": 1500
-    }
-
-    response = requests.post(f"{BASE_URL}/chat/completions", headers=HEADERS, json=payload)
-    data = response.json()
-
-    # ---------------- DEBUG -----------------
-    print("\n\n================== RAW LLM OUTPUT ==================\n")
-    print(json.dumps(data, indent=2))
-    print("\n===================================================\n")
-    # -------------------------------------------
-
-    # extract raw text from LLM
-    raw = data["choices"][0]["message"]["content"]
 
+def _parse_json(raw: str) -> dict:
     # Try parsing normally
     try:
         return json.loads(raw)
@@ -58,4 +59,84 @@ CV TEXT:
         start = raw.find("{")
         end = raw.rfind("}") + 1
         cleaned = raw[start:end]
-        return json.loads(cleaned)
+        try:
+            parsed = json.loads(cleaned)
+        except ValueError:
+            JSON_FALLBACKS.labels("extract", "failed").inc()
+            log_event("llm_invalid_json", sample=False, kind="extract", chars=len(raw), head=raw[:200])
+            raise
+        JSON_FALLBACKS.labels("extract", "recovered").inc()
+        return parsed
+
+
+async def _complete(prompt: str) -> dict:
+    data = await chat_completion(
+        MODEL,
+        [{"role": "user", "content": prompt}],
+        max_tokens=1500,
+    )
+
+    # extract raw text from LLM
+    return _parse_json(data["choices"][0]["message"]["content"])
+
+
+async def extract_cv_data(text: str):
+    """Full LLM extraction of the whole CV text."""
+    return await _complete(_prompt(("full_name",) + FIELDS, text))
+
+
+async def extract_cv_tiered(text: str, llm_slots=None):
+    """
+    Local parser first (app.cv_parser); the LLM is asked only for the fields
+    below CV_FIELD_CONFIDENCE, with the CV sections relevant to them. When
+    every field is missing the full extraction runs. If the LLM call fails
+    (full or missing fields), the local fields are returned as they are
+    (tier "local_fallback", not cached). `llm_slots` bounds concurrent LLM calls
+    (batch uploads). The result carries an `extraction` entry: tier,
+    per-field confidence and the fields the LLM filled.
+    """
+    full_tokens = estimate_tokens(_prompt(("full_name",) + FIELDS, text))
+    if EXTRACT_MODE != "tiered":
+        async with llm_slots or nullcontext():
+            with span("cv_extract_llm", chars=len(text)):
+                return await extract_cv_data(text)
+
+    with span("cv_parse_local", chars=len(text)):
+        parsed = parse_cv(text)
+    gaps = parsed.gaps()
+    cv_data = dict(parsed.data)
+
+    if not gaps:
+        tier, sent_tokens = "local_only", 0
+    else:
+        if len(gaps) == len(FIELDS):
+            tier, fields, prompt = "full_llm", ("full_name",) + FIELDS, _prompt(("full_name",) + FIELDS, text)
+        else:
+            tier, fields, prompt = "partial", gaps, _prompt(gaps, gap_text(parsed, gaps, GAP_MAX_CHARS))
+        sent_tokens = estimate_tokens(prompt)
+        try:
+            async with llm_slots or nullcontext():
+                with span("cv_extract_llm", chars=len(prompt), fields=len(gaps)):
+                    llm = await _complete(prompt)
+        except Exception as e:
+            log_event("cv_extract_llm_error", sample=False, gaps=gaps, error=f"{type(e).__name__}: {e}"[:200])
+            tier, llm = "local_fallback", {}
+        for field in fields:
+            if llm.get(field):
+                cv_data[field] = llm[field]
+
+    avoided = max(0, full_tokens - sent_tokens)
+    stats["cvs"] += 1
+    stats[tier] += 1
+    stats["llm_calls_avoided"] += tier == "local_only"
+    stats["prompt_tokens_avoided"] += avoided
+    CV_EXTRACTIONS.labels(tier).inc()
+    CV_EXTRACT_TOKENS_AVOIDED.inc(avoided)
+    log_event("cv_extract", tier=tier, gaps=gaps, sent_tokens=sent_tokens, avoided_tokens=avoided)
+
+    cv_data["extraction"] = {
+        "tier": tier,
+        "confidence": parsed.confidence,
+        "llm_fields": list(FIELDS) if tier == "full_llm" else [] if tier == "local_fallback" else gaps,
+    }
+    return cv_data
@@ -1,38 +1,37 @@
 import os
-import requests
 import json
+import asyncio
+
+from app.digest import build_digest, estimate_tokens, render_digest, truncate
+from app.llm.openrouter_client import chat_completion
+from app.metrics import JSON_FALLBACKS, PROMPT_JOB_TOKENS, RANK_SHARDS, log_event
 
-API_KEY = os.getenv("OPENROUTER_API_KEY")
-BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 MODEL = "qwen/qwen-2.5-14b-instruct"  # FREE + strong reasoning
 
+# Sharded ranking (map-reduce over fixed-size shards of jobs)
+SHARD_SIZE = int(os.getenv("MATCH_SHARD_SIZE", "10"))
+SHARD_CONCURRENCY = int(os.getenv("MATCH_SHARD_CONCURRENCY", "4"))
+SHARD_RETRIES = int(os.getenv("MATCH_SHARD_RETRIES", "1"))
+SHARD_TIMEOUT = float(os.getenv("MATCH_SHARD_TIMEOUT", "90"))
+
+# Estimated token budget of one ranking prompt (candidate + jobs); job
+# digest summaries are shortened to fit, down to MIN_JOB_TOKENS per job
+PROMPT_TOKEN_BUDGET = int(os.getenv("MATCH_PROMPT_TOKEN_BUDGET", "3000"))
+MIN_JOB_TOKENS = 40
+
+SYSTEM_PROMPT = "You are a ranking engine. Compare candidate skills with job descriptions and rank jobs by fit."
 
-def call_llm(system_prompt: str, user_prompt: str) -> str:
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "HTTP-Referer": os.getenv("OPENROUTER_HTTP_REFERRER", "http://resume-analyser"),
-        "X-Title": os.getenv("OPENROUTER_X_TITLE", "resume-analyser"),
-        "Content-Type": "application/json",
-    }
 
-    body = {
-        "model": MODEL,
-        "messages": [
+async def call_llm(system_prompt: str, user_prompt: str, max_tokens: int = 700) -> str:
+    data = await chat_completion(
+        MODEL,
+        [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
         ],
-        "max_tokens": 700,
-    }
-
-    response = requests.post(
-        f"{BASE_URL}/chat/completions",
-        headers=headers,
-        json=body,
-        timeout=60,
+        max_tokens=max_tokens,
     )
 
-    data = response.json()
-
     # OpenRouter unified parsing
     if "choices" in data:
         msg = data["choices"][0]["message"]["content"]
@@ -44,12 +43,7 @@ def call_llm(system_prompt: str, user_prompt: str) -> str:
     return str(data)
 
 
-def match_candidate_to_jobs(candidate, jobs):
-    """Rank jobs by LLM according to the candidate profile."""
-
-    if not jobs:
-        return []
-
+def _build_user_prompt(candidate, jobs, instructions: str, token_budget: int = PROMPT_TOKEN_BUDGET) -> str:
     # ---- NORMALISATION (important !!) ----
     skills = getattr(candidate, "skills_detected", None)
     if skills is None:
@@ -57,41 +51,47 @@ def match_candidate_to_jobs(candidate, jobs):
     summary = getattr(candidate, "summary", "")
     experiences = getattr(candidate, "experiences", [])
 
-    # ---- CONSTRUCT LLM INPUT ----
-    jobs_text = "\n\n".join(
-        [
-            f"JOB {i+1}:\nTitle: {j['title']}\nCompany: {j.get('company')}\nDescription: {j.get('description_text')}"
-            for i, j in enumerate(jobs)
-        ]
-    )
-
-    user_prompt = f"""
+    candidate_text = f"""
 Candidate:
 Name: {candidate.full_name}
 Skills: {skills}
 Summary: {summary}
 Experiences: {experiences}
+"""
+
+    # ---- CONSTRUCT LLM INPUT (job digests, within the token budget) ----
+    per_job = MIN_JOB_TOKENS
+    if jobs:
+        per_job = max(MIN_JOB_TOKENS, (token_budget - estimate_tokens(candidate_text + instructions)) // len(jobs))
 
+    blocks, source_tokens = [], 0
+    for i, j in enumerate(jobs):
+        digest = j.get("digest") or build_digest(j)
+        company = f"Company: {j.get('company')}\n"
+        blocks.append(f"JOB {i+1}:\n{company}{render_digest(digest, per_job - estimate_tokens(company) - 2)}")
+        source_tokens += digest.get("source_tokens", 0)
+    jobs_text = "\n\n".join(blocks)
+
+    sent_tokens = estimate_tokens(jobs_text)
+    saved = max(0, source_tokens - sent_tokens)
+    PROMPT_JOB_TOKENS.labels("source").inc(source_tokens)
+    PROMPT_JOB_TOKENS.labels("sent").inc(sent_tokens)
+    PROMPT_JOB_TOKENS.labels("saved").inc(saved)
+    log_event("ranking_prompt", jobs=len(jobs), sent_tokens=sent_tokens, saved_tokens=saved, budget=token_budget)
+
+    return f"""{candidate_text}
 Jobs to evaluate:
 {jobs_text}
 
-Return ONLY a JSON list of max 5 objects:
-[
-  {{"job_index": 1, "score": 0.87}},
-  ...
-]
+{instructions}
 """
 
-    system_prompt = "You are a ranking engine. Compare candidate skills with job descriptions and rank jobs by fit."
-
-    raw_output = call_llm(system_prompt, user_prompt)
 
-    # ---- SAFE JSON PARSING ----
+def _parse_ranking(raw_output: str):
+    """Parse the LLM JSON list; None when no list can be recovered."""
     try:
         parsed = json.loads(raw_output)
-        if isinstance(parsed, list):
-            return parsed[:5]
-        return []
+        return parsed if isinstance(parsed, list) else None
     except:
         # attempt to extract JSON part
         try:
@@ -99,6 +99,195 @@ Return ONLY a JSON list of max 5 objects:
             end = raw_output.rfind("]") + 1
             cleaned = raw_output[start:end]
             parsed = json.loads(cleaned)
-            return parsed[:5] if isinstance(parsed, list) else []
+            if isinstance(parsed, list):
+                JSON_FALLBACKS.labels("ranking", "recovered").inc()
+                return parsed
         except:
-            return []
+            pass
+        JSON_FALLBACKS.labels("ranking", "failed").inc()
+        log_event("llm_invalid_json", sample=False, kind="ranking", chars=len(raw_output), head=raw_output[:200])
+        return None
+
+
+async def match_candidate_to_jobs(candidate, jobs, top_k: int = 5):
+    """
+    Rank jobs by LLM according to the candidate profile (best `top_k`).
+    Returns None when the LLM answer cannot be parsed.
+    """
+
+    if not jobs:
+        return []
+
+    user_prompt = _build_user_prompt(candidate, jobs, f"""Return ONLY a JSON list of max {top_k} objects:
+[
+  {{"job_index": 1, "score": 0.87}},
+  ...
+]""")
+
+    raw_output = await call_llm(SYSTEM_PROMPT, user_prompt, max_tokens=max(700, 40 + 20 * top_k))
+
+    # ---- SAFE JSON PARSING ----
+    parsed = _parse_ranking(raw_output)
+    return _attach_job_ids(parsed[:top_k], jobs) if parsed is not None else None
+
+
+def _attach_job_ids(matches, jobs):
+    """Map the 1-based `job_index` of each LLM match back to the real job id."""
+    for m in matches:
+        if not isinstance(m, dict):
+            continue
+        idx = m.get("job_index")
+        if isinstance(idx, int) and 1 <= idx <= len(jobs) and "_id" in jobs[idx - 1]:
+            m["job_id"] = str(jobs[idx - 1]["_id"])
+    return matches
+
+
+# ============================
+# SHARDED RANKING (map-reduce)
+# ============================
+async def _rank_shard(candidate, shard, retries: int, timeout: float):
+    """
+    Score every job of one shard. Returns [(local_index, score)] or None when
+    the shard still fails (error, timeout, unparsable JSON) after `retries`.
+    """
+    user_prompt = _build_user_prompt(candidate, shard, f"""Score EVERY job above ({len(shard)} jobs).
+Return ONLY a JSON list with one object per job:
+[
+  {{"job_index": 1, "score": 0.87}},
+  ...
+]""")
+
+    for attempt in range(retries + 1):
+        try:
+            raw_output = await asyncio.wait_for(
+                call_llm(SYSTEM_PROMPT, user_prompt, max_tokens=40 + 20 * len(shard)),
+                timeout=timeout,
+            )
+        except Exception as e:
+            log_event(
+                "rank_shard_error", sample=False, jobs=len(shard), attempt=attempt + 1,
+                error=f"{type(e).__name__}: {e}"[:200],
+            )
+            continue
+
+        parsed = _parse_ranking(raw_output)
+        if parsed is None:
+            # the invalid answer itself is logged by _parse_ranking
+            continue
+
+        scores = {}
+        for m in parsed:
+            if not isinstance(m, dict):
+                continue
+            idx, score = m.get("job_index"), m.get("score")
+            if isinstance(idx, int) and 1 <= idx <= len(shard) and isinstance(score, (int, float)):
+                scores.setdefault(idx - 1, float(score))
+        return sorted(scores.items())
+
+    return None
+
+
+async def rank_jobs_sharded(
+    candidate,
+    jobs,
+    top_k: int = 5,
+    shard_size: int = SHARD_SIZE,
+    concurrency: int = SHARD_CONCURRENCY,
+    retries: int = SHARD_RETRIES,
+    shard_timeout: float = SHARD_TIMEOUT,
+    on_shard=None,
+):
+    """
+    Split `jobs` into shards of `shard_size`, rank them concurrently (at most
+    `concurrency` in flight) and merge the per-shard scores into a global
+    top-k. Ties are broken by position in `jobs` (i.e. prefilter rank).
+    Failed shards are dropped without losing the others; None when every
+    shard failed (no ranking at all).
+    `on_shard(matches)` is awaited as each shard completes, with that
+    shard's scores (global job_index, best first).
+    """
+    if not jobs:
+        return []
+
+    semaphore = asyncio.Semaphore(concurrency)
+    offsets = range(0, len(jobs), shard_size)
+
+    async def run(offset):
+        async with semaphore:
+            result = await _rank_shard(candidate, jobs[offset:offset + shard_size], retries, shard_timeout)
+        if on_shard is not None and result:
+            partial = sorted(((offset + i, score) for i, score in result), key=lambda x: (-x[1], x[0]))
+            await on_shard(_attach_job_ids([{"job_index": i + 1, "score": s} for i, s in partial], jobs))
+        return offset, result
+
+    scored = []
+    failed = 0
+    for offset, result in await asyncio.gather(*(run(o) for o in offsets)):
+        if result is None:
+            failed += 1
+            continue
+        scored.extend((offset + i, score) for i, score in result)
+
+    RANK_SHARDS.labels("ok").inc(len(offsets) - failed)
+    if failed:
+        RANK_SHARDS.labels("dropped").inc(failed)
+        log_event("rank_shards_dropped", sample=False, dropped=failed, shards=len(offsets))
+    if failed == len(offsets):
+        return None
+
+    scored.sort(key=lambda x: (-x[1], x[0]))
+    matches = [{"job_index": i + 1, "score": score} for i, score in scored[:top_k]]
+    return _attach_job_ids(matches, jobs)
+
+
+# ============================
+# REVERSE RANKING (candidates for one job)
+# ============================
+CANDIDATE_SYSTEM_PROMPT = "You are a recruiting engine. Compare candidates with a job offer and score their fit."
+
+
+def _candidate_block(i: int, candidate: dict) -> str:
+    skills = candidate.get("skills_detected") or candidate.get("skills") or []
+    titles = [e.get("title") for e in candidate.get("experiences") or [] if isinstance(e, dict) and e.get("title")]
+    return (
+        f"CANDIDATE {i + 1}:\nName: {candidate.get('full_name') or ''}\n"
+        f"Skills: {', '.join(map(str, skills[:20]))}\n"
+        f"Experiences: {', '.join(titles[:5])}\n"
+        f"Summary: {truncate(candidate.get('summary') or '', 300)}"
+    )
+
+
+async def rank_candidates_for_job(job: dict, candidates: list):
+    """
+    Score every candidate for one job in a single prompt.
+    Returns [(local_index, score)] or None when no ranking can be parsed.
+    """
+    if not candidates:
+        return []
+    digest = job.get("digest") or build_digest(job)
+    user_prompt = f"""Job offer:
+Company: {job.get('company')}
+{render_digest(digest, PROMPT_TOKEN_BUDGET // 4)}
+
+Candidates to evaluate:
+{chr(10).join(_candidate_block(i, c) + chr(10) for i, c in enumerate(candidates))}
+Score EVERY candidate above ({len(candidates)} candidates).
+Return ONLY a JSON list with one object per candidate:
+[
+  {{"candidate_index": 1, "score": 0.87}},
+  ...
+]
+"""
+    raw_output = await call_llm(CANDIDATE_SYSTEM_PROMPT, user_prompt, max_tokens=40 + 20 * len(candidates))
+    parsed = _parse_ranking(raw_output)
+    if parsed is None:
+        return None
+
+    scores = {}
+    for m in parsed:
+        if not isinstance(m, dict):
+            continue
+        idx, score = m.get("candidate_index"), m.get("score")
+        if isinstance(idx, int) and 1 <= idx <= len(candidates) and isinstance(score, (int, float)):
+            scores.setdefault(idx - 1, float(score))
+    return sorted(scores.items())
@@ -0,0 +1,266 @@
+import os
+import copy
+import json
+import time
+import random
+import asyncio
+import hashlib
+
+import httpx
+
+from app.metrics import LLM_COALESCED, LLM_COST, LLM_REQUEST_SECONDS, LLM_REQUESTS, LLM_RETRIES, LLM_TOKENS, log_event
+
+API_KEY = os.getenv("OPENROUTER_API_KEY")
+BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
+# Connection pool / timeouts
+TIMEOUT = float(os.getenv("OPENROUTER_TIMEOUT", "60"))
+CONNECT_TIMEOUT = float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", "10"))
+MAX_CONNECTIONS = int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE = int(os.getenv("OPENROUTER_MAX_KEEPALIVE", "10"))
+
+# Concurrency / retries / rate limit
+MODEL_CONCURRENCY = int(os.getenv("OPENROUTER_MODEL_CONCURRENCY", "4"))
+MAX_RETRIES = int(os.getenv("OPENROUTER_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("OPENROUTER_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("OPENROUTER_BACKOFF_MAX", "10"))
+RATE_LIMIT_RPS = float(os.getenv("OPENROUTER_RATE_LIMIT_RPS", "5"))
+RATE_LIMIT_BURST = int(os.getenv("OPENROUTER_RATE_LIMIT_BURST", "10"))
+
+# Identical concurrent calls share one in-flight request
+SINGLE_FLIGHT = os.getenv("OPENROUTER_SINGLE_FLIGHT", "1") == "1"
+
+RETRY_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# USD per million tokens, {model: [prompt, completion]}; OPENROUTER_PRICES (same
+# JSON shape) overrides or adds models. Models without a price record no cost.
+PRICES = {
+    "qwen/qwen-2.5-7b-instruct": [0.04, 0.10],
+    "qwen/qwen-2.5-14b-instruct": [0.0, 0.0],
+    **json.loads(os.getenv("OPENROUTER_PRICES") or "{}"),
+}
+
+
+class OpenRouterError(Exception):
+    pass
+
+
+def request_key(model: str, messages: list, params: dict) -> str:
+    """Hash of a normalized request: roles lower-cased, contents stripped, params sorted."""
+    normalized = [
+        {"role": str(m.get("role", "")).lower(), "content": str(m.get("content", "")).strip()}
+        for m in messages
+    ]
+    body = json.dumps([model, normalized, params], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+# ============================
+# TOKEN BUCKET
+# ============================
+class TokenBucket:
+    """Async token bucket: `rate` requests per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# ============================
+# CLIENT
+# ============================
+class OpenRouterClient:
+    """
+    Async OpenRouter client: one keep-alive connection pool, a concurrency
+    limit per model, a global token-bucket rate limiter, timeouts and
+    retries with jittered exponential backoff. Identical concurrent calls
+    are coalesced (single-flight) when `single_flight` is set.
+    """
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        api_key: str = API_KEY,
+        timeout: float = TIMEOUT,
+        max_retries: int = MAX_RETRIES,
+        model_concurrency: int = MODEL_CONCURRENCY,
+        rate_limit_rps: float = RATE_LIMIT_RPS,
+        rate_limit_burst: int = RATE_LIMIT_BURST,
+        single_flight: bool = SINGLE_FLIGHT,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.model_concurrency = model_concurrency
+        self.rate_limit_rps = rate_limit_rps
+        self.rate_limit_burst = rate_limit_burst
+        self.single_flight = single_flight
+        self._loop = None
+
+    async def _ensure_loop(self):
+        """(Re)create loop-bound resources when used from a new event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        previous = self._http if self._loop is not None else None
+        self._loop = loop
+        self._http = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "HTTP-Referer": os.getenv("OPENROUTER_HTTP_REFERRER", "http://resume-analyser"),
+                "X-Title": os.getenv("OPENROUTER_X_TITLE", "resume-analyser"),
+                "Content-Type": "application/json",
+            },
+            timeout=httpx.Timeout(self.timeout, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE),
+        )
+        self._semaphores = {}
+        self._bucket = TokenBucket(self.rate_limit_rps, self.rate_limit_burst)
+        self._inflight = {}
+        if previous is not None:
+            # the pool of the previous loop cannot be reused: release its connections
+            try:
+                await previous.aclose()
+            except Exception as e:
+                log_event("llm_client_close_error", sample=False, error=f"{type(e).__name__}: {e}"[:200])
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        if model not in self._semaphores:
+            self._semaphores[model] = asyncio.Semaphore(self.model_concurrency)
+        return self._semaphores[model]
+
+    def _backoff(self, attempt: int, retry_after=None) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), BACKOFF_MAX)
+            except ValueError:
+                pass
+        # full jitter
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    async def chat(self, model: str, messages: list, **params) -> dict:
+        """
+        POST /chat/completions and return the decoded JSON response.
+        A call identical to one already in flight awaits that request's
+        result (a copy) instead of sending its own.
+        """
+        await self._ensure_loop()
+        payload = {"model": model, "messages": messages, **params}
+        if not self.single_flight:
+            return await self._request(model, payload)
+
+        key = request_key(model, messages, params)
+        task = self._inflight.get(key)
+        if task is not None:
+            LLM_COALESCED.labels(model).inc()
+            log_event("llm_coalesced", model=model)
+            # shielded: a cancelled waiter does not cancel the shared request
+            return copy.deepcopy(await asyncio.shield(task))
+
+        task = asyncio.ensure_future(self._request(model, payload))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._flight_done(key, t))
+        return await asyncio.shield(task)
+
+    def _flight_done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # retrieved here so that a failure nobody awaited anymore is not reported as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    async def _request(self, model: str, payload: dict) -> dict:
+        for attempt in range(self.max_retries + 1):
+            # the model slot is only held for the attempt itself: a request
+            # backing off must not keep the others waiting
+            async with self._semaphore(model):
+                await self._bucket.acquire()
+                retry_after = None
+                start = time.perf_counter()
+                try:
+                    response = await self._http.post("/chat/completions", json=payload)
+                    LLM_REQUEST_SECONDS.labels(model).observe(time.perf_counter() - start)
+                    if response.status_code not in RETRY_STATUSES:
+                        data = response.json()
+                        if response.status_code >= 400 or "error" in data:
+                            LLM_REQUESTS.labels(model, "error").inc()
+                            raise OpenRouterError(f"HTTP {response.status_code}: {data.get('error', data)}")
+                        self._record_usage(model, data, attempt, time.perf_counter() - start)
+                        return data
+                    error = OpenRouterError(f"HTTP {response.status_code}: {response.text[:200]}")
+                    reason = str(response.status_code)
+                    retry_after = response.headers.get("Retry-After")
+                except (httpx.TransportError, ValueError) as e:
+                    error = e
+                    reason = type(e).__name__
+
+            if attempt == self.max_retries:
+                LLM_REQUESTS.labels(model, "error").inc()
+                log_event("llm_error", sample=False, model=model, attempts=attempt + 1, error=str(error)[:200])
+                raise error
+            LLM_RETRIES.labels(model, reason).inc()
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+
+    @staticmethod
+    def _record_usage(model: str, data: dict, attempt: int, seconds: float):
+        usage = data.get("usage") or {}
+        prompt_tokens = usage.get("prompt_tokens") or 0
+        completion_tokens = usage.get("completion_tokens") or 0
+        LLM_REQUESTS.labels(model, "ok").inc()
+        LLM_TOKENS.labels(model, "prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(model, "completion").inc(completion_tokens)
+        price = PRICES.get(model)
+        if price:
+            LLM_COST.labels(model).inc((prompt_tokens * price[0] + completion_tokens * price[1]) / 1e6)
+        log_event(
+            "llm_call", model=model, attempt=attempt + 1, seconds=round(seconds, 3),
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+        )
+
+    async def aclose(self):
+        if self._loop is not None:
+            await self._http.aclose()
+            self._loop = None
+
+
+_client = None
+
+
+def get_client() -> OpenRouterClient:
+    global _client
+    if _client is None:
+        _client = OpenRouterClient()
+    return _client
+
+
+async def aclose_client():
+    if _client is not None:
+        await _client.aclose()
+
+
+async def chat_completion(model: str, messages: list, **params) -> dict:
+    return await get_client().chat(model, messages, **params)
+
+
+async def call_openrouter(model: str, messages: list, **params) -> str:
+    """Return only the assistant message content."""
+    data = await chat_completion(model, messages, **params)
+    return data["choices"][0]["message"]["content"]
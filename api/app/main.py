@@ -1,14 +1,35 @@
 import os
 import json
-import fitz
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+import zipfile
+from typing import List
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-
-from app.db import save_candidate, load_last_candidate, load_jobs, save_job
-from app.llm.extract_cv_openrouter import extract_cv_data
-from app.llm.matcher_openrouter import match_candidate_to_jobs
-from app.llm.openrouter_client import call_openrouter
+from pydantic import ValidationError
+
+from app import cv_cache
+from app.candidate_index import match_title, run_title_matches
+from app import cv_worker
+from app import metrics
+from app.db import (
+    load_last_candidate, load_candidate, save_job, save_jobs_bulk, enqueue_cv_job, load_cv_job,
+    ensure_indexes, load_candidate_topk,
+)
+from app.delta_matching import run_delta_matching
+from app.digest import attach_digest
+from app.llm import extract_cv_openrouter
+from app.llm.openrouter_client import call_openrouter, aclose_client
+from app.matching import get_matches
+from app.near_dup import mark_near_duplicates
+from app.pdf import (
+    shutdown_pool, PDFTooLarge, BatchTooLarge, MAX_PDF_BYTES, MAX_BATCH_FILES, MAX_BATCH_BYTES, MAX_ZIP_BYTES,
+    is_zip, pdfs_from_zip,
+)
+from app.pipeline import extract_cv_cached, run_cv_pipeline, stream_cv_pipeline, run_cv_batch
 from app.schemas import JobOffer
+from app.skill_index import fast_match
+from app.skills import enrich_job, canonicalize_skills
 
 app = FastAPI(title="Resume Matcher API")
 
@@ -20,6 +41,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def create_indexes():
+    ensure_indexes()
+
+
+@app.on_event("startup")
+async def start_cv_workers():
+    cv_worker.start_workers()
+
+
+@app.on_event("shutdown")
+async def close_resources():
+    await cv_worker.stop_workers()
+    await aclose_client()
+    shutdown_pool()
+
+
 # ============================
 # Health
 # ============================
@@ -32,9 +70,9 @@ def health():
 # TEST OPENROUTER
 # ============================
 @app.get("/test_openrouter")
-def test_openrouter():
+async def test_openrouter():
     try:
-        resp = call_openrouter(
+        resp = await call_openrouter(
             model="qwen/qwen-2.5-7b-instruct",
             messages=[{"role": "user", "content": "Say YES"}],
             max_tokens=10,
@@ -47,16 +85,34 @@ def test_openrouter():
 # ============================
 # PDF extraction
 # ============================
-def extract_text_from_pdf(file: UploadFile):
-    try:
-        pdf = fitz.open(stream=file.file.read(), filetype="pdf")
-        text = ""
-        for page in pdf:
-            text += page.get_text()
-        pdf.close()
-        return text
-    except Exception as e:
-        raise Exception(f"PDF extraction failed: {e}")
+async def read_pdf_upload(file: UploadFile) -> bytes:
+    """
+    Read an upload, refusing anything above MAX_PDF_BYTES. Starlette has
+    already spooled the whole body to a temporary file; this only bounds
+    what is copied into memory (MAX_PDF_BYTES + 1 bytes at most).
+    """
+    data = await file.read(MAX_PDF_BYTES + 1)
+    if len(data) > MAX_PDF_BYTES:
+        raise PDFTooLarge(f"PDF is larger than {MAX_PDF_BYTES} bytes")
+    return data
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus exposition: stage/LLM latency histograms, token, retry and cache counters."""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return cv_cache.get_stats()
+
+
+@app.get("/extract/stats")
+def extract_stats():
+    """Tiered CV extraction: CVs parsed locally only, LLM calls and prompt tokens avoided."""
+    return extract_cv_openrouter.stats
 
 
 # ============================
@@ -65,70 +121,87 @@ def extract_text_from_pdf(file: UploadFile):
 @app.post("/test_extract")
 async def test_extract(file: UploadFile = File(...)):
     try:
-        text = extract_text_from_pdf(file)
-        result = extract_cv_data(text)
+        result = await extract_cv_cached(await read_pdf_upload(file))
         return result
     except Exception as e:
         return {"status": "ERROR", "detail": str(e)}
 
 
 # ============================
-# FIX: Normalisation candidate object
+# TEST MATCHING
 # ============================
-def normalize_candidate(candidate_dict):
-
-    class CandidateObj:
-        pass
-
-    c = CandidateObj()
+@app.get("/test_matching")
+async def test_matching(refresh: bool = False):
 
-    # copy dict → object
-    for k, v in candidate_dict.items():
-        setattr(c, k, v)
+    candidate_dict = await run_in_threadpool(load_last_candidate)
+    if not candidate_dict:
+        return {"status": "ERROR", "detail": "No candidate in DB"}
 
-    # 🔥 FIX PRINCIPAL
-    if hasattr(c, "skills_detected"):
-        pass
-    elif hasattr(c, "skills"):
-        c.skills_detected = c.skills
-    else:
-        c.skills_detected = []
+    try:
+        result = await get_matches(str(candidate_dict["_id"]), candidate_dict, refresh=refresh)
+        if not result["matches"] and result["jobs_version"] == 0:
+            return {"status": "ERROR", "detail": "No jobs in DB"}
+        return {"status": "OK", **result}
+    except Exception as e:
+        return {"status": "ERROR", "detail": str(e)}
 
-    # 🔥 rendre robuste
-    if not hasattr(c, "experiences"):
-        c.experiences = []
 
-    if not hasattr(c, "summary"):
-        c.summary = ""
+@app.get("/candidates/{candidate_id}/matches")
+async def candidate_matches(candidate_id: str, refresh: bool = False):
+    """Stored matches of a candidate, recomputed only if jobs or candidate changed."""
+    candidate_dict = await run_in_threadpool(load_candidate, candidate_id)
+    if not candidate_dict:
+        raise HTTPException(status_code=404, detail="Candidate not found")
+    return {"candidate_id": candidate_id, **await get_matches(candidate_id, candidate_dict, refresh=refresh)}
 
-    if not hasattr(c, "full_name"):
-        c.full_name = ""
 
-    return c
+@app.get("/match/fast")
+def match_fast(candidate_id: str = None, k: int = 10):
+    """
+    Instant matching on the inverted skill index: weighted overlap of the
+    candidate's skills with every job's required/nice skills, no LLM.
+    Uses the last candidate when no id is given.
+    """
+    candidate_dict = load_candidate(candidate_id) if candidate_id else load_last_candidate()
+    if not candidate_dict:
+        raise HTTPException(status_code=404, detail="Candidate not found")
+    skills = canonicalize_skills(candidate_dict.get("skills_detected") or candidate_dict.get("skills") or [])
+    return {"candidate_id": str(candidate_dict["_id"]), "skills": skills, **fast_match(skills, top_k=k)}
 
 
 # ============================
-# TEST MATCHING
+# REVERSE MATCHING (job title → candidates)
 # ============================
-@app.get("/test_matching")
-def test_matching():
+@app.get("/match")
+async def match_candidates(job_title: str, k: int = 10, rerank: bool = False, jobs: int = 5):
+    """
+    Top `k` candidates for the `jobs` newest offers matching `job_title`,
+    ranked locally on the candidate index, optionally reranked by the LLM.
+    """
+    if jobs < 1:
+        raise HTTPException(status_code=400, detail="jobs must be >= 1")
+    return await match_title(job_title, k=k, rerank=rerank, max_jobs=jobs)
 
-    jobs = load_jobs(limit=20)
-    if not jobs:
-        return {"status": "ERROR", "detail": "No jobs in DB"}
 
-    candidate_dict = load_last_candidate()
-    if not candidate_dict:
-        return {"status": "ERROR", "detail": "No candidate in DB"}
+@app.post("/match/run")
+async def match_run(job_title: str, k: int = 10, rerank: bool = False):
+    """Materialize the top candidates of every job matching `job_title` (served by GET /match)."""
+    return await run_title_matches(job_title, k=k, rerank=rerank)
 
-    # 🔥 always normalize
-    candidate = normalize_candidate(candidate_dict)
 
-    try:
-        matches = match_candidate_to_jobs(candidate, jobs)
-        return {"status": "OK", "matches": matches}
-    except Exception as e:
-        return {"status": "ERROR", "detail": str(e)}
+@app.post("/match/delta")
+async def match_delta():
+    """Nightly: score stored candidates against jobs ingested since their watermark (DAG, after normalize)."""
+    return await run_in_threadpool(run_delta_matching)
+
+
+@app.get("/candidates/{candidate_id}/topk")
+def candidate_topk(candidate_id: str):
+    """Persisted top-k of a candidate, maintained by /match/delta."""
+    doc = load_candidate_topk([candidate_id]).get(candidate_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="No delta matches for this candidate yet")
+    return doc
 
 
 # ============================
@@ -140,22 +213,132 @@ async def upload_cv(
     full_name: str = Form(...)
 ):
     try:
-        text = extract_text_from_pdf(file)
-        cv_data = extract_cv_data(text)
-        cv_data["full_name"] = full_name
-
-        save_candidate(cv_data)
+        return await run_cv_pipeline(await read_pdf_upload(file), full_name)
 
-        jobs = load_jobs(limit=50)
+    except Exception as e:
+        return {"status": "ERROR", "detail": str(e)}
 
-        candidate = normalize_candidate(cv_data)
 
-        matches = match_candidate_to_jobs(candidate, jobs)
+@app.post("/upload_cv/stream")
+async def upload_cv_stream(
+    file: UploadFile = File(...),
+    full_name: str = Form(...)
+):
+    """
+    Streaming variant of /upload_cv (text/event-stream): one SSE event per
+    stage — parsed, extracted, candidate (saved CV + id), shard (partial
+    ranking, sharded mode), matches — then done; on failure error is the
+    last event (no done).
+    """
+    try:
+        data = await read_pdf_upload(file)
+    except PDFTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    async def events():
+        event = None
+        async for event, payload in stream_cv_pipeline(data, full_name):
+            yield f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+        if event != "error":
+            yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/upload_cv/batch")
+async def upload_cv_batch(
+    files: List[UploadFile] = File(...),
+    full_names: str = Form(None)
+):
+    """
+    Many CVs in one request: PDFs and/or zip archives of PDFs. `full_names`
+    is an optional JSON object {filename: full name}; the file name is used
+    otherwise. Results are streamed as NDJSON (see run_cv_batch).
+    413 past MAX_BATCH_FILES PDFs, a zip above MAX_ZIP_BYTES (or
+    MAX_ZIP_MEMBERS entries) or MAX_BATCH_BYTES of PDFs in total; a single
+    PDF above MAX_PDF_BYTES fails on its own NDJSON line.
+    """
+    try:
+        names = json.loads(full_names) if full_names else {}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="full_names must be a JSON object")
+
+    pdfs = []
+    total = 0
+    for file in files:
+        head = await file.read(4)
+        if is_zip(file.filename, head):
+            data = head + await file.read(MAX_ZIP_BYTES + 1 - len(head))
+            if len(data) > MAX_ZIP_BYTES:
+                raise HTTPException(status_code=413, detail=f"{file.filename}: zip larger than {MAX_ZIP_BYTES} bytes")
+            try:
+                members = await run_in_threadpool(pdfs_from_zip, data, MAX_BATCH_BYTES - total)
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail=f"{file.filename}: not a valid zip archive")
+            except BatchTooLarge as e:
+                raise HTTPException(status_code=413, detail=f"{file.filename}: {e}")
+            pdfs += members
+            total += sum(len(pdf) for _, pdf in members)
+        else:
+            # one byte past the limit is enough for extraction to refuse it
+            data = head + await file.read(MAX_PDF_BYTES + 1 - len(head))
+            pdfs.append((file.filename, data))
+            total += len(data)
+        if total > MAX_BATCH_BYTES:
+            raise HTTPException(status_code=413, detail=f"batch larger than {MAX_BATCH_BYTES} bytes")
+        if len(pdfs) > MAX_BATCH_FILES:
+            break
+    if len(pdfs) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=413, detail=f"{len(pdfs)} PDFs (max {MAX_BATCH_FILES})")
+
+    items = [
+        (name, data, names.get(name) or os.path.splitext(name or "")[0].replace("_", " "))
+        for name, data in pdfs
+    ]
+
+    async def lines():
+        async for line in run_cv_batch(items):
+            yield json.dumps(line, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
-        return {"candidate": cv_data, "matches": matches}
 
-    except Exception as e:
-        return {"status": "ERROR", "detail": str(e)}
+# ============================
+# ASYNC CV PROCESSING (submit / poll)
+# ============================
+@app.post("/cv_jobs", status_code=202)
+async def submit_cv_job(
+    file: UploadFile = File(...),
+    full_name: str = Form(...)
+):
+    """Queue a CV for background processing; poll GET /cv_jobs/{id}."""
+    try:
+        data = await read_pdf_upload(file)
+    except PDFTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    job_id = await run_in_threadpool(enqueue_cv_job, data, full_name, file.filename)
+    return {"id": job_id, "status": "queued"}
+
+
+@app.get("/cv_jobs/{job_id}")
+def get_cv_job(job_id: str):
+    job = load_cv_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="CV job not found")
+    return {
+        "id": job_id,
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "stages": job.get("stages", {}),
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
 
 
 # ============================
@@ -167,17 +350,82 @@ def ingest_job(job: JobOffer):
     Airflow calls this to insert normalized job offers into MongoDB.
     """
     try:
-        save_job(job.dict())
+        save_job(mark_near_duplicates([attach_digest(enrich_job(job.dict()))])[0])
         return {"status": "OK", "inserted": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/jobs/ingest_bulk")
+async def ingest_jobs_bulk(request: Request):
+    """
+    Bulk variant of /jobs/ingest: body is NDJSON (application/x-ndjson) or a
+    JSON array of JobOffer. Rows are upserted on `url` (on a hash of their
+    content when they have none, so a retried request does not duplicate
+    them); invalid rows, malformed NDJSON lines included, are reported
+    individually and do not fail the batch. Rows sent without
+    skills get them from the local taxonomy (app.skills), and every row
+    gets the compact digest used in ranking prompts (app.digest) and its
+    near-duplicate cluster (app.near_dup).
+    """
+    body = await request.body()
+    errors, malformed = [], set()
+    if "ndjson" in request.headers.get("content-type", ""):
+        # a malformed line is one row error (index = its position among the non-empty lines)
+        rows = []
+        for i, line in enumerate(line for line in body.splitlines() if line.strip()):
+            try:
+                rows.append(json.loads(line))
+            except ValueError as e:
+                rows.append(None)
+                malformed.add(i)
+                errors.append({"index": i, "error": f"Invalid JSON: {e}"})
+    else:
+        try:
+            rows = json.loads(body or b"[]")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid body: {e}")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array or NDJSON")
+
+    def prepare():
+        valid, positions = [], []
+        for i, row in enumerate(rows):
+            if i in malformed:
+                continue
+            try:
+                valid.append(attach_digest(enrich_job(JobOffer(**row).dict())))
+                positions.append(i)
+            except (ValidationError, TypeError) as e:
+                errors.append({"index": i, "error": str(e)})
+        return valid, positions
+
+    try:
+        valid, positions = await run_in_threadpool(prepare)
+        valid = await run_in_threadpool(mark_near_duplicates, valid)
+        result = await run_in_threadpool(save_jobs_bulk, valid)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # map write errors back to the position of the row in the request
+    errors += [{"index": positions[err["index"]], "error": err["error"]} for err in result["errors"]]
+    errors.sort(key=lambda err: err["index"])
+
+    return {
+        "status": "OK",
+        "received": len(rows),
+        "inserted": result["inserted"],
+        "updated": result["updated"],
+        "unchanged": result["unchanged"],
+        "errors": errors,
+    }
+
+
 # ============================
 # DIRECT LLM TEST (DEBUG MATCHING)
 # ============================
 @app.get("/test_llm_direct")
-def test_llm_direct():
+async def test_llm_direct():
     """
     Sends a simple prompt to the LLM to verify JSON output.
     """
@@ -199,7 +447,7 @@ Return ONLY JSON:
 ]
 """
 
-    response = call_llm(system_prompt, user_prompt)
+    response = await call_llm(system_prompt, user_prompt)
 
     try:
         parsed = json.loads(response)
@@ -0,0 +1,107 @@
+import os
+import json
+import hashlib
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.db import get_jobs_version, load_matches, save_matches
+from app.metrics import CACHE_LOOKUPS, span
+from app.llm.matcher_openrouter import match_candidate_to_jobs, rank_jobs_sharded, MODEL as MATCH_MODEL
+from app.retrieval import prefilter_jobs
+
+# Ranking mode: "single" (one prompt) or "sharded" (map-reduce over shards)
+MATCH_MODE = os.getenv("MATCH_MODE", "single")
+MATCH_TOP_K = int(os.getenv("MATCH_TOP_K", "5"))
+
+# Number of jobs kept by the local prefilter and sent to the LLM ranker
+PREFILTER_TOP_N = int(os.getenv("PREFILTER_TOP_N", "200" if MATCH_MODE == "sharded" else "20"))
+
+# Key under which results are stored: the ranking depends on model and mode
+RANKER = MATCH_MODEL if MATCH_MODE == "single" else f"{MATCH_MODEL}+sharded"
+
+# Candidate fields that influence the ranking
+MATCH_FIELDS = ("full_name", "skills_detected", "skills", "summary", "experiences")
+
+
+# ============================
+# FIX: Normalisation candidate object
+# ============================
+def normalize_candidate(candidate_dict):
+
+    class CandidateObj:
+        pass
+
+    c = CandidateObj()
+
+    # copy dict → object
+    for k, v in candidate_dict.items():
+        setattr(c, k, v)
+
+    # 🔥 FIX PRINCIPAL
+    if hasattr(c, "skills_detected"):
+        pass
+    elif hasattr(c, "skills"):
+        c.skills_detected = c.skills
+    else:
+        c.skills_detected = []
+
+    # 🔥 rendre robuste
+    if not hasattr(c, "experiences"):
+        c.experiences = []
+
+    if not hasattr(c, "summary"):
+        c.summary = ""
+
+    if not hasattr(c, "full_name"):
+        c.full_name = ""
+
+    return c
+
+
+def candidate_hash(candidate_dict) -> str:
+    """Fingerprint of the candidate fields used for matching."""
+    fields = {k: candidate_dict.get(k) for k in MATCH_FIELDS}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+async def rank_jobs(candidate, jobs, on_shard=None):
+    if MATCH_MODE == "sharded":
+        return await rank_jobs_sharded(candidate, jobs, top_k=MATCH_TOP_K, on_shard=on_shard)
+    return await match_candidate_to_jobs(candidate, jobs, top_k=MATCH_TOP_K)
+
+
+# ============================
+# MATERIALIZED MATCHING
+# ============================
+async def get_matches(candidate_id: str, candidate_dict, refresh: bool = False, on_shard=None):
+    """
+    Matches of a candidate against the current jobs snapshot.
+
+    Results are stored per (candidate_id, jobs_version, model) and served
+    from the store; the ranking is recomputed only when the jobs corpus
+    changed (new version), the candidate changed (hash) or `refresh` is set.
+    A ranking that failed (None from the ranker) is returned empty, not stored.
+    `on_shard` receives partial results in sharded mode (see rank_jobs_sharded).
+    """
+    jobs_version = await run_in_threadpool(get_jobs_version)
+    chash = candidate_hash(candidate_dict)
+
+    if not refresh:
+        stored = await run_in_threadpool(load_matches, candidate_id, jobs_version, RANKER)
+        if stored and stored.get("candidate_hash") == chash:
+            CACHE_LOOKUPS.labels("matches", "hit").inc()
+            return {"matches": stored["matches"], "jobs_version": jobs_version, "cached": True}
+        CACHE_LOOKUPS.labels("matches", "miss").inc()
+
+    candidate = normalize_candidate(candidate_dict)
+    with span("prefilter"):
+        jobs = await run_in_threadpool(prefilter_jobs, candidate, top_n=PREFILTER_TOP_N)
+    with span("rank_llm", jobs=len(jobs), mode=MATCH_MODE):
+        matches = await rank_jobs(candidate, jobs, on_shard) if jobs else []
+    if matches is None:
+        # no usable ranking: not stored, the next call ranks again
+        return {"matches": [], "jobs_version": jobs_version, "cached": False}
+
+    with span("matches_store"):
+        await run_in_threadpool(save_matches, candidate_id, jobs_version, RANKER, chash, matches)
+    return {"matches": matches, "jobs_version": jobs_version, "cached": False}
@@ -0,0 +1,96 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+# Share of routine events written to the structured log (errors are always logged)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.05"))
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+# ============================
+# METRICS
+# ============================
+STAGE_SECONDS = Histogram(
+    "resume_stage_seconds", "Duration of a pipeline stage", ["stage"], buckets=STAGE_BUCKETS
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "resume_llm_request_seconds", "Duration of one OpenRouter HTTP attempt", ["model"], buckets=STAGE_BUCKETS
+)
+LLM_REQUESTS = Counter("resume_llm_requests_total", "OpenRouter calls by final outcome", ["model", "outcome"])
+LLM_RETRIES = Counter("resume_llm_retries_total", "OpenRouter attempts retried", ["model", "reason"])
+LLM_COALESCED = Counter(
+    "resume_llm_coalesced_total", "LLM calls served by an identical in-flight request", ["model"]
+)
+LLM_TOKENS = Counter("resume_llm_tokens_total", "Tokens reported by OpenRouter", ["model", "kind"])
+LLM_COST = Counter(
+    "resume_llm_cost_usd_total", "Estimated OpenRouter spend: reported tokens × OPENROUTER_PRICES", ["model"]
+)
+JSON_FALLBACKS = Counter(
+    "resume_llm_json_fallbacks_total", "LLM answers that were not plain JSON", ["kind", "outcome"]
+)
+RANK_SHARDS = Counter("resume_rank_shards_total", "Sharded ranking shards by outcome", ["outcome"])
+PROMPT_JOB_TOKENS = Counter(
+    "resume_prompt_job_tokens_total",
+    "Estimated job tokens in ranking prompts: full descriptions (source), digests sent, and saved",
+    ["kind"],
+)
+CV_EXTRACTIONS = Counter(
+    "resume_cv_extractions_total", "CV extractions by tier: local only, partial (gap fields), local fallback (gap call failed) or full LLM", ["tier"]
+)
+CV_EXTRACT_TOKENS_AVOIDED = Counter(
+    "resume_cv_extract_prompt_tokens_avoided_total", "Estimated extraction prompt tokens not sent to the LLM"
+)
+CACHE_LOOKUPS = Counter("resume_cache_lookups_total", "Cache lookups by result", ["cache", "result"])
+CV_JOBS = Counter(
+    "resume_cv_jobs_total", "Queued CV job attempts by outcome: done, retry, failed, lease_lost or worker_error", ["outcome"]
+)
+
+
+@contextmanager
+def span(stage: str, **fields):
+    """Time a stage into resume_stage_seconds and emit a sampled log line."""
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(seconds)
+        log_event("stage", sample=error is None, stage=stage, seconds=round(seconds, 4), error=error, **fields)
+
+
+def render():
+    """(body, content type) of the Prometheus exposition."""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+# ============================
+# STRUCTURED LOGS
+# ============================
+logger = logging.getLogger("resume_analyser")
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def log_event(event: str, sample: bool = True, **fields):
+    """
+    One JSON line per event. Sampled events are kept with probability
+    LOG_SAMPLE_RATE and skipped before anything is serialized.
+    """
+    if sample and random.random() >= LOG_SAMPLE_RATE:
+        return
+    logger.info(json.dumps({"ts": round(time.time(), 3), "event": event, **fields}, default=str))
@@ -0,0 +1,196 @@
+import os
+import re
+import zlib
+import threading
+
+import numpy as np
+
+from app.digest import strip_boilerplate
+from app.skills import normalize
+
+# 64 min-hashes split into 16 bands of 4 rows: a pair at 0.8 Jaccard shares
+# a band with probability > 0.999; band candidates are then verified on
+# the full signature against THRESHOLD
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = int(os.getenv("NEAR_DUP_SHINGLE", "5"))
+# Estimated Jaccard similarity above which two jobs are the same offer
+THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.8"))
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+# multiply-shift hash family, fixed seed: signatures are stored and compared across runs
+_rng = np.random.RandomState(20240501)
+_A = _rng.randint(1, 2 ** 63, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.randint(0, 2 ** 63, size=NUM_PERM, dtype=np.uint64)
+_EMPTY = np.full(NUM_PERM, 0xFFFFFFFF, dtype=np.uint32)
+
+
+def _str(value) -> str:
+    # raw rows carry NaN/None for missing fields (pandas)
+    return value if isinstance(value, str) else ""
+
+
+def dup_text(job: dict) -> str:
+    """What makes two postings the same offer: title + description without boilerplate."""
+    return f"{_str(job.get('title'))}\n{strip_boilerplate(_str(job.get('description_text')))}"
+
+
+def shingles(text: str) -> np.ndarray:
+    words = WORD_RE.findall(normalize(text))
+    if len(words) < SHINGLE_SIZE:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def signature(text: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint32) of the word shingles of `text`."""
+    x = shingles(text)
+    if not len(x):
+        return _EMPTY.copy()
+    # (a·x + b) mod 2^64, top 32 bits; uint64 arrays wrap silently
+    hashed = (_A[:, None] * x[None, :] + _B[:, None]) >> np.uint64(32)
+    return hashed.min(axis=1).astype(np.uint32)
+
+
+def band_keys(sig: np.ndarray):
+    """One stable int key per band (band number in the high bits)."""
+    raw = sig.tobytes()
+    step = ROWS * 4
+    return [(b << 32) | zlib.crc32(raw[b * step:(b + 1) * step]) for b in range(BANDS)]
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def to_bytes(sig: np.ndarray) -> bytes:
+    return sig.astype(np.uint32).tobytes()
+
+
+def from_bytes(raw: bytes) -> np.ndarray:
+    return np.frombuffer(raw, dtype=np.uint32)
+
+
+class NearDupIndex:
+    """
+    In-memory LSH index: band key → members, member → (signature, cluster).
+    A new member joins the cluster of its most similar indexed member when
+    the estimated similarity reaches THRESHOLD, otherwise it starts its own
+    cluster (it is its own representative).
+    """
+
+    def __init__(self, threshold: float = THRESHOLD):
+        self.threshold = threshold
+        self._bands = {}
+        self._members = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._members)
+
+    def _best(self, sig):
+        best, best_sim = None, 0.0
+        seen = set()
+        for key in band_keys(sig):
+            for other in self._bands.get(key, ()):
+                if other in seen:
+                    continue
+                seen.add(other)
+                sim = similarity(sig, self._members[other][0])
+                if sim > best_sim:
+                    best, best_sim = other, sim
+        return best, best_sim
+
+    def add(self, member, sig, cluster=None):
+        """Index `member` with a known cluster (loading stored state)."""
+        with self._lock:
+            if member in self._members:
+                return self._members[member][1]
+            self._members[member] = (sig, cluster or member)
+            for key in band_keys(sig):
+                self._bands.setdefault(key, []).append(member)
+            return cluster or member
+
+    def assign(self, member, sig):
+        """(cluster, similarity) of `member`, indexing it if new."""
+        with self._lock:
+            known = self._members.get(member)
+            if known is not None:
+                return known[1], 1.0
+            other, sim = self._best(sig)
+        if other is not None and sim >= self.threshold:
+            return self.add(member, sig, self._members[other][1]), sim
+        return self.add(member, sig), sim
+
+
+# ============================
+# JOBS NEAR-DUP INDEX (whole collection, keyed on url)
+# ============================
+DUP_PROJECTION = {"url": 1, "minhash": 1, "dup_cluster": 1, "title": 1, "description_text": 1, "ingested_at": 1}
+
+_dup_index = None
+_dup_index_watermark = None
+_dup_index_lock = threading.Lock()
+
+
+def get_dup_index() -> NearDupIndex:
+    """
+    Near-dup index over the `jobs` collection, loaded from the stored
+    signatures, then refreshed with jobs ingested since the last call
+    (a job keeps the cluster it got when first stored).
+    """
+    # imported here: the collector uses this module where pymongo is not installed
+    from app.db import RefreshWatermark, iter_jobs
+
+    global _dup_index, _dup_index_watermark
+    with _dup_index_lock:
+        if _dup_index is None:
+            _dup_index = NearDupIndex()
+            _dup_index_watermark = RefreshWatermark("ingested_at")
+        watermark = _dup_index_watermark
+        for job in iter_jobs(watermark.query(), projection=DUP_PROJECTION, sort=watermark.sort()):
+            if watermark.seen(job):
+                continue
+            if job.get("url"):
+                if job.get("minhash"):
+                    _dup_index.add(job["url"], from_bytes(job["minhash"]), job.get("dup_cluster"))
+                else:
+                    # jobs ingested before signatures were stored
+                    _dup_index.assign(job["url"], signature(dup_text(job)))
+        return _dup_index
+
+
+def mark_near_duplicates(jobs: list) -> list:
+    """
+    Set `minhash`, `dup_cluster` (url of the cluster representative) and
+    `dup_similarity` on jobs about to be saved, against the stored corpus
+    and the jobs earlier in the same list.
+    """
+    index = get_dup_index()
+    for job in jobs:
+        sig = signature(dup_text(job))
+        job["minhash"] = to_bytes(sig)
+        if job.get("url"):
+            cluster, sim = index.assign(job["url"], sig)
+            job["dup_cluster"] = cluster
+            job["dup_similarity"] = round(sim, 3) if cluster != job["url"] else None
+    return jobs
+
+
+def one_per_cluster(jobs: list, limit: int = None) -> list:
+    """Keep the first (best ranked) job of each near-dup cluster."""
+    kept, clusters = [], set()
+    for job in jobs:
+        cluster = job.get("dup_cluster") or job.get("url") or id(job)
+        if cluster in clusters:
+            continue
+        clusters.add(cluster)
+        kept.append(job)
+        if limit is not None and len(kept) >= limit:
+            break
+    return kept
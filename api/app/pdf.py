@@ -0,0 +1,120 @@
+import os
+import io
+import asyncio
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+
+# Guards: a huge upload must not monopolize a worker
+MAX_PDF_BYTES = int(os.getenv("MAX_PDF_BYTES", str(10 * 1024 * 1024)))
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "40"))
+# Files accepted by one batch upload (zip members included)
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "500"))
+# Batch upload guards: size of one zip archive, entries it may list and
+# bytes held in memory for the whole batch (PDFs and decompressed members)
+MAX_ZIP_BYTES = int(os.getenv("MAX_ZIP_BYTES", str(100 * 1024 * 1024)))
+MAX_ZIP_MEMBERS = int(os.getenv("MAX_ZIP_MEMBERS", str(4 * MAX_BATCH_FILES)))
+MAX_BATCH_BYTES = int(os.getenv("MAX_BATCH_BYTES", str(200 * 1024 * 1024)))
+
+
+class PDFTooLarge(ValueError):
+    pass
+
+
+class BatchTooLarge(ValueError):
+    pass
+
+
+# ============================
+# WORKER SIDE (runs in the process pool)
+# ============================
+def _extract_pages(data: bytes, start: int, stop: int, max_pages: int):
+    """Return (page_count, text of pages [start, stop))."""
+    pdf = fitz.open(stream=data, filetype="pdf")
+    try:
+        n_pages = pdf.page_count
+        if n_pages > max_pages:
+            raise PDFTooLarge(f"PDF has {n_pages} pages (max {max_pages})")
+        return n_pages, "".join(pdf[i].get_text() for i in range(start, min(stop, n_pages)))
+    finally:
+        pdf.close()
+
+
+# ============================
+# POOL
+# ============================
+_pool = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def extract_text(data: bytes) -> str:
+    """
+    Extract the text of a PDF on the process pool, off the event loop.
+    The first PAGES_PER_TASK pages come back with the page count; remaining
+    pages are extracted in parallel chunks and joined once.
+    """
+    if len(data) > MAX_PDF_BYTES:
+        raise PDFTooLarge(f"PDF is {len(data)} bytes (max {MAX_PDF_BYTES})")
+
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+
+    n_pages, first = await loop.run_in_executor(pool, _extract_pages, data, 0, PAGES_PER_TASK, MAX_PDF_PAGES)
+    if n_pages <= PAGES_PER_TASK:
+        return first
+
+    rest = await asyncio.gather(*(
+        loop.run_in_executor(pool, _extract_pages, data, start, start + PAGES_PER_TASK, MAX_PDF_PAGES)
+        for start in range(PAGES_PER_TASK, n_pages, PAGES_PER_TASK)
+    ))
+    return "".join([first] + [text for _, text in rest])
+
+
+def is_zip(filename: str, data: bytes) -> bool:
+    return (filename or "").lower().endswith(".zip") or data[:4] == b"PK\x03\x04"
+
+
+def pdfs_from_zip(data: bytes, max_bytes: int = MAX_BATCH_BYTES):
+    """
+    [(name, bytes)] of the PDF members of a zip archive. A member is never
+    decompressed beyond MAX_PDF_BYTES + 1 bytes, so oversized ones still fail
+    with PDFTooLarge at extraction instead of filling memory. Raises
+    BatchTooLarge when the archive lists more than MAX_ZIP_MEMBERS entries or
+    its PDFs decompress to more than `max_bytes` in total.
+    """
+    pdfs = []
+    total = 0
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        members = archive.infolist()
+        if len(members) > MAX_ZIP_MEMBERS:
+            raise BatchTooLarge(f"{len(members)} zip entries (max {MAX_ZIP_MEMBERS})")
+        for info in members:
+            name = info.filename
+            if info.is_dir() or not name.lower().endswith(".pdf") or "__MACOSX/" in name:
+                continue
+            with archive.open(info) as member:
+                pdf = member.read(MAX_PDF_BYTES + 1)
+            total += len(pdf)
+            if total > max_bytes:
+                raise BatchTooLarge(f"zip PDFs decompress to more than {max_bytes} bytes")
+            pdfs.append((os.path.basename(name), pdf))
+            if len(pdfs) > MAX_BATCH_FILES:
+                break
+    return pdfs
@@ -0,0 +1,211 @@
+import os
+import time
+import asyncio
+
+from fastapi.concurrency import run_in_threadpool
+
+from app import cv_cache
+from app.candidate_index import index_candidates
+from app.cv_parser import PARSER_VERSION
+from app.db import save_candidate, save_candidates_bulk
+from app.llm.extract_cv_openrouter import extract_cv_tiered, MODEL as EXTRACT_MODEL, PROMPT_VERSION, EXTRACT_MODE
+from app.matching import get_matches
+from app.metrics import span
+from app.pdf import extract_text, PDFTooLarge
+from app.skills import canonicalize_skills
+
+# LLM extractions in flight for one batch upload (PDF parsing is bounded by PDF_WORKERS)
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+
+
+def _canonical_skills(cv_data: dict) -> dict:
+    """skills_detected mapped onto the job skill taxonomy (k8s → Kubernetes, ...)."""
+    cv_data["skills_detected"] = canonicalize_skills(cv_data.get("skills_detected") or cv_data.get("skills") or [])
+    return cv_data
+
+
+async def _emit(on_stage, stage: str, **info):
+    if on_stage is not None:
+        await on_stage(stage, info)
+
+
+# ============================
+# PDF extraction
+# ============================
+async def extract_text_from_pdf(data: bytes):
+    try:
+        return await extract_text(data)
+    except PDFTooLarge:
+        raise
+    except Exception as e:
+        raise Exception(f"PDF extraction failed: {e}")
+
+
+# ============================
+# CACHED CV EXTRACTION
+# ============================
+async def extract_cv_cached(data: bytes, on_stage=None, llm_slots: asyncio.Semaphore = None):
+    """
+    PDF → structured CV, served from the extraction cache when the same
+    bytes were already extracted with the same model, prompt version,
+    extraction mode and local parser/taxonomy version. A local fallback (LLM call failed) is not cached.
+    `llm_slots` bounds the concurrent LLM calls of a batch (parsing is not held).
+    """
+    key = cv_cache.cache_key(data, EXTRACT_MODEL, PROMPT_VERSION, EXTRACT_MODE, PARSER_VERSION)
+    cached = await run_in_threadpool(cv_cache.get, key)
+    if cached is not None:
+        await _emit(on_stage, "extracted", cached=True)
+        return _canonical_skills(cached)
+
+    with span("pdf_parse", bytes=len(data)):
+        text = await extract_text_from_pdf(data)
+    await _emit(on_stage, "parsed", chars=len(text))
+
+    cv_data = await extract_cv_tiered(text, llm_slots)
+    tier = cv_data.get("extraction", {}).get("tier")
+    if tier != "local_fallback":
+        await run_in_threadpool(
+            cv_cache.put, key, cv_data,
+            model=EXTRACT_MODEL, prompt_version=PROMPT_VERSION, mode=EXTRACT_MODE, parser_version=PARSER_VERSION,
+        )
+    await _emit(on_stage, "extracted", cached=False, tier=tier)
+    return _canonical_skills(cv_data)
+
+
+# ============================
+# WORKFLOW COMPLET
+# ============================
+async def run_cv_pipeline(data: bytes, full_name: str, on_stage=None, cv_job_id=None, on_candidate=None, on_shard=None):
+    """
+    PDF bytes → extracted CV → saved candidate → matches.
+    `on_stage(stage, info)` is awaited after each stage when given.
+    `cv_job_id` (queue worker) keys the saved candidate, so that a retried
+    job does not save the same CV twice. `on_candidate(candidate_id, cv_data)`
+    is awaited once the CV is saved and `on_shard(matches)` with each partial
+    ranking (sharded mode).
+    """
+    cv_data = await extract_cv_cached(data, on_stage)
+    cv_data["full_name"] = full_name
+
+    with span("candidate_save"):
+        candidate_id = await run_in_threadpool(save_candidate, cv_data, cv_job_id)
+    cv_data.pop("_id", None)
+    await run_in_threadpool(index_candidates, [(candidate_id, cv_data)])
+    if on_candidate is not None:
+        await on_candidate(candidate_id, cv_data)
+    await _emit(on_stage, "saved", candidate_id=candidate_id)
+
+    result = await get_matches(candidate_id, cv_data, on_shard=on_shard)
+    await _emit(
+        on_stage, "matched", count=len(result["matches"]), jobs_version=result["jobs_version"], cached=result["cached"]
+    )
+
+    return {"candidate_id": candidate_id, "candidate": cv_data, "matches": result["matches"]}
+
+
+# ============================
+# STREAMING WORKFLOW (SSE)
+# ============================
+async def stream_cv_pipeline(data: bytes, full_name: str):
+    """
+    run_cv_pipeline as an async iterator of (event, payload): parsed /
+    extracted (stages), candidate (saved CV), shard (partial ranking,
+    sharded mode only), matches (final), or error, which is always the
+    last event. The pipeline runs in its own task and is cancelled if the
+    consumer stops early.
+    """
+    queue = asyncio.Queue()
+    matched = {}
+
+    async def on_stage(stage, info):
+        if stage == "matched":
+            matched.update(info)
+        elif stage != "saved":  # announced by the candidate event
+            await queue.put((stage, info))
+
+    async def on_candidate(candidate_id, cv_data):
+        await queue.put(("candidate", {"candidate_id": candidate_id, "candidate": cv_data}))
+
+    async def on_shard(matches):
+        await queue.put(("shard", {"matches": matches}))
+
+    async def run():
+        try:
+            result = await run_cv_pipeline(data, full_name, on_stage, on_candidate=on_candidate, on_shard=on_shard)
+            await queue.put(("matches", {
+                "candidate_id": result["candidate_id"],
+                "matches": result["matches"],
+                "jobs_version": matched.get("jobs_version"),
+                "cached": matched.get("cached", False),
+            }))
+        except Exception as e:
+            await queue.put(("error", {"detail": str(e)}))
+        finally:
+            await queue.put(None)
+
+    task = asyncio.create_task(run())
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            yield item
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+# ============================
+# BATCH WORKFLOW (NDJSON)
+# ============================
+async def run_cv_batch(items: list, llm_concurrency: int = BATCH_LLM_CONCURRENCY):
+    """
+    Extract many CVs at once. `items` is [(filename, pdf bytes, full_name)].
+    Every PDF is parsed concurrently on the PDF process pool while at most
+    `llm_concurrency` LLM extractions run at a time. Yields, as an async
+    iterator of dicts: one line per CV when its extraction finishes
+    ("extracted" or "ERROR"), one "OK" line per candidate once all of them
+    are saved with a single insert_many, then a summary.
+    """
+    start = time.perf_counter()
+    slots = asyncio.Semaphore(max(llm_concurrency, 1))
+
+    async def extract(i, data):
+        try:
+            return i, await extract_cv_cached(data, llm_slots=slots), None
+        except Exception as e:
+            return i, None, f"{type(e).__name__}: {e}"
+
+    tasks = [asyncio.create_task(extract(i, data)) for i, (_, data, _) in enumerate(items)]
+    extracted = {}
+    errors = 0
+    try:
+        for done in asyncio.as_completed(tasks):
+            i, cv_data, error = await done
+            filename, _, full_name = items[i]
+            if error is not None:
+                errors += 1
+                yield {"file": filename, "status": "ERROR", "detail": error}
+                continue
+            cv_data["full_name"] = full_name
+            extracted[i] = cv_data
+            yield {"file": filename, "status": "extracted", "skills": cv_data.get("skills_detected", [])}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    order = sorted(extracted)
+    cvs = [extracted[i] for i in order]
+    if cvs:
+        with span("candidate_save", count=len(cvs)):
+            candidate_ids = await run_in_threadpool(save_candidates_bulk, cvs)
+        await run_in_threadpool(index_candidates, list(zip(candidate_ids, cvs)))
+        for i, candidate_id in zip(order, candidate_ids):
+            yield {"file": items[i][0], "status": "OK", "candidate_id": candidate_id, "full_name": items[i][2]}
+
+    yield {"summary": {
+        "files": len(items),
+        "saved": len(cvs),
+        "errors": errors,
+        "took_s": round(time.perf_counter() - start, 3),
+    }}
@@ -0,0 +1,248 @@
+import os
+import re
+import zlib
+import threading
+
+import numpy as np
+
+from app.db import RefreshWatermark, iter_jobs
+from app.near_dup import one_per_cluster
+
+
+# ============================
+# CONFIG
+# ============================
+N_FEATURES = 1 << 20          # hashed vocabulary size (unigrams + bigrams)
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Share of retired rows (replaced documents) above which the index is compacted
+COMPACT_RATIO = float(os.getenv("INDEX_COMPACT_RATIO", "0.25"))
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.\-]*[a-z0-9+#]|[a-z0-9]", re.UNICODE)
+
+# Fields of a job document used to build its retrieval text
+JOB_TEXT_PROJECTION = {"title": 1, "company": 1, "description_text": 1, "updated_at": 1}
+
+# Fields of the shortlisted jobs handed to the LLM ranker
+# Ranking prompts use the precomputed digest (app.digest), not the full description
+RANKING_PROJECTION = {
+    "title": 1, "company": 1, "url": 1, "location": 1,
+    "seniority": 1, "skills_required": 1, "skills_nice": 1, "digest": 1, "dup_cluster": 1,
+    # jobs stored before digests were: build_digest needs the description
+    "description_text": 1,
+}
+
+
+# ============================
+# TOKENIZATION / HASHING
+# ============================
+_token_hashes = {}
+
+
+def tokenize(text: str):
+    return TOKEN_RE.findall((text or "").lower())
+
+
+def _token_hash(token: str) -> int:
+    h = _token_hashes.get(token)
+    if h is None:
+        if len(_token_hashes) > 2_000_000:
+            _token_hashes.clear()
+        h = _token_hashes[token] = zlib.crc32(token.encode("utf-8"))
+    return h
+
+
+def hash_terms(text: str) -> np.ndarray:
+    """Hash unigrams and bigrams of `text` into [0, N_FEATURES)."""
+    tokens = tokenize(text)
+    if not tokens:
+        return np.empty(0, dtype=np.int64)
+    uni = np.fromiter((_token_hash(t) for t in tokens), dtype=np.uint64, count=len(tokens))
+    bi = (uni[:-1] * np.uint64(0x9E3779B1)) ^ uni[1:]
+    return (np.concatenate((uni, bi)) & np.uint64(N_FEATURES - 1)).astype(np.int64)
+
+
+def job_text(job: dict) -> str:
+    # title is repeated so that it weighs more than a long description
+    title = job.get("title") or ""
+    return f"{title} {title} {job.get('company') or ''} {job.get('description_text') or ''}"
+
+
+def candidate_text(candidate) -> str:
+    skills = getattr(candidate, "skills_detected", None) or getattr(candidate, "skills", None) or []
+    experiences = getattr(candidate, "experiences", None) or []
+    titles = []
+    for e in experiences:
+        title = e.get("title") if isinstance(e, dict) else getattr(e, "title", None)
+        if title:
+            titles.append(title)
+    summary = getattr(candidate, "summary", "") or ""
+    return " ".join([" ".join(map(str, skills)), " ".join(titles), summary])
+
+
+# ============================
+# BM25 INDEX (hashed, segmented postings)
+# ============================
+class HashedBM25Index:
+    """
+    BM25 over hashed unigram/bigram features.
+
+    New documents are buffered and compiled into immutable, term-sorted
+    posting segments; segments of similar size are merged (log-structured),
+    so adding documents stays cheap and a query is a handful of vectorized
+    `scores[doc_rows] += weights` operations over the whole corpus.
+    Re-adding a document appends a new row and retires the old one (its
+    terms keep counting in document frequencies); once retired rows pass
+    `compact_ratio` of the index, the live rows are rebuilt into a single
+    segment and the statistics recomputed (0 disables it).
+    """
+
+    def __init__(self, compact_ratio: float = COMPACT_RATIO):
+        self.compact_ratio = compact_ratio
+        self.doc_ids = []        # row -> doc_id
+        self._rows = {}          # doc_id -> current row
+        self._retired = []       # rows replaced by a newer version of their document
+        self._lengths = np.empty(0, dtype=np.float32)
+        self._df = np.zeros(N_FEATURES, dtype=np.int32)
+        self._pending = []       # [(terms, tfs)] not yet compiled
+        self._segments = []      # [(terms, ptr, rows, tfs)]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, doc_id, text: str):
+        terms, tfs = np.unique(hash_terms(text), return_counts=True)
+        with self._lock:
+            old = self._rows.get(doc_id)
+            if old is not None:
+                self._retired.append(old)
+            self._rows[doc_id] = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            self._pending.append((terms, tfs.astype(np.float32)))
+
+    @staticmethod
+    def _build_segment(terms, rows, tfs):
+        order = np.argsort(terms, kind="stable")
+        terms, rows, tfs = terms[order], rows[order], tfs[order]
+        uniq, starts = np.unique(terms, return_index=True)
+        ptr = np.append(starts, len(terms)).astype(np.int64)
+        return uniq, ptr, rows, tfs
+
+    @staticmethod
+    def _expand(segment):
+        uniq, ptr, rows, tfs = segment
+        return np.repeat(uniq, np.diff(ptr)), rows, tfs
+
+    def _flush(self):
+        first_row = len(self._lengths)
+        sizes = np.fromiter((len(t) for t, _ in self._pending), dtype=np.int64, count=len(self._pending))
+        terms = np.concatenate([t for t, _ in self._pending])
+        tfs = np.concatenate([f for _, f in self._pending])
+        rows = np.repeat(np.arange(first_row, first_row + len(self._pending), dtype=np.int32), sizes)
+        lengths = np.fromiter((f.sum() for _, f in self._pending), dtype=np.float32, count=len(self._pending))
+
+        self._lengths = np.concatenate((self._lengths, lengths))
+        self._df += np.bincount(terms, minlength=N_FEATURES).astype(np.int32)
+        self._segments.append(self._build_segment(terms, rows, tfs))
+        self._pending = []
+
+        # merge the tail while it is at least half the size of its predecessor
+        while len(self._segments) > 1 and len(self._segments[-1][2]) * 2 >= len(self._segments[-2][2]):
+            b = self._expand(self._segments.pop())
+            a = self._expand(self._segments.pop())
+            self._segments.append(self._build_segment(*(np.concatenate(x) for x in zip(a, b))))
+
+    def _compact(self):
+        live = np.ones(len(self.doc_ids), dtype=bool)
+        live[self._retired] = False
+        new_row = (np.cumsum(live) - 1).astype(np.int32)
+        parts = [self._expand(segment) for segment in self._segments]
+        terms, rows, tfs = (np.concatenate(x) for x in zip(*parts))
+        keep = live[rows]
+        terms, rows, tfs = terms[keep], new_row[rows[keep]], tfs[keep]
+        self._df = np.bincount(terms, minlength=N_FEATURES).astype(np.int32)
+        self._lengths = self._lengths[live]
+        self._segments = [self._build_segment(terms, rows, tfs)] if len(terms) else []
+        self.doc_ids = [doc_id for doc_id, k in zip(self.doc_ids, live) if k]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.doc_ids)}
+        self._retired = []
+
+    def search(self, text: str, top_n: int = 50):
+        """Return [(doc_id, score)] of the `top_n` best documents, best first."""
+        with self._lock:
+            if self._pending:
+                self._flush()
+            if self.compact_ratio and len(self._retired) > self.compact_ratio * len(self.doc_ids):
+                self._compact()
+            n_docs = len(self.doc_ids)
+            if not n_docs:
+                return []
+
+            query = np.unique(hash_terms(text))
+            df = self._df[query]
+            idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+            len_norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths / max(float(self._lengths.mean()), 1e-9))
+
+            scores = np.zeros(n_docs, dtype=np.float32)
+            for uniq, ptr, rows, tfs in self._segments:
+                pos = np.minimum(np.searchsorted(uniq, query), len(uniq) - 1)
+                found = uniq[pos] == query
+                for p, w in zip(pos[found], idf[found]):
+                    r = rows[ptr[p]:ptr[p + 1]]
+                    tf = tfs[ptr[p]:ptr[p + 1]]
+                    # a row appears once per term: plain fancy-index add is safe
+                    scores[r] += w * tf * (BM25_K1 + 1) / (tf + len_norm[r])
+            if self._retired:
+                scores[self._retired] = 0
+
+            top_n = min(top_n, n_docs)
+            best = np.argpartition(-scores, top_n - 1)[:top_n]
+            best = best[np.lexsort((best, -scores[best]))]
+            return [(self.doc_ids[i], float(scores[i])) for i in best if scores[i] > 0]
+
+
+# ============================
+# JOBS INDEX (whole collection)
+# ============================
+_job_index = None
+_job_index_watermark = None
+_job_index_lock = threading.Lock()
+
+
+def get_job_index() -> HashedBM25Index:
+    """
+    Job index over the whole `jobs` collection. Built once, then refreshed
+    with the jobs inserted or changed (updated_at) since the last refresh;
+    a changed job replaces its previous version.
+    """
+    global _job_index, _job_index_watermark
+    with _job_index_lock:
+        if _job_index is None:
+            _job_index = HashedBM25Index()
+            _job_index_watermark = RefreshWatermark("updated_at")
+        watermark = _job_index_watermark
+        for job in iter_jobs(watermark.query(), projection=JOB_TEXT_PROJECTION, sort=watermark.sort()):
+            if not watermark.seen(job):
+                _job_index.add(job["_id"], job_text(job))
+        return _job_index
+
+
+def prefilter_jobs(candidate, top_n: int = 50):
+    """
+    Local retrieval stage: score every job against the candidate (no network)
+    and return the `top_n` best job documents, best first, keeping one job
+    per near-duplicate cluster.
+    """
+    hits = get_job_index().search(candidate_text(candidate), top_n=2 * top_n)
+    if not hits:
+        return []
+    ids = [job_id for job_id, _ in hits]
+    by_id = {j["_id"]: j for j in iter_jobs({"_id": {"$in": ids}}, projection=RANKING_PROJECTION)}
+    jobs = []
+    for job_id, score in hits:
+        job = by_id.get(job_id)
+        if job is not None:
+            job["prefilter_score"] = round(score, 4)
+            jobs.append(job)
+    return one_per_cluster(jobs, limit=top_n)
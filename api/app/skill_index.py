@@ -0,0 +1,264 @@
+import os
+import time
+import threading
+
+import numpy as np
+
+from app.db import RefreshWatermark, iter_jobs
+from app.near_dup import one_per_cluster
+from app.skills import canonicalize_skills, enrich_job
+
+# Weight of a job's nice-to-have skill relative to a required one
+NICE_WEIGHT = float(os.getenv("SKILL_NICE_WEIGHT", "0.5"))
+# Share of retired rows (replaced documents) above which the index is compacted
+COMPACT_RATIO = float(os.getenv("INDEX_COMPACT_RATIO", "0.25"))
+
+MATCH_PROJECTION = {
+    "title": 1, "company": 1, "url": 1, "location": 1, "skills_required": 1, "skills_nice": 1, "dup_cluster": 1,
+}
+SKILL_PROJECTION = {
+    "skills_required": 1, "skills_nice": 1, "title": 1, "description_text": 1, "ingested_at": 1, "updated_at": 1,
+}
+
+
+# A posting list switches to a bitmap once it holds more than 1/DENSE_RATIO
+# of the jobs (an int32 row costs as much as 32 bitmap bits)
+DENSE_RATIO = 32
+# Search samples one row in SAMPLE_STRIDE * top_k to bound the rows it ranks
+SAMPLE_STRIDE = 4
+
+
+class _Postings:
+    """
+    Rows of the jobs listing one skill, roaring-style: a growable sorted
+    int32 array, plus a packed bitmap kept for frequent skills.
+    """
+
+    __slots__ = ("rows", "size", "bits", "bits_size")
+
+    def __init__(self):
+        self.rows = np.empty(16, dtype=np.int32)
+        self.size = 0
+        self.bits = None
+        self.bits_size = 0
+
+    def append(self, row: int):
+        if self.size == len(self.rows):
+            self.rows = np.resize(self.rows, 2 * self.size)
+        self.rows[self.size] = row
+        self.size += 1
+
+    def dense(self, n_docs: int) -> bool:
+        return self.size * DENSE_RATIO >= n_docs
+
+    def bitmap(self, capacity: int):
+        """Packed bitmap over `capacity` rows, brought up to date with new rows."""
+        if self.bits is None or len(self.bits) * 8 < capacity:
+            mask = np.zeros(capacity, dtype=bool)
+            mask[self.rows[:self.size]] = True
+            self.bits = np.packbits(mask)
+        elif self.bits_size < self.size:
+            tail = self.rows[self.bits_size:self.size]
+            np.bitwise_or.at(self.bits, tail >> 3, (128 >> (tail & 7)).astype(np.uint8))
+        self.bits_size = self.size
+        return self.bits
+
+
+class SkillIndex:
+    """
+    Inverted index skill → jobs, for instant skill-overlap matching.
+
+    Each skill keeps two posting lists (jobs requiring it, jobs listing it
+    as nice-to-have). A search adds the postings of the candidate's skills
+    into per-job counters: bitmaps of frequent skills are unpacked and
+    added densely, rare skills are added by row. The score is the share of
+    the job's weighted skills (1 required, NICE_WEIGHT nice) covered by
+    the candidate. Re-adding a document appends a new row and retires the
+    old one (it never matches again); once retired rows pass `compact_ratio`
+    of the index, the live rows are renumbered densely (0 disables it, for
+    callers that keep their own row-aligned data).
+    """
+
+    def __init__(self, nice_weight: float = NICE_WEIGHT, compact_ratio: float = COMPACT_RATIO):
+        self.nice_weight = nice_weight
+        self.compact_ratio = compact_ratio
+        self.doc_ids = []        # row -> doc_id
+        self._rows = {}          # doc_id -> current row
+        self._retired = []       # rows replaced by a newer version of their document
+        self._totals = np.zeros(1024, dtype=np.float32)
+        self._required = {}
+        self._nice = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    @staticmethod
+    def _key(skill: str) -> str:
+        return skill.strip().lower()
+
+    def add(self, doc_id, required, nice=()):
+        required = {self._key(s) for s in canonicalize_skills(required)}
+        nice = {self._key(s) for s in canonicalize_skills(nice)} - required
+        with self._lock:
+            row = len(self.doc_ids)
+            old = self._rows.get(doc_id)
+            if old is not None:
+                self._retired.append(old)
+            self._rows[doc_id] = row
+            self.doc_ids.append(doc_id)
+            if row == len(self._totals):
+                self._totals = np.concatenate([self._totals, np.zeros(row, dtype=np.float32)])
+            # jobs without skills never match: any non-zero total avoids 0/0
+            self._totals[row] = (len(required) + self.nice_weight * len(nice)) or 1.0
+            for skills, lists in ((required, self._required), (nice, self._nice)):
+                for skill in skills:
+                    postings = lists.get(skill)
+                    if postings is None:
+                        postings = lists[skill] = _Postings()
+                    postings.append(row)
+            if old is not None and self.compact_ratio and len(self._retired) > self.compact_ratio * len(self.doc_ids):
+                self._compact()
+
+    def _compact(self):
+        live = np.ones(len(self.doc_ids), dtype=bool)
+        live[self._retired] = False
+        new_row = (np.cumsum(live) - 1).astype(np.int32)
+        for lists in (self._required, self._nice):
+            for key, postings in list(lists.items()):
+                rows = postings.rows[:postings.size]
+                rows = new_row[rows[live[rows]]]
+                if not len(rows):
+                    del lists[key]
+                    continue
+                compacted = lists[key] = _Postings()
+                compacted.rows, compacted.size = rows, len(rows)
+        totals = self._totals[:len(live)][live]
+        self._totals = np.zeros(max(len(totals), 1024), dtype=np.float32)
+        self._totals[:len(totals)] = totals
+        self.doc_ids = [doc_id for doc_id, keep in zip(self.doc_ids, live) if keep]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.doc_ids)}
+        self._retired = []
+
+    def _count(self, lists, keys, n_docs: int):
+        capacity = len(self._totals)
+        # uint8: a job would need more than 255 matched skills to overflow
+        counts = np.zeros(n_docs, dtype=np.uint8)
+        for key in keys:
+            postings = lists.get(key)
+            if postings is None:
+                continue
+            if postings.dense(n_docs):
+                counts += np.unpackbits(postings.bitmap(capacity), count=n_docs)
+            else:
+                # rows are unique within a posting list: plain fancy-index add is safe
+                counts[postings.rows[:postings.size]] += 1
+        if self._retired:
+            counts[self._retired] = 0
+        return counts
+
+    def counts(self, skills, nice: bool = False) -> np.ndarray:
+        """Per row, how many of `skills` the document lists as required (or nice-to-have)."""
+        keys = {self._key(s) for s in canonicalize_skills(skills)}
+        with self._lock:
+            n_docs = len(self.doc_ids)
+            if not n_docs or not keys:
+                return np.zeros(n_docs, dtype=np.uint8)
+            return self._count(self._nice if nice else self._required, keys, n_docs)
+
+    def search(self, skills, top_k: int = 10, min_row: int = 0):
+        """
+        [(doc_id, score, matched_weight)] for the `top_k` best-covered jobs,
+        among the rows added from `min_row` on.
+        """
+        keys = {self._key(s) for s in canonicalize_skills(skills)}
+        with self._lock:
+            n_docs = len(self.doc_ids)
+            if n_docs <= min_row or not keys or top_k <= 0:
+                return []
+            required = self._count(self._required, keys, n_docs)
+            nice = self._count(self._nice, keys, n_docs)
+            score = required.astype(np.float32)
+            score += np.float32(self.nice_weight) * nice
+            score /= self._totals[:n_docs]
+            score[:min_row] = 0
+
+            # only rows at or above a score threshold are ranked: the best
+            # scores of a strided sample, lowered until at least top_k rows
+            # pass (they then hold the top_k), every matching row at worst
+            sample = np.sort(score[::SAMPLE_STRIDE * top_k])[::-1]
+            i = 0
+            while True:
+                threshold = sample[i] if i < len(sample) else 0
+                hit = np.flatnonzero(score >= threshold) if threshold > 0 else np.flatnonzero(score)
+                if len(hit) >= top_k or threshold <= 0:
+                    break
+                i = 2 * i + 1
+            if not len(hit):
+                return []
+            matched = required[hit].astype(np.float32)
+            matched += self.nice_weight * nice[hit]
+            score = score[hit]
+
+            if top_k < len(hit):
+                # every row tied with the k-th score, so that ties break the same way
+                kth = np.partition(score, len(hit) - top_k)[len(hit) - top_k]
+                best = np.flatnonzero(score >= kth)
+            else:
+                best = np.arange(len(hit))
+            # best coverage first, then most matched skills, then insertion order
+            best = best[np.lexsort((hit[best], -matched[best], -score[best]))][:top_k]
+            return [(self.doc_ids[hit[i]], float(score[i]), float(matched[i])) for i in best]
+
+
+# ============================
+# JOBS SKILL INDEX (whole collection)
+# ============================
+_skill_index = None
+_skill_index_watermark = None
+_skill_index_lock = threading.Lock()
+
+
+def get_skill_index() -> SkillIndex:
+    """
+    Skill index over the whole `jobs` collection. Built once, then
+    refreshed with the jobs inserted or changed (updated_at) since the last
+    refresh; a changed job replaces its previous version.
+    """
+    global _skill_index, _skill_index_watermark
+    with _skill_index_lock:
+        if _skill_index is None:
+            _skill_index = SkillIndex()
+            _skill_index_watermark = RefreshWatermark("updated_at")
+        watermark = _skill_index_watermark
+        for job in iter_jobs(watermark.query(), projection=SKILL_PROJECTION, sort=watermark.sort()):
+            if watermark.seen(job):
+                continue
+            # jobs ingested before skills were extracted server-side
+            enrich_job(job)
+            _skill_index.add(job["_id"], job.get("skills_required") or [], job.get("skills_nice") or [])
+        return _skill_index
+
+
+def fast_match(skills, top_k: int = 10):
+    """
+    Score `skills` against every job (no LLM) and return the `top_k` best
+    job documents with their score (one per near-duplicate cluster), plus
+    the index search time in ms.
+    """
+    index = get_skill_index()
+    start = time.perf_counter()
+    hits = index.search(skills, top_k=2 * top_k)
+    took_ms = (time.perf_counter() - start) * 1000
+
+    ids = [job_id for job_id, _, _ in hits]
+    by_id = {j["_id"]: j for j in iter_jobs({"_id": {"$in": ids}}, projection=MATCH_PROJECTION)}
+    jobs = []
+    for job_id, score, matched in hits:
+        job = by_id.get(job_id)
+        if job is not None:
+            job["_id"] = str(job["_id"])
+            job["score"] = round(score, 4)
+            job["matched_weight"] = matched
+            jobs.append(job)
+    return {"jobs": one_per_cluster(jobs, limit=top_k), "indexed": len(index), "took_ms": round(took_ms, 3)}
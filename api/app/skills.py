@@ -0,0 +1,351 @@
+import hashlib
+import json
+import re
+import unicodedata
+
+# ===============================
+#   SKILL TAXONOMY
+# ===============================
+# canonical name -> synonyms (matched on normalized tokens, accents stripped).
+# Only synonyms are searched in texts: canonical names such as "C", "Go" or
+# "Tableau" are ambiguous words and are only used to canonicalize skill lists.
+TAXONOMY = {
+    # --- languages ---
+    "Python": ["python", "python3"],
+    "Java": ["java", "j2ee", "jee"],
+    "JavaScript": ["javascript", "js", "ecmascript", "es6"],
+    "TypeScript": ["typescript"],
+    "C": ["langage c"],
+    "C++": ["c++", "cpp"],
+    "C#": ["c#", "csharp"],
+    ".NET": ["dotnet", "asp.net", "vb.net", ".net core", "net core"],
+    "Go": ["golang"],
+    "Rust": ["rust", "rustlang"],
+    "Scala": ["scala"],
+    "Kotlin": ["kotlin"],
+    "Swift": ["swift", "swiftui"],
+    "PHP": ["php"],
+    "Ruby": ["ruby", "ruby on rails", "rails"],
+    "R": ["langage r", "rstudio"],
+    "SQL": ["sql", "t-sql", "pl/sql", "plsql", "tsql"],
+    "Bash": ["bash", "shell scripting", "scripting shell", "shell unix"],
+    "MATLAB": ["matlab"],
+    "VBA": ["vba"],
+    # --- web / frameworks ---
+    "React": ["react", "react.js", "reactjs", "react native"],
+    "Angular": ["angular", "angularjs"],
+    "Vue.js": ["vue.js", "vuejs", "vue 3"],
+    "Node.js": ["node", "node.js", "nodejs"],
+    "Django": ["django"],
+    "Flask": ["flask"],
+    "FastAPI": ["fastapi"],
+    "Spring": ["spring boot", "springboot", "spring framework"],
+    "Symfony": ["symfony"],
+    "Laravel": ["laravel"],
+    "HTML/CSS": ["html", "css", "html5", "css3", "sass"],
+    "REST APIs": ["restful", "api rest", "apis rest", "rest api", "rest apis"],
+    "GraphQL": ["graphql"],
+    # --- data ---
+    "Spark": ["spark", "pyspark", "apache spark"],
+    "Hadoop": ["hadoop", "hdfs", "hive"],
+    "Kafka": ["kafka", "apache kafka"],
+    "Airflow": ["airflow", "apache airflow"],
+    "dbt": ["dbt"],
+    "Pandas": ["pandas"],
+    "NumPy": ["numpy"],
+    "ETL": ["etl", "elt"],
+    "Data Warehouse": ["data warehouse", "datawarehouse", "entrepot de donnees"],
+    "Snowflake": ["snowflake"],
+    "Databricks": ["databricks"],
+    "BigQuery": ["bigquery"],
+    "Power BI": ["power bi", "powerbi"],
+    "Tableau": ["tableau software", "tableau desktop"],
+    "Looker": ["looker"],
+    "Excel": ["excel", "ms excel", "microsoft excel"],
+    "Machine Learning": ["machine learning", "apprentissage automatique", "ml", "mlops"],
+    "Deep Learning": ["deep learning", "apprentissage profond"],
+    "NLP": ["nlp", "natural language processing", "traitement du langage"],
+    "Computer Vision": ["computer vision", "vision par ordinateur"],
+    "LLM": ["llm", "llms", "large language models", "genai", "generative ai", "ia generative"],
+    "TensorFlow": ["tensorflow"],
+    "PyTorch": ["pytorch"],
+    "scikit-learn": ["scikit-learn", "sklearn"],
+    "Statistics": ["statistics", "statistiques"],
+    # --- databases ---
+    "PostgreSQL": ["postgresql", "postgres"],
+    "MySQL": ["mysql", "mariadb"],
+    "Oracle": ["oracle", "oracle db"],
+    "SQL Server": ["sql server", "mssql"],
+    "MongoDB": ["mongodb", "mongo"],
+    "Redis": ["redis"],
+    "Elasticsearch": ["elasticsearch", "elastic search", "elk"],
+    "Cassandra": ["cassandra"],
+    # --- cloud / devops ---
+    "AWS": ["aws", "amazon web services", "ec2"],
+    "Azure": ["azure", "microsoft azure"],
+    "GCP": ["gcp", "google cloud", "google cloud platform"],
+    "Docker": ["docker", "conteneurs docker"],
+    "Kubernetes": ["kubernetes", "k8s", "openshift"],
+    "Terraform": ["terraform"],
+    "Ansible": ["ansible"],
+    "CI/CD": ["ci/cd", "ci cd", "continuous integration", "integration continue"],
+    "Jenkins": ["jenkins"],
+    "GitLab CI": ["gitlab ci", "gitlab-ci"],
+    "GitHub Actions": ["github actions"],
+    "Git": ["git", "github", "gitlab", "bitbucket"],
+    "Linux": ["linux", "unix", "debian", "ubuntu", "redhat", "red hat"],
+    "Windows Server": ["windows server"],
+    "Networking": ["tcp/ip", "administration reseau", "reseaux informatiques", "networking", "cisco", "vpn"],
+    "Cybersecurity": ["cybersecurity", "cybersecurite", "securite informatique", "siem", "pentest"],
+    "Monitoring": ["prometheus", "grafana", "datadog", "monitoring"],
+    "Microservices": ["microservices", "micro-services"],
+    # --- methods / tools ---
+    "Agile": ["agile", "agilite"],
+    "Scrum": ["scrum"],
+    "Kanban": ["kanban"],
+    "Jira": ["jira"],
+    "Confluence": ["confluence"],
+    "UML": ["uml"],
+    "Project Management": ["gestion de projet", "project management", "pmp", "prince2"],
+    "Product Management": ["product management", "product owner", "gestion de produit"],
+    # --- business ---
+    "SAP": ["sap"],
+    "Salesforce": ["salesforce"],
+    "CRM": ["crm"],
+    "ERP": ["erp"],
+    "Accounting": ["comptabilite", "accounting", "comptable"],
+    "Financial Analysis": ["analyse financiere", "financial analysis", "controle de gestion", "fp&a"],
+    "Payroll": ["paie", "payroll"],
+    "Recruitment": ["recrutement", "recruitment", "talent acquisition"],
+    "Digital Marketing": ["marketing digital", "digital marketing", "webmarketing"],
+    "SEO": ["seo", "referencement naturel"],
+    "SEA": ["google ads", "adwords"],
+    "Social Media": ["social media", "reseaux sociaux", "community management"],
+    "Sales": ["vente", "sales", "b2b sales", "business development", "developpement commercial", "prospection"],
+    "Customer Support": ["support client", "customer support", "service client", "helpdesk"],
+    "Logistics": ["logistique", "logistics", "supply chain", "approvisionnement"],
+    "Quality": ["controle qualite", "quality assurance", "iso 9001", "assurance qualite"],
+    "Testing": ["tests automatises", "test automation", "selenium", "cypress", "qa"],
+    # --- languages (spoken) ---
+    "English": ["anglais", "english"],
+    "French": ["francais", "french"],
+    "German": ["allemand", "german"],
+    "Spanish": ["espagnol", "spanish"],
+}
+
+# Content digest of the taxonomy: cached CV extractions are keyed on it, so
+# adding a skill or a synonym invalidates them without a manual bump
+TAXONOMY_VERSION = hashlib.sha256(json.dumps(TAXONOMY, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+# Single-word synonyms that are also common words ("excel at", "react quickly",
+# "a central node", "Swift decision making"): only matched capitalized, and
+# either as a whole list item ("Python, React, Node") or next to another
+# skill ("React and TypeScript")
+AMBIGUOUS = {"swift", "react", "node", "excel", "rust", "sales", "ml"}
+CONJUNCTIONS = {"and", "et", "or", "ou", "&", "+"}
+
+# Lines flagging optional skills ("nice to have", "un plus", ...)
+NICE_MARKERS = re.compile(
+    r"nice to have|would be a plus|is a plus|a plus\b|bonus|preferred|ideally|"
+    r"un plus|un atout|atout|apprecie|souhaite|idealement|serait un",
+)
+# Every NICE_MARKERS match contains one of these: only the lines around
+# their occurrences are checked against the regex
+NICE_ANCHORS = ("nice to have", "plus", "bonus", "prefer", "ideal", "atout", "apprecie", "souhaite", "serait un")
+
+LINE_SPLIT_RE = re.compile(r"[\n;]|\.\s")
+TOKEN_RE = re.compile(r"[a-z0-9+#&]+(?:[./\-][a-z0-9+#&]+)*")
+CASED_TOKEN_RE = re.compile(TOKEN_RE.pattern, re.I)
+LIST_SPLIT_RE = re.compile(r"\s*[,/|•·()]\s*|\s+[-–]\s+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase and strip accents (NFKD → ASCII)."""
+    return fold(text).lower()
+
+
+def fold(text: str) -> str:
+    """Strip accents (NFKD → ASCII), case kept."""
+    if not text or text.isascii():
+        return text or ""
+    text = unicodedata.normalize("NFKD", text)
+    return text.encode("ascii", "ignore").decode("ascii")
+
+
+def line_span(text: str, pos: int):
+    """(start, end) of the LINE_SPLIT_RE line of `text` holding `pos`."""
+    start = max(text.rfind("\n", 0, pos), text.rfind(";", 0, pos)) + 1
+    for m in LINE_SPLIT_RE.finditer(text, start, pos):
+        start = m.end()
+    m = LINE_SPLIT_RE.search(text, pos)
+    return start, m.start() if m else len(text)
+
+
+def find_lines(text: str, needles):
+    """Sorted (start, end) spans of the lines of `text` containing any of `needles`."""
+    spans = set()
+    for needle in needles:
+        pos = text.find(needle)
+        while pos >= 0:
+            span = line_span(text, pos)
+            spans.add(span)
+            pos = text.find(needle, max(span[1], pos + 1))
+    return sorted(spans)
+
+
+def tokenize(text: str):
+    return TOKEN_RE.findall(normalize(text))
+
+
+# ===============================
+#   MULTI-PATTERN MATCHER
+# ===============================
+class SkillMatcher:
+    """
+    Matches every synonym of the taxonomy in one pass over a text.
+
+    Patterns are token sequences. Single-token patterns are resolved by a
+    set intersection with the text's tokens; multi-token patterns are
+    indexed by their first token and only verified (substring search on
+    the space-joined tokens) when that token occurs. Everything but the
+    final loop over hits runs in C. `ambiguous` synonyms are only checked
+    in context, and only when one of them occurs.
+    """
+
+    def __init__(self, taxonomy: dict, ambiguous=AMBIGUOUS):
+        self.single = {}      # token -> canonical
+        self.ambiguous = {}   # token -> canonical, matched in context only
+        self.phrases = {}     # first token -> [(" a b ", canonical)]
+        self.canonical = {}   # normalized name/synonym -> canonical
+        for canonical, synonyms in taxonomy.items():
+            self.canonical[" ".join(tokenize(canonical))] = canonical
+            for pattern in synonyms:
+                tokens = tokenize(pattern)
+                if not tokens:
+                    continue
+                self.canonical[" ".join(tokens)] = canonical
+                if len(tokens) == 1:
+                    (self.ambiguous if tokens[0] in ambiguous else self.single)[tokens[0]] = canonical
+                else:
+                    self.phrases.setdefault(tokens[0], []).append((f" {' '.join(tokens)} ", canonical))
+        self._single_keys = set(self.single)
+        self._ambiguous_keys = set(self.ambiguous)
+        self._phrase_keys = set(self.phrases)
+
+    def _match_tokens(self, tokens):
+        found = set()
+        present = set(tokens)
+        for t in present & self._single_keys:
+            found.add(self.single[t])
+        starts = present & self._phrase_keys
+        if starts:
+            joined = f" {' '.join(tokens)} "
+            for t in starts:
+                for phrase, canonical in self.phrases[t]:
+                    if phrase in joined:
+                        found.add(canonical)
+        return found
+
+    def _ambiguous_in_context(self, text: str, lowered: str, present):
+        """
+        Ambiguous skills of `text` (accents folded, case kept; `lowered` is
+        its lowercase) written as skills. Only the lines where one of the
+        `present` ambiguous tokens occurs are tokenized again.
+        """
+        found = set()
+        for start, end in find_lines(lowered, present):
+            line = text[start:end]
+            words = CASED_TOKEN_RE.findall(line)
+            lowered_words = TOKEN_RE.findall(lowered[start:end])
+            items = None
+            for i, word in enumerate(words):
+                if lowered_words[i] not in self.ambiguous or not word[0].isupper():
+                    continue
+                if items is None:
+                    items = {item.rsplit(":", 1)[-1].strip(" .") for item in LIST_SPLIT_RE.split(line)}
+                if word in items or self._next_to_skill(lowered_words, i):
+                    found.add(self.ambiguous[lowered_words[i]])
+        return found
+
+    def _next_to_skill(self, tokens, i: int) -> bool:
+        for step in (-1, 1):
+            j = i + step
+            while 0 <= j < len(tokens) and tokens[j] in CONJUNCTIONS:
+                j += step
+            if 0 <= j < len(tokens) and (tokens[j] in self._single_keys or tokens[j] in self._phrase_keys):
+                return True
+        return False
+
+    def _match_text(self, text: str):
+        lowered = text.lower()
+        tokens = TOKEN_RE.findall(lowered)
+        found = self._match_tokens(tokens)
+        present = self._ambiguous_keys.intersection(tokens)
+        if present:
+            found |= self._ambiguous_in_context(text, lowered, present)
+        return found
+
+    def match(self, text: str):
+        """Canonical skills mentioned in `text`, sorted."""
+        return sorted(self._match_text(fold(text)))
+
+    def extract(self, text: str):
+        """
+        Split the skills of a job description into (required, nice):
+        skills only mentioned on "nice to have" lines are optional.
+        """
+        folded = fold(text)
+        lowered = folded.lower()
+        spans = [(start, end) for start, end in find_lines(lowered, NICE_ANCHORS)
+                 if NICE_MARKERS.search(lowered, start, end)]
+        if not spans:
+            return sorted(self._match_text(folded)), []
+
+        nice_lines, other_lines, last = [], [], 0
+        for start, end in spans:
+            other_lines.append(folded[last:start])
+            nice_lines.append(folded[start:end])
+            last = end
+        other_lines.append(folded[last:])
+        required = self._match_text("\n".join(other_lines))
+        nice = self._match_text("\n".join(nice_lines))
+        return sorted(required), sorted(nice - required)
+
+    def canonicalize(self, skills):
+        """Map free-form skills to canonical names (unknown ones kept as-is), deduplicated."""
+        out, seen = [], set()
+        for skill in skills or []:
+            if not isinstance(skill, str) or not skill.strip():
+                continue
+            key = " ".join(tokenize(skill))
+            name = self.canonical.get(key)
+            if name is None:
+                # an entry of a skills list: ambiguous synonyms count ("React hooks")
+                tokens = tokenize(skill)
+                hits = self._match_tokens(tokens) | {self.ambiguous[t] for t in tokens if t in self.ambiguous}
+                name = next(iter(hits)) if len(hits) == 1 else skill.strip()
+            if name.lower() not in seen:
+                seen.add(name.lower())
+                out.append(name)
+        return out
+
+
+matcher = SkillMatcher(TAXONOMY)
+
+
+def extract_skills(text: str):
+    """(skills_required, skills_nice) found in a job description."""
+    return matcher.extract(text)
+
+
+def canonicalize_skills(skills):
+    return matcher.canonicalize(skills)
+
+
+def enrich_job(job: dict) -> dict:
+    """Fill skills_required/skills_nice from the description when both are empty."""
+    if not job.get("skills_required") and not job.get("skills_nice"):
+        required, nice = extract_skills(f"{job.get('title') or ''}\n{job.get('description_text') or ''}")
+        job["skills_required"] = required
+        job["skills_nice"] = nice
+    return job
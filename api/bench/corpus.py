@@ -0,0 +1,136 @@
+"""
+Synthetic, seeded benchmark corpus: CV PDFs and raw jobspy rows.
+
+    python -m bench.corpus --out /tmp/corpus --cvs 20 --jobs 1000
+writes cv_<n>.pdf files and a jobspy_bench.jsonl usable by the normalizer.
+"""
+import os
+import json
+import random
+import argparse
+
+import fitz
+
+FIRST_NAMES = ["Amine", "Sara", "Youssef", "Lina", "Karim", "Nadia", "Omar", "Julie", "Thomas", "Ines"]
+LAST_NAMES = ["Benali", "Martin", "El Idrissi", "Dubois", "Haddad", "Bernard", "Alaoui", "Petit"]
+TITLES = [
+    "Data Engineer", "Data Scientist", "Backend Developer", "DevOps Engineer", "Frontend Developer",
+    "Business Analyst", "Chargé de recrutement", "Comptable", "Chef de projet digital", "Ingénieur QA",
+]
+SKILLS = [
+    "Python", "SQL", "Spark", "Airflow", "Docker", "Kubernetes", "AWS", "Azure", "Terraform", "Java",
+    "Spring Boot", "React", "TypeScript", "Node.js", "PostgreSQL", "MongoDB", "Kafka", "Power BI",
+    "Excel", "Machine Learning", "Pandas", "Git", "Linux", "Scrum", "Jira", "SAP", "Salesforce",
+]
+COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Vandelay", "Stark", "Wayne"]
+CITIES = [("Casablanca", "Morocco"), ("Rabat", "Morocco"), ("Paris", "France"), ("Lyon", "France"),
+          ("Montreal", "Canada"), ("Bruxelles", "Belgium")]
+SITES = ["indeed", "linkedin", "glassdoor"]
+
+BOILERPLATE = (
+    "**À propos de nous**\n\nNous sommes une entreprise en forte croissance, engagée pour la diversité "
+    "et l'inclusion. Tous nos postes sont ouverts aux personnes en situation de handicap.\n\n"
+    "**Avantages**\n\n* Mutuelle\n* Tickets restaurant\n* Télétravail partiel\n"
+)
+FILLER = (
+    "Conception et maintenance de pipelines, revue de code, documentation et accompagnement des équipes "
+    "métier. Participation aux rituels agiles et amélioration continue des processus."
+)
+
+
+def make_cv_text(i: int, rng: random.Random, pages: int = 1) -> str:
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}"
+    title = rng.choice(TITLES)
+    skills = rng.sample(SKILLS, rng.randint(5, 12))
+    lines = [
+        name,
+        title,
+        f"Skills: {', '.join(skills)}",
+        "",
+        "Experience",
+    ]
+    for _ in range(rng.randint(2, 4) * pages):
+        lines.append(f"{rng.choice(TITLES)} - {rng.choice(COMPANIES)} ({rng.randint(2012, 2024)})")
+        lines.append(FILLER)
+    lines += [
+        "",
+        "Education",
+        f"Master - Université {rng.choice(CITIES)[0]} ({rng.randint(2010, 2022)})",
+        "",
+        "Languages",
+        "Français (C2), Anglais (C1)",
+    ]
+    return "\n".join(lines)
+
+
+def make_cv_pdf(i: int, rng: random.Random, pages: int = 1) -> bytes:
+    """A text PDF of `pages`-ish pages with clear Skills/Experience/Education sections."""
+    text = make_cv_text(i, rng, pages)
+    doc = fitz.open()
+    lines = text.splitlines()
+    per_page = 45
+    for start in range(0, len(lines), per_page):
+        page = doc.new_page()
+        y = 50
+        for line in lines[start:start + per_page]:
+            # wrap long lines roughly at 95 chars
+            for k in range(0, max(len(line), 1), 95):
+                page.insert_text((40, y), line[k:k + 95], fontsize=9)
+                y += 12
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def make_jobspy_row(i: int, rng: random.Random) -> dict:
+    """One raw row shaped like jobspy's scrape_jobs output."""
+    title = rng.choice(TITLES)
+    city, country = rng.choice(CITIES)
+    required = rng.sample(SKILLS, rng.randint(3, 7))
+    nice = rng.sample([s for s in SKILLS if s not in required], 2)
+    description = (
+        f"## {title}\n\n{BOILERPLATE}\n**Missions**\n\n{FILLER}\n\n"
+        f"**Profil recherché**\n\n* Maîtrise de {', '.join(required)}\n"
+        f"* {rng.randint(1, 8)} ans d'expérience\n* {', '.join(nice)} serait un plus\n\n{BOILERPLATE}"
+    )
+    return {
+        "site": rng.choice(SITES),
+        "job_url": f"https://jobs.example.com/{i}",
+        "title": title,
+        "company": rng.choice(COMPANIES),
+        "location": f"{city}, {country}",
+        "is_remote": rng.random() < 0.2,
+        "description": description,
+        "job_type": rng.choice(["fulltime", "contract", "internship"]),
+        "date_posted": "2024-05-01",
+        "search_country": country,
+    }
+
+
+def cv_corpus(n: int, seed: int = 0, pages: int = 1):
+    rng = random.Random(seed)
+    return [make_cv_pdf(i, rng, pages) for i in range(n)]
+
+
+def jobspy_corpus(n: int, seed: int = 0):
+    rng = random.Random(seed + 1)
+    return [make_jobspy_row(i, rng) for i in range(n)]
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser("Synthetic benchmark corpus")
+    p.add_argument("--out", required=True)
+    p.add_argument("--cvs", type=int, default=20)
+    p.add_argument("--jobs", type=int, default=1000)
+    p.add_argument("--pages", type=int, default=1)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    for i, pdf in enumerate(cv_corpus(args.cvs, args.seed, args.pages)):
+        with open(os.path.join(args.out, f"cv_{i}.pdf"), "wb") as f:
+            f.write(pdf)
+    with open(os.path.join(args.out, "jobspy_bench.jsonl"), "w", encoding="utf-8") as f:
+        for row in jobspy_corpus(args.jobs, args.seed):
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    print(f"[INFO] {args.cvs} CVs + {args.jobs} jobspy rows written to {args.out}")
@@ -0,0 +1,189 @@
+"""
+Local stand-in for the OpenRouter chat completions API.
+
+Answers the prompts this service sends (CV extraction, job and candidate
+ranking, plain pings) with plausible JSON, after a configurable latency and a simulated
+generation speed. Can inject malformed JSON and retryable HTTP errors.
+
+    python -m bench.fake_openrouter --port 8099 --latency 0.3 --malformed-rate 0.05
+    OPENROUTER_BASE_URL=http://127.0.0.1:8099 uvicorn app.main:app
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+JOB_RE = re.compile(r"^JOB (\d+):", re.M)
+CANDIDATE_RE = re.compile(r"^CANDIDATE (\d+):", re.M)
+MAX_RE = re.compile(r"\bmax (\d+) objects")
+SKILLS_RE = re.compile(r"^Skills\s*:\s*(.+)$", re.M | re.I)
+
+
+def _tokens(text: str) -> int:
+    # ~4 characters per token, close enough for load generation
+    return max(1, len(text) // 4)
+
+
+def _cv_answer(prompt: str) -> str:
+    cv_text = prompt.split("CV TEXT:", 1)[-1].strip()
+    lines = [l.strip() for l in cv_text.splitlines() if l.strip()]
+    m = SKILLS_RE.search(cv_text)
+    skills = [s.strip() for s in m.group(1).split(",")] if m else ["Python", "SQL"]
+    return json.dumps({
+        "full_name": lines[0] if lines else "",
+        "skills": skills,
+        "languages": [{"name": "English", "level": "C1"}],
+        "experiences": [{"title": lines[1] if len(lines) > 1 else "", "company": "Acme", "years": "3"}],
+        "education": [{"degree": "MSc", "school": "University", "year": "2019"}],
+        "summary": " ".join(lines[1:4])[:300],
+    })
+
+
+def _ranking_answer(prompt: str, rng: random.Random, pattern=JOB_RE, key: str = "job_index") -> str:
+    n_jobs = len(pattern.findall(prompt))
+    m = MAX_RE.search(prompt)
+    limit = int(m.group(1)) if m else n_jobs
+    scores = [{key: i + 1, "score": round(rng.random(), 2)} for i in range(n_jobs)]
+    scores.sort(key=lambda s: -s["score"])
+    return json.dumps(scores[:limit])
+
+
+class FakeOpenRouter:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.2,
+        jitter: float = 0.05,
+        tokens_per_s: float = 200.0,
+        malformed_rate: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_s = tokens_per_s
+        self.malformed_rate = malformed_rate
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.stats = {"requests": 0, "errors": 0, "malformed": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _draw(self):
+        with self._lock:
+            return self.rng.random(), self.rng.random(), random.Random(self.rng.random())
+
+    def _count(self, **inc):
+        with self._lock:
+            for key, value in inc.items():
+                self.stats[key] += value
+
+    def complete(self, payload: dict):
+        """(status, body) for one /chat/completions request."""
+        fail, malformed, rng = self._draw()
+        self._count(requests=1)
+        if fail < self.error_rate:
+            self._count(errors=1)
+            time.sleep(self.latency)
+            return 503, {"error": {"message": "upstream overloaded (injected)"}}
+
+        prompt = "\n".join(str(m.get("content", "")) for m in payload.get("messages", []))
+        if "CV TEXT:" in prompt:
+            content = _cv_answer(prompt)
+        elif JOB_RE.search(prompt):
+            content = _ranking_answer(prompt, rng)
+        elif CANDIDATE_RE.search(prompt):
+            content = _ranking_answer(prompt, rng, CANDIDATE_RE, "candidate_index")
+        else:
+            content = "YES"
+
+        if malformed < self.malformed_rate and content != "YES":
+            self._count(malformed=1)
+            # truncated generation: no JSON can be recovered from it
+            content = "Sure! Here is the result:\n" + content[: len(content) // 2]
+
+        prompt_tokens, completion_tokens = _tokens(prompt), _tokens(content)
+        self._count(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+        delay = self.latency + rng.uniform(-self.jitter, self.jitter)
+        if self.tokens_per_s > 0:
+            delay += completion_tokens / self.tokens_per_s
+        time.sleep(max(0.0, delay))
+
+        return 200, {
+            "id": f"gen-{self.stats['requests']}",
+            "model": payload.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                try:
+                    payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                except ValueError:
+                    self.send_error(400)
+                    return
+                status, body = fake.complete(payload)
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser("Fake OpenRouter server")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8099)
+    p.add_argument("--latency", type=float, default=0.2, help="Base latency per call (s)")
+    p.add_argument("--jitter", type=float, default=0.05)
+    p.add_argument("--tokens-per-s", type=float, default=200.0, help="Simulated generation speed (0 = instant)")
+    p.add_argument("--malformed-rate", type=float, default=0.0, help="Share of truncated/invalid JSON answers")
+    p.add_argument("--error-rate", type=float, default=0.0, help="Share of HTTP 503 answers")
+    args = p.parse_args()
+
+    fake = FakeOpenRouter(
+        args.host, args.port, args.latency, args.jitter, args.tokens_per_s, args.malformed_rate, args.error_rate
+    )
+    print(f"[INFO] Fake OpenRouter on {fake.base_url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
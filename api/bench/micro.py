@@ -0,0 +1,100 @@
+"""
+In-process micro-benchmarks of the local matching paths (no API, no Mongo):
+
+    cd api
+    python -m bench.micro --jobs 500000
+    python -m bench.micro --scenarios skill_search --jobs 100000 --max-ms 10
+    python -m bench.micro --scenarios extract_skills --min-per-s 10000
+
+skill_search: SkillIndex.search over `--jobs` synthetic jobs, with a skewed
+(few frequent skills) and a uniform skill distribution. Reports ms per
+query; exits 1 when a p95 exceeds --max-ms.
+
+extract_skills: app.skills.extract_skills over `--descriptions` jobspy-like
+descriptions (bench.corpus, ~0.9 KB, French, with "serait un plus" lines)
+on one core. Reports descriptions/s; exits 1 when below --min-per-s.
+"""
+import sys
+import time
+import random
+import argparse
+
+from app.skill_index import SkillIndex
+from app.skills import TAXONOMY, extract_skills
+from bench.corpus import jobspy_corpus
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def _timed(fn, args_list) -> dict:
+    fn(args_list[0])  # warm-up
+    times = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(args)
+        times.append((time.perf_counter() - start) * 1000)
+    return {"p50_ms": round(percentile(times, 0.5), 3), "p95_ms": round(percentile(times, 0.95), 3)}
+
+
+def bench_skill_search(n_jobs: int, queries: int, seed: int) -> dict:
+    vocab = sorted(TAXONOMY)
+    results = {}
+    for shape in ("skewed", "uniform"):
+        rng = random.Random(seed)
+        # skewed: Zipf-like skill frequencies, 2-8 skills per job; uniform: 9 skills
+        weights = [1.0 / (i + 1) for i in range(len(vocab))] if shape == "skewed" else None
+        index = SkillIndex()
+        for i in range(n_jobs):
+            k = rng.randint(2, 8) if shape == "skewed" else 9
+            skills = rng.choices(vocab, weights=weights, k=k)
+            index.add(i, skills[:-2], skills[-2:])
+        qs = [rng.sample(vocab, 8) for _ in range(queries)]
+        results[shape] = {"jobs": n_jobs, **_timed(lambda q: index.search(q, top_k=20), qs)}
+    return results
+
+
+def bench_extract_skills(n: int, seed: int) -> dict:
+    texts = [f"{row['title']}\n{row['description']}" for row in jobspy_corpus(n, seed)]
+    extract_skills(texts[0])  # warm-up
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for text in texts:
+            extract_skills(text)
+        best = min(best, time.perf_counter() - start)
+    return {"jobspy": {"descriptions": n, "avg_chars": sum(map(len, texts)) // n, "per_s": round(n / best)}}
+
+
+SCENARIOS = {
+    "skill_search": lambda args: bench_skill_search(args.jobs, args.queries, args.seed),
+    "extract_skills": lambda args: bench_extract_skills(args.descriptions, args.seed),
+}
+
+
+def main():
+    p = argparse.ArgumentParser("Local matching micro-benchmarks")
+    p.add_argument("--scenarios", default=",".join(SCENARIOS))
+    p.add_argument("--jobs", type=int, default=500_000)
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--descriptions", type=int, default=5000)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--max-ms", type=float, default=None, help="Fail when a p95 latency is above this")
+    p.add_argument("--min-per-s", type=float, default=None, help="Fail when a throughput is below this")
+    args = p.parse_args()
+
+    failed = False
+    for name in args.scenarios.split(","):
+        for shape, stats in SCENARIOS[name](args).items():
+            print(f"[INFO] {name}/{shape}: {stats}")
+            if args.max_ms is not None and stats.get("p95_ms", 0) > args.max_ms:
+                failed = True
+            if args.min_per_s is not None and stats.get("per_s", float("inf")) < args.min_per_s:
+                failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+End-to-end benchmark of the API with no external service:
+a fake OpenRouter (bench.fake_openrouter), a local or in-memory Mongo and a
+synthetic corpus (bench.corpus). The app is driven in-process through ASGI.
+
+    cd api
+    python -m bench.run --mongo memory --cvs 30 --jobs 5000 --latency 0.3
+    python -m bench.run --mongo mongodb://localhost:27017 --out bench/results
+    python -m bench.run --compare bench/results/a.json bench/results/b.json
+
+Scenarios: ingest (POST /jobs/ingest_bulk), upload (POST /upload_cv),
+upload_batch (all CVs in one POST /upload_cv/batch; scale PDF_WORKERS and
+BATCH_LLM_CONCURRENCY to compare throughput), match (GET /candidates/{id}/matches?refresh=true, i.e. prefilter + LLM
+ranking) and match_fast (GET /match/fast). Each reports p50/p95/p99
+latency and throughput; results are written as JSON named after the
+current commit so runs can be compared.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+from datetime import datetime
+
+from bench.corpus import cv_corpus, jobspy_corpus
+from bench.fake_openrouter import FakeOpenRouter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+# ============================
+# STATS
+# ============================
+def percentile(sorted_values, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(q / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies, errors: int, wall: float, units: int, unit: str) -> dict:
+    lat = sorted(latencies)
+    return {
+        "n": len(lat),
+        "errors": errors,
+        "p50_ms": round(percentile(lat, 50) * 1000, 2),
+        "p95_ms": round(percentile(lat, 95) * 1000, 2),
+        "p99_ms": round(percentile(lat, 99) * 1000, 2),
+        "mean_ms": round(sum(lat) / len(lat) * 1000, 2) if lat else 0.0,
+        "wall_s": round(wall, 3),
+        "throughput_per_s": round(units / wall, 2) if wall else 0.0,
+        "unit": unit,
+    }
+
+
+async def run_concurrent(calls, concurrency: int):
+    """
+    Await every `call()` with at most `concurrency` in flight.
+    Each call returns (ok, units); returns (latencies, errors, units, wall).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors, units = [], 0, 0
+
+    async def one(call):
+        nonlocal errors, units
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                ok, n = await call()
+            except Exception as e:
+                print(f"[WARN] {type(e).__name__}: {e}")
+                ok, n = False, 0
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+            units += n
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(c) for c in calls))
+    return latencies, errors, units, time.perf_counter() - start
+
+
+def _is_error(body) -> bool:
+    return isinstance(body, dict) and body.get("status") == "ERROR"
+
+
+# ============================
+# SCENARIOS
+# ============================
+async def bench_ingest(client, rows, batch_size: int, concurrency: int):
+    from jobspy_normalize_jobs import map_row, clean_payload
+
+    payloads = [clean_payload(map_row(r)) for r in rows]
+    batches = [payloads[i:i + batch_size] for i in range(0, len(payloads), batch_size)]
+
+    def call(batch):
+        async def go():
+            body = "\n".join(json.dumps(p, ensure_ascii=False) for p in batch).encode("utf-8")
+            r = await client.post("/jobs/ingest_bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+            res = r.json()
+            return r.status_code == 200 and not res.get("errors"), len(batch)
+        return go
+
+    lat, errors, units, wall = await run_concurrent([call(b) for b in batches], concurrency)
+    return summarize(lat, errors, wall, units, "rows")
+
+
+async def bench_upload(client, pdfs, concurrency: int, candidate_ids: list):
+    def call(i, pdf):
+        async def go():
+            r = await client.post(
+                "/upload_cv",
+                files={"file": (f"cv_{i}.pdf", pdf, "application/pdf")},
+                data={"full_name": f"Bench {i}"},
+            )
+            body = r.json()
+            if r.status_code != 200 or _is_error(body):
+                return False, 0
+            candidate_ids.append(body["candidate_id"])
+            return True, 1
+        return go
+
+    lat, errors, units, wall = await run_concurrent([call(i, p) for i, p in enumerate(pdfs)], concurrency)
+    return summarize(lat, errors, wall, units, "requests")
+
+
+async def bench_upload_batch(client, pdfs):
+    files = [("files", (f"batch_{i}.pdf", pdf, "application/pdf")) for i, pdf in enumerate(pdfs)]
+    start = time.perf_counter()
+    saved, errors = 0, 0
+    async with client.stream("POST", "/upload_cv/batch", files=files) as r:
+        async for line in r.aiter_lines():
+            if not line:
+                continue
+            status = json.loads(line).get("status")
+            saved += status == "OK"
+            errors += status == "ERROR"
+    wall = time.perf_counter() - start
+    return summarize([wall], errors, wall, saved, "cvs")
+
+
+async def bench_get(client, paths, concurrency: int):
+    def call(path):
+        async def go():
+            r = await client.get(path)
+            return r.status_code == 200 and not _is_error(r.json()), 1
+        return go
+
+    lat, errors, units, wall = await run_concurrent([call(p) for p in paths], concurrency)
+    return summarize(lat, errors, wall, units, "requests")
+
+
+async def run_scenarios(args, scenarios):
+    import httpx
+    from app.main import app
+
+    pdfs = cv_corpus(args.cvs, args.seed, args.pages)
+    rows = jobspy_corpus(args.jobs, args.seed)
+
+    results = {}
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            if "ingest" in scenarios:
+                results["ingest"] = await bench_ingest(client, rows, args.batch_size, args.concurrency)
+                print(f"[INFO] ingest: {results['ingest']}")
+
+            if "upload_batch" in scenarios:
+                # other seed: not served from the extraction cache warmed by "upload"
+                batch = cv_corpus(args.cvs, args.seed + 1000, args.pages)
+                results["upload_batch"] = await bench_upload_batch(client, batch)
+                print(f"[INFO] upload_batch: {results['upload_batch']}")
+
+            candidate_ids = []
+            if scenarios & {"upload", "match", "match_fast"}:
+                upload = await bench_upload(client, pdfs, args.concurrency, candidate_ids)
+                if "upload" in scenarios:
+                    results["upload"] = upload
+                    print(f"[INFO] upload: {upload}")
+
+            if "match" in scenarios:
+                paths = [f"/candidates/{c}/matches?refresh=true" for c in candidate_ids]
+                results["match"] = await bench_get(client, paths, args.concurrency)
+                print(f"[INFO] match: {results['match']}")
+
+            if "match_fast" in scenarios:
+                paths = [f"/match/fast?candidate_id={c}&k=10" for c in candidate_ids]
+                results["match_fast"] = await bench_get(client, paths, args.concurrency)
+                print(f"[INFO] match_fast: {results['match_fast']}")
+    finally:
+        await app.router.shutdown()
+    return results
+
+
+# ============================
+# ENVIRONMENT
+# ============================
+def configure_env(args, fake):
+    """Must run before `app` is imported: its modules read the env at import."""
+    os.environ["OPENROUTER_BASE_URL"] = fake.base_url
+    os.environ["OPENROUTER_API_KEY"] = "bench"
+    os.environ.setdefault("OPENROUTER_RATE_LIMIT_RPS", "0")
+    os.environ["CV_WORKERS"] = "0"
+    os.environ["DB_NAME"] = args.db_name
+    if args.mongo != "memory":
+        os.environ["MONGO_URL"] = args.mongo
+
+    # the ingest scenario maps raw rows with the normalizer's map_row
+    for scripts_dir in (os.path.join(HERE, "..", "..", "scripts"), os.path.join(HERE, "..", "scripts")):
+        if os.path.isfile(os.path.join(scripts_dir, "jobspy_normalize_jobs.py")):
+            sys.path.insert(0, os.path.abspath(scripts_dir))
+            break
+
+
+def setup_mongo(args):
+    from app import db
+
+    if args.mongo == "memory":
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("[ERROR] --mongo memory needs mongomock (pip install mongomock)")
+        db.client = mongomock.MongoClient()
+        db.db = db.client[args.db_name]
+    else:
+        # a dedicated database, emptied before each run
+        db.client.drop_database(args.db_name)
+
+
+def git_commit():
+    def git(*cmd):
+        return subprocess.run(["git", *cmd], cwd=HERE, capture_output=True, text=True).stdout.strip()
+    try:
+        return git("rev-parse", "--short", "HEAD") or "unknown", bool(git("status", "--porcelain"))
+    except OSError:
+        return "unknown", False
+
+
+# ============================
+# COMPARE
+# ============================
+def compare(old_path: str, new_path: str, threshold: float) -> int:
+    """Print per-scenario deltas; non-zero exit when a p95 regressed above `threshold` %."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print(f"{'scenario':<12}{'metric':<18}{old['commit']:>12}{new['commit']:>12}{'delta':>10}")
+    regressions = 0
+    for name in sorted(set(old["scenarios"]) & set(new["scenarios"])):
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_per_s", "errors"):
+            a, b = old["scenarios"][name][metric], new["scenarios"][name][metric]
+            delta = (b - a) / a * 100 if a else 0.0
+            flag = ""
+            if metric == "p95_ms" and delta > threshold:
+                regressions += 1
+                flag = "  <-- regression"
+            print(f"{name:<12}{metric:<18}{a:>12}{b:>12}{delta:>9.1f}%{flag}")
+    return 1 if regressions else 0
+
+
+def main():
+    p = argparse.ArgumentParser("End-to-end API benchmark")
+    p.add_argument("--mongo", default="memory", help='"memory" (mongomock) or a Mongo URL')
+    p.add_argument("--db-name", default="matcher_bench")
+    p.add_argument("--scenarios", default="ingest,upload,upload_batch,match,match_fast")
+    p.add_argument("--cvs", type=int, default=20)
+    p.add_argument("--pages", type=int, default=1)
+    p.add_argument("--jobs", type=int, default=2000)
+    p.add_argument("--batch-size", type=int, default=500)
+    p.add_argument("--concurrency", type=int, default=4)
+    p.add_argument("--seed", type=int, default=0)
+    # fake OpenRouter
+    p.add_argument("--latency", type=float, default=0.2)
+    p.add_argument("--jitter", type=float, default=0.05)
+    p.add_argument("--tokens-per-s", type=float, default=200.0)
+    p.add_argument("--malformed-rate", type=float, default=0.0)
+    p.add_argument("--error-rate", type=float, default=0.0)
+    # output
+    p.add_argument("--out", default=os.path.join(HERE, "results"))
+    p.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    p.add_argument("--threshold", type=float, default=20.0, help="--compare: p95 regression limit (%%)")
+    args = p.parse_args()
+
+    if args.compare:
+        sys.exit(compare(*args.compare, args.threshold))
+
+    fake = FakeOpenRouter(
+        latency=args.latency, jitter=args.jitter, tokens_per_s=args.tokens_per_s,
+        malformed_rate=args.malformed_rate, error_rate=args.error_rate, seed=args.seed,
+    ).start()
+    try:
+        configure_env(args, fake)
+        setup_mongo(args)
+        scenarios = {s.strip() for s in args.scenarios.split(",") if s.strip()}
+        results = asyncio.run(run_scenarios(args, scenarios))
+    finally:
+        fake.stop()
+
+    commit, dirty = git_commit()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "out", "threshold")},
+        "fake_llm": fake.stats,
+        "scenarios": results,
+    }
+
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{datetime.utcnow():%Y%m%dT%H%M%S}_{commit}{'-dirty' if dirty else ''}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[DONE] Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
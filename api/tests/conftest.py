@@ -0,0 +1,76 @@
+"""
+Shared fixtures: an in-memory Mongo (mongomock) patched into app.db and a
+fake OpenRouter server (bench.fake_openrouter).
+
+    cd api
+    python -m pytest -q
+"""
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.dirname(HERE)
+
+# app modules read the env at import time
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+os.environ.setdefault("OPENROUTER_RATE_LIMIT_RPS", "0")
+os.environ.setdefault("OPENROUTER_BACKOFF_BASE", "0")
+os.environ.setdefault("LOG_SAMPLE_RATE", "0")
+os.environ["CV_WORKERS"] = "0"
+
+for path in (API_DIR, os.path.join(API_DIR, "..", "scripts")):
+    path = os.path.abspath(path)
+    if os.path.isdir(path) and path not in sys.path:
+        sys.path.insert(0, path)
+
+import mongomock  # noqa: E402
+
+from app import db as app_db  # noqa: E402
+from app import candidate_index, near_dup, pdf, retrieval, skill_index  # noqa: E402
+from app.llm import openrouter_client  # noqa: E402
+from bench.fake_openrouter import FakeOpenRouter  # noqa: E402
+
+# (module, attributes) of the in-memory indexes built from Mongo
+MODULE_INDEXES = (
+    (retrieval, ("_job_index", "_job_index_watermark")),
+    (skill_index, ("_skill_index", "_skill_index_watermark")),
+    (near_dup, ("_dup_index", "_dup_index_watermark")),
+    (candidate_index, ("_candidate_index", "_candidate_index_watermark")),
+)
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """A fresh in-memory database; module-level indexes start empty."""
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(app_db, "client", client)
+    monkeypatch.setattr(app_db, "db", client["test"])
+    for module, names in MODULE_INDEXES:
+        for name in names:
+            monkeypatch.setattr(module, name, None)
+    return client["test"]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def pdf_pool():
+    yield
+    pdf.shutdown_pool()
+
+
+@pytest.fixture(scope="session")
+def fake_server():
+    fake = FakeOpenRouter(latency=0.0, jitter=0.0, tokens_per_s=0).start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture
+def fake_llm(fake_server, monkeypatch):
+    """The shared OpenRouter client pointed at the fake server (stats reset)."""
+    for key in fake_server.stats:
+        fake_server.stats[key] = 0
+    fake_server.latency, fake_server.malformed_rate, fake_server.error_rate = 0.0, 0.0, 0.0
+    monkeypatch.setattr(openrouter_client, "_client", openrouter_client.OpenRouterClient(base_url=fake_server.base_url))
+    return fake_server
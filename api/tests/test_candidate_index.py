@@ -0,0 +1,46 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app import candidate_index, db, main
+
+
+def test_rerank_failure_keeps_local_order(mongo, monkeypatch):
+    ids = [str(mongo.candidates.insert_one({"full_name": name}).inserted_id) for name in ("A", "B")]
+    ranked = [{"candidate_id": i, "score": 1.0 - n / 10} for n, i in enumerate(ids)]
+
+    async def failing(job, candidates):
+        raise TimeoutError("no answer")
+
+    monkeypatch.setattr(candidate_index, "rank_candidates_for_job", failing)
+    assert asyncio.run(candidate_index.rerank_candidates({"title": "Dev"}, list(ranked))) == ranked
+
+
+def test_resaved_candidate_replaces_its_row(mongo):
+    cv = {"full_name": "A", "skills_detected": ["Java"]}
+    candidate_id = db.save_candidate(cv, cv_job_id="job-1")
+    index = candidate_index.get_candidate_index()
+    job = {"title": "Python dev", "skills_required": ["Python"]}
+    assert index.search(job) == []
+
+    # a retried CV job re-saves the same candidate with other fields
+    db.save_candidate({"full_name": "A", "skills_detected": ["Python"]}, cv_job_id="job-1")
+    index = candidate_index.get_candidate_index()
+    assert len(index) == 1 and index.retired == 1
+    assert [r["candidate_id"] for r in index.search(job)] == [candidate_id]
+
+
+def test_match_cache_follows_candidate_saves(mongo):
+    db.save_jobs_bulk([{"title": "Python dev", "url": "https://jobs/1", "skills_required": ["Python"]}])
+    db.save_candidate({"full_name": "A", "skills_detected": ["Java"]}, cv_job_id="job-1")
+    asyncio.run(candidate_index.run_title_matches("python", k=5))
+    assert asyncio.run(candidate_index.match_title("python", k=5))["jobs"][0]["cached"] is True
+
+    # same number of candidates, but one of them changed
+    db.save_candidate({"full_name": "A", "skills_detected": ["Python"]}, cv_job_id="job-1")
+    result = asyncio.run(candidate_index.match_title("python", k=5))["jobs"][0]
+    assert result["cached"] is False and [c["full_name"] for c in result["candidates"]] == ["A"]
+
+
+def test_match_needs_at_least_one_job(mongo):
+    assert TestClient(main.app).get("/match", params={"job_title": "dev", "jobs": 0}).status_code == 400
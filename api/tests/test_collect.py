@@ -0,0 +1,122 @@
+import importlib
+import os
+import sys
+import time
+import types
+
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def collect(tmp_path, monkeypatch):
+    """jobspy_collect writing under tmp_path; jobspy itself is replaced when not installed."""
+    monkeypatch.setenv("DATA_LAKE_ROOT", str(tmp_path))
+    try:
+        import jobspy  # noqa: F401
+    except ImportError:
+        monkeypatch.setitem(sys.modules, "jobspy", types.ModuleType("jobspy"))
+        sys.modules["jobspy"].scrape_jobs = None
+    for name in ("jobspy_collect", "url_index"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    return importlib.import_module("jobspy_collect")
+
+
+def _run(collect, monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["jobspy_collect.py", "--cell-rate", "0", "--workers", "2", *args])
+    collect.main()
+
+
+def test_resumed_run_only_scrapes_unfinished_cells(collect, monkeypatch):
+    calls = []
+
+    def scrape_jobs(search_term, location, country_indeed, **kwargs):
+        calls.append(location)
+        if location == "Lyon" and calls.count("Lyon") == 1:
+            raise ConnectionError("blocked")
+        return pd.DataFrame([{"job_url": f"https://jobs/{location}", "title": f"Dev {location}"}])
+
+    monkeypatch.setattr(collect, "scrape_jobs", scrape_jobs)
+    grid = ["--queries", "dev", "--locations", "Paris,Lyon", "--countries", "france", "--run-id", "r1"]
+    _run(collect, monkeypatch, *grid)
+    manifest = collect.RunManifest(os.path.join(collect.RUNS_DIR, "r1"))
+    assert [c["label"] for c in manifest.data["cells"].values()] == ["'dev' @ Paris (france)"]
+
+    _run(collect, monkeypatch, *grid)
+    assert sorted(calls) == ["Lyon", "Lyon", "Paris"]
+    with open(os.path.join(collect.RAW_DIR, "jobspy_all.jsonl"), encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+
+    _run(collect, monkeypatch, *grid)  # complete: nothing scraped again
+    assert len(calls) == 3
+
+
+def test_rate_limiter_spaces_acquisitions_per_host(collect):
+    limiter = collect.HostRateLimiter(rate=50)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire("indeed:france")
+    # burst of 1, then one token every 20 ms
+    assert time.monotonic() - start >= 5 / 50 * 0.9
+
+    start = time.monotonic()
+    for country in ("uk", "usa", "spain", "italy"):
+        limiter.acquire(f"indeed:{country}")
+    assert time.monotonic() - start < 0.05
+
+
+def test_old_runs_are_pruned(collect):
+    for run_id in ("old", "recent", "current"):
+        os.makedirs(os.path.join(collect.RUNS_DIR, run_id, "cells"))
+        collect.RunManifest(os.path.join(collect.RUNS_DIR, run_id)).mark("k", rows=0)
+    old = os.path.join(collect.RUNS_DIR, "old", "manifest.json")
+    past = time.time() - 30 * 86400
+    os.utime(old, (past, past))
+    os.utime(os.path.join(collect.RUNS_DIR, "current", "manifest.json"), (past, past))
+
+    assert collect.prune_runs(collect.RUNS_DIR, 14, current="current") == ["old"]
+    assert sorted(os.listdir(collect.RUNS_DIR)) == ["current", "recent"]
+    assert collect.prune_runs(collect.RUNS_DIR, 0) == []
+
+
+def test_parquet_sink_round_trip_through_the_normalizer(collect, monkeypatch):
+    pytest.importorskip("pyarrow")
+    import jobspy_normalize_jobs as normalize
+
+    base = {"site": "indeed", "date_posted": "2024-05-01", "search_country": "france", "is_remote": False}
+    rows = [
+        # first row group: company all-null, stored as a string column
+        {**base, "job_url": "https://jobs/1", "title": "Data Engineer", "company": None,
+         "location": {"city": "Paris", "country": "France"}, "description": "Spark et Airflow"},
+        {**base, "job_url": "https://jobs/2", "title": "Backend Developer", "company": "Acme",
+         "location": {"city": "Lyon", "country": "France"}, "description": "Python, Docker"},
+        # list description: the column changes type, rows go to a second part file
+        {**base, "job_url": "https://jobs/3", "title": "DevOps Engineer", "company": "Hooli",
+         "location": {"city": "Lille", "country": "France"}, "description": ["Kubernetes", "Terraform"]},
+    ]
+    sink = collect.ParquetSink(collect.PARQUET_DIR, "r1", row_group_rows=1)
+    for row in rows:
+        sink.write("", row)
+    sink.close()
+
+    monkeypatch.setattr(normalize, "PARQUET_DIR", collect.PARQUET_DIR)
+    files = normalize.parquet_files(since="2024-05-01", countries=["france"])
+    assert len(files) == 2 and normalize.parquet_files(countries=["uk"]) == []
+
+    sent = []
+
+    def send_batch(session, batch):
+        sent.extend(batch)
+        return len(batch), 0, True
+
+    monkeypatch.setattr(normalize, "send_batch", send_batch)
+    stats = {"sent": 0, "skipped": 0}
+    assert all(normalize.ingest_parquet_file(None, fp, stats) for fp in files)
+    assert stats == {"sent": 3, "skipped": 0}
+
+    by_url = {p["url"]: p for p in sent}
+    assert by_url["https://jobs/1"]["company"] == ""
+    assert by_url["https://jobs/1"]["location"] == {"city": "Paris", "country": "France", "remote": None}
+    assert by_url["https://jobs/2"]["company"] == "Acme"
+    assert by_url["https://jobs/3"]["description_text"] == "Kubernetes Terraform"
+    assert by_url["https://jobs/3"]["collected_at"] == "2024-05-01"
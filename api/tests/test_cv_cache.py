@@ -0,0 +1,58 @@
+from collections import OrderedDict
+
+import pytest
+
+from app import cv_cache, db
+
+
+@pytest.fixture
+def cache(mongo, monkeypatch):
+    """cv_cache with an empty LRU of 2 entries and fresh counters."""
+    monkeypatch.setattr(cv_cache, "LRU_SIZE", 2)
+    monkeypatch.setattr(cv_cache, "_lru", OrderedDict())
+    monkeypatch.setattr(cv_cache, "stats", {"lru_hits": 0, "mongo_hits": 0, "misses": 0})
+    return cv_cache
+
+
+def test_cache_key_depends_on_parser_version():
+    assert cv_cache.cache_key(b"%PDF", "m", "v2", "tiered", "1+a") != cv_cache.cache_key(b"%PDF", "m", "v2", "tiered", "1+b")
+
+
+def test_lru_evicts_least_recently_used(cache):
+    for key in ("a", "b"):
+        cache.put(key, {"key": key})
+    assert cache.get("a") == {"key": "a"}  # "b" is now the oldest
+    cache.put("c", {"key": "c"})
+    assert list(cache._lru) == ["a", "c"]
+    assert cache.stats["lru_hits"] == 1
+
+
+def test_mongo_tier_serves_and_refills_the_lru(cache):
+    cache.put("a", {"skills": ["Python"]})
+    cache._lru.clear()  # another worker, or evicted
+
+    value = cache.get("a")
+    assert value == {"skills": ["Python"]}
+    assert cache.stats == {"lru_hits": 0, "mongo_hits": 1, "misses": 0}
+    value["skills"].append("SQL")  # callers get copies
+    assert cache.get("a") == {"skills": ["Python"]}
+    assert cache.stats["lru_hits"] == 1
+
+    assert cache.get("missing") is None
+    assert cache.stats["misses"] == 1
+    assert cache.get_stats()["hit_ratio"] == round(2 / 3, 4)
+
+
+def test_entries_expire_through_the_ttl_index(cache, mongo):
+    db.ensure_indexes()
+    ttl = mongo.cv_cache.index_information()["created_at_ttl"]
+    assert ttl["key"] == [("created_at", 1)]
+    assert ttl["expireAfterSeconds"] == db.CV_CACHE_TTL_SECONDS
+
+    cache.put("a", {"skills": []}, model="m", prompt_version="v2", mode="tiered", parser_version="1+a")
+    doc = mongo.cv_cache.find_one({"_id": "a"})
+    assert doc["created_at"] is not None and doc["parser_version"] == "1+a"
+
+    mongo.cv_cache.delete_one({"_id": "a"})  # what the TTL monitor does once expired
+    cache._lru.clear()
+    assert cache.get("a") is None
@@ -0,0 +1,77 @@
+import asyncio
+
+from app import cv_cache
+from app.cv_parser import parse_cv
+from app.llm import extract_cv_openrouter
+
+CV = """Jane Doe
+Data Engineer
+jane@example.com
+
+Skills
+Python, SQL, CI/CD, TCP/IP, Docker
+
+Experience
+Data Engineer - Acme (2019 - 2023)
+Developer - Initech (2016 - 2019)
+
+Education
+Master Informatique, Universite de Lyon, 2016
+
+Languages
+Français / Anglais (C1)
+"""
+
+PARTIAL_CV = """Jane Doe
+Skills
+Python, SQL, CI/CD, Docker
+Experience
+Data Engineer - Acme (2019 - 2023)
+"""
+
+
+def test_slash_stays_inside_skill_names():
+    skills = parse_cv(CV).data["skills"]
+    assert "CI/CD" in skills and "TCP/IP" in skills
+    assert not {"CI", "CD", "TCP", "IP"} & set(skills)
+
+
+def test_languages_split_on_slash():
+    languages = parse_cv(CV).data["languages"]
+    assert [l["name"] for l in languages] == ["Français", "Anglais"]
+    assert languages[1]["level"] == "C1"
+
+
+def test_partial_tier_falls_back_to_local_fields(fake_llm):
+    parsed = parse_cv(PARTIAL_CV)
+    assert parsed.gaps() and len(parsed.gaps()) < len(extract_cv_openrouter.FIELDS)
+
+    fake_llm.error_rate = 1.0
+    cv_data = asyncio.run(extract_cv_openrouter.extract_cv_tiered(PARTIAL_CV))
+    assert cv_data["extraction"]["tier"] == "local_fallback"
+    assert cv_data["extraction"]["llm_fields"] == []
+    assert cv_data["skills"] == parsed.data["skills"]
+
+    fake_llm.error_rate = 0.0
+    cv_data = asyncio.run(extract_cv_openrouter.extract_cv_tiered(PARTIAL_CV))
+    assert cv_data["extraction"]["tier"] == "partial"
+
+
+def test_full_tier_falls_back_to_local_fields(fake_llm):
+    text = "Jane Doe\n"
+    parsed = parse_cv(text)
+    assert len(parsed.gaps()) == len(extract_cv_openrouter.FIELDS)
+
+    fake_llm.error_rate = 1.0
+    cv_data = asyncio.run(extract_cv_openrouter.extract_cv_tiered(text))
+    assert cv_data["extraction"]["tier"] == "local_fallback"
+    assert cv_data["extraction"]["llm_fields"] == []
+    assert cv_data["full_name"] == parsed.data["full_name"]
+
+    fake_llm.error_rate = 0.0
+    cv_data = asyncio.run(extract_cv_openrouter.extract_cv_tiered(text))
+    assert cv_data["extraction"]["tier"] == "full_llm"
+
+
+def test_cache_key_depends_on_extraction_mode():
+    assert cv_cache.cache_key(b"%PDF", "m", "v2", "tiered") != cv_cache.cache_key(b"%PDF", "m", "v2", "llm")
@@ -0,0 +1,91 @@
+from app import db
+from app.delta_matching import run_delta_matching
+
+
+def _ingest(title, skills):
+    db.save_jobs_bulk([{"title": title, "url": f"https://jobs/{title}", "skills_required": skills}])
+
+
+def _topk(mongo, candidate_id):
+    return mongo.candidate_topk.find_one({"candidate_id": str(candidate_id)})
+
+
+def test_delta_run_scores_only_jobs_after_the_watermark(mongo):
+    _ingest("python-dev", ["Python", "Django"])
+    _ingest("java-dev", ["Java", "Spring"])
+    candidate_id = mongo.candidates.insert_one({"skills_detected": ["Python", "Docker"]}).inserted_id
+
+    first = run_delta_matching(top_k=5)
+    assert first["first_run"] == 1 and first["jobs_scored"] == 2
+    stored = _topk(mongo, candidate_id)
+    assert stored["watermark"] == db.latest_job_updated_at()
+    assert [m["title"] for m in stored["matches"]] == ["python-dev"]
+
+    _ingest("docker-ops", ["Docker", "Kubernetes"])
+    second = run_delta_matching(top_k=5)
+    # the jobs at the watermark are read again, but skipped: the first run read them
+    assert second["first_run"] == 0 and second["delta_jobs"] >= 2 and second["jobs_scored"] == 1
+    stored = _topk(mongo, candidate_id)
+    assert stored["watermark"] == db.latest_job_updated_at()
+    assert {m["title"] for m in stored["matches"]} == {"python-dev", "docker-ops"}
+
+    third = run_delta_matching(top_k=5)
+    assert third["unchanged"] == 1 and third["jobs_scored"] == 0 and third["written"] == 0
+
+
+def test_candidates_share_the_new_watermark(mongo):
+    _ingest("python-dev", ["Python"])
+    early = mongo.candidates.insert_one({"skills_detected": ["Python"]}).inserted_id
+    run_delta_matching(top_k=5)
+
+    _ingest("java-dev", ["Java"])
+    late = mongo.candidates.insert_one({"skills_detected": ["Java"]}).inserted_id
+    stats = run_delta_matching(top_k=5)
+    # the early candidate only sees the new job, the late one the whole corpus
+    assert stats["first_run"] == 1 and stats["jobs_scored"] == 1 + 2
+    assert _topk(mongo, early)["watermark"] == _topk(mongo, late)["watermark"] == db.latest_job_updated_at()
+    assert [m["title"] for m in _topk(mongo, early)["matches"]] == ["python-dev"]
+
+
+def test_changed_job_is_scored_again(mongo):
+    _ingest("python-dev", ["Python", "Django"])
+    _ingest("java-dev", ["Java"])
+    candidate_id = mongo.candidates.insert_one({"skills_detected": ["Python"]}).inserted_id
+    run_delta_matching(top_k=5)
+    assert [m["title"] for m in _topk(mongo, candidate_id)["matches"]] == ["python-dev"]
+
+    # re-upserted offer that no longer asks for Python
+    _ingest("python-dev", ["Go"])
+    stats = run_delta_matching(top_k=5)
+    assert stats["jobs_scored"] == 1
+    assert _topk(mongo, candidate_id)["matches"] == []
+
+
+def test_job_written_at_the_watermark_after_the_run(mongo):
+    _ingest("python-dev", ["Python"])
+    candidate_id = mongo.candidates.insert_one({"skills_detected": ["Python"]}).inserted_id
+    run_delta_matching(top_k=5)
+    watermark = _topk(mongo, candidate_id)["watermark"]
+
+    # the rest of the bulk write that stamped the watermark lands after the run
+    mongo.jobs.insert_one({
+        "title": "late-python", "url": "https://jobs/late", "skills_required": ["Python"],
+        "ingested_at": watermark, "updated_at": watermark,
+    })
+    stats = run_delta_matching(top_k=5)
+    # both jobs at the watermark are scored: rows are only skipped when all were read
+    assert stats["unchanged"] == 0 and stats["jobs_scored"] == 2
+    assert {m["title"] for m in _topk(mongo, candidate_id)["matches"]} == {"python-dev", "late-python"}
+
+
+def test_deleted_candidates_do_not_hold_the_watermark(mongo):
+    _ingest("python-dev", ["Python"])
+    gone = mongo.candidates.insert_one({"skills_detected": ["Python"]}).inserted_id
+    run_delta_matching(top_k=5)
+    mongo.candidates.delete_one({"_id": gone})
+
+    _ingest("java-dev", ["Java"])
+    mongo.candidates.insert_one({"skills_detected": ["Java"]})
+    stats = run_delta_matching(top_k=5)
+    assert stats["pruned"] == 1 and _topk(mongo, gone) is None
+    assert db.min_topk_watermark() == db.latest_job_updated_at()
@@ -0,0 +1,51 @@
+import pytest
+
+from app.digest import build_digest, detect_seniority
+
+
+@pytest.mark.parametrize("title, text, expected", [
+    ("Data Engineer", "Join our international team. 5 years of experience with Spark.", "senior"),
+    ("Data Engineer", "You will work with internal stakeholders.", None),
+    ("Backend Developer", "We are an early-stage startup.", None),
+    ("Data Engineer", "You will lead the migration to the cloud. 3 years of Python.", "mid"),
+    ("Data Engineer", "Le machine learning (apprentissage automatique) est un plus.", None),
+    ("Stage - Data Analyst", "", "intern"),
+    ("Data Analyst", "Offre de stage de 6 mois.", "intern"),
+    ("Data Analyst Intern", "", "intern"),
+    ("Backend Developer", "You will join as tech lead of a team of four.", "lead"),
+    ("Backend Developer", "Looking for a lead developer.", "lead"),
+    ("Lead Data Engineer", "", "lead"),
+    ("Engineering Manager", "", "lead"),
+    ("Développeur Python confirmé", "", "senior"),
+    ("Junior Developer", "", "junior"),
+    ("Data Engineer", "We are looking for a Senior Data Engineer.", "senior"),
+    ("Data Engineer", "Profil confirmé, à l'aise avec Spark.", "senior"),
+    ("Data Engineer", "Poste de développeur back-end senior.", "senior"),
+    ("Data Engineer", "Senior (5+ ans) en Python.", "senior"),
+    ("Data Engineer", "Ouvert aux profils débutants : poste junior.", "junior"),
+    ("Data Engineer", "Work with senior engineers on the platform.", None),
+    ("Data Engineer", "Backed by our expert support team.", None),
+    ("Data Engineer", "Une équipe confirmée vous accompagne.", None),
+    ("Data Engineer", "You will mentor junior developers. 6 years of Scala.", "senior"),
+])
+def test_detect_seniority(title, text, expected):
+    assert detect_seniority(title, text) == expected
+
+
+def test_digest_from_description():
+    digest = build_digest({"title": "Data Engineer", "description_text": "Build pipelines.\nApply now!"})
+    assert digest["summary"] == "Build pipelines."
+
+
+def test_prefiltered_job_without_stored_digest_keeps_its_summary(mongo):
+    from datetime import datetime
+
+    from app.matching import normalize_candidate
+    from app.retrieval import prefilter_jobs
+
+    mongo.jobs.insert_one({
+        "url": "https://jobs.example/1", "title": "Python Developer", "ingested_at": datetime.utcnow(),
+        "description_text": "Build Python APIs for our data platform.",
+    })
+    jobs = prefilter_jobs(normalize_candidate({"full_name": "Jane", "skills": ["Python"]}), top_n=5)
+    assert build_digest(jobs[0])["summary"] == "Build Python APIs for our data platform."
@@ -0,0 +1,111 @@
+from datetime import datetime
+
+import pytest
+from pymongo import ASCENDING, DESCENDING
+
+from app import db
+from app.near_dup import get_dup_index
+from app.retrieval import get_job_index
+from app.skill_index import get_skill_index
+
+
+def _job(i, **fields):
+    return {"url": f"https://jobs.example/{i}", "title": f"Job {i}", "description_text": "", **fields}
+
+
+def test_refresh_reads_rows_sharing_the_watermark(mongo):
+    now = datetime.utcnow()
+    mongo.jobs.insert_many([
+        {**_job(i, skills_required=["Python"]), "ingested_at": now, "updated_at": now} for i in range(2)
+    ])
+    assert len(get_job_index()) == len(get_skill_index()) == len(get_dup_index()) == 2
+
+    # same bulk timestamp, written after the first refresh
+    mongo.jobs.insert_one({**_job(2, skills_required=["Python"]), "ingested_at": now, "updated_at": now})
+    assert len(get_job_index()) == len(get_skill_index()) == len(get_dup_index()) == 3
+    assert len(get_job_index().search("job")) == 3
+    assert len(get_skill_index().search(["Python"])) == 3
+
+
+def test_upserted_job_is_reindexed(mongo):
+    db.save_jobs_bulk([
+        _job(0, title="Kotlin Developer", skills_required=["Kotlin"]),
+        _job(1, title="Go Developer", skills_required=["Go"]),
+    ])
+    assert [job_id for job_id, _ in get_job_index().search("kotlin")]
+    assert get_skill_index().search(["Kotlin"])
+
+    db.save_jobs_bulk([_job(0, title="Scala Developer", skills_required=["Scala"])])
+    job_id = mongo.jobs.find_one({"url": _job(0)["url"]})["_id"]
+    assert get_job_index().search("kotlin") == []
+    assert [h[0] for h in get_job_index().search("scala")] == [job_id]
+    assert get_skill_index().search(["Kotlin"]) == []
+    assert [h[0] for h in get_skill_index().search(["Scala"])] == [job_id]
+    assert len(get_job_index()) == len(get_skill_index()) == 2
+
+
+def test_watermark_skips_only_rows_already_read():
+    mark = db.RefreshWatermark("updated_at")
+    t0, t1 = datetime(2024, 1, 1), datetime(2024, 1, 2)
+    assert mark.query() == {}
+    assert not mark.seen({"_id": 1, "updated_at": t0})
+    assert not mark.seen({"_id": 2, "updated_at": t0})
+    assert mark.query() == {"updated_at": {"$gte": t0}}
+    assert mark.seen({"_id": 1, "updated_at": t0})
+    assert not mark.seen({"_id": 3, "updated_at": t0})
+    assert not mark.seen({"_id": 1, "updated_at": t1})
+    assert not mark.seen({"_id": 2, "updated_at": t0})
+
+
+def test_legacy_jobs_without_updated_at_are_read_once(mongo):
+    # stored before updated_at existed: no field for the watermark to move on
+    mongo.jobs.insert_many([
+        {**_job(i, skills_required=["Python"]), "ingested_at": datetime(2024, 1, 1)} for i in range(100)
+    ])
+    for _ in range(5):
+        job_index, skill_index = get_job_index(), get_skill_index()
+    assert len(job_index._rows) == len(skill_index.doc_ids) == 100
+    assert not job_index._retired and not skill_index._retired
+
+    db.save_jobs_bulk([_job(100, skills_required=["Python"])])
+    assert len(get_job_index()) == len(get_skill_index()) == 101
+    assert len(get_job_index()._rows) == 101
+
+    mark = db.RefreshWatermark("updated_at")
+    assert not mark.seen({"_id": 1})
+    assert mark.query() == {"updated_at": {"$ne": None}}
+
+
+def _serves(keys, query, sort) -> bool:
+    """
+    Whether an index with `keys` answers `query` + `sort` with an IXSCAN and
+    no in-memory SORT: its leading keys are the equality fields, then the
+    range/sort fields in the sort order (all directions kept or all flipped).
+    """
+    equal = {k for k, v in query.items() if not isinstance(v, dict)}
+    ranged = {k for k, v in query.items() if isinstance(v, dict)}
+    if not query and not sort or {k for k, _ in keys[:len(equal)]} != equal:
+        return False
+    rest = keys[len(equal):]
+    order = sort or [(k, ASCENDING) for k in ranged]
+    if not ranged <= {k for k, _ in order} or [k for k, _ in rest[:len(order)]] != [k for k, _ in order]:
+        return False
+    same = [d for _, d in rest[:len(order)]] == [d for _, d in order]
+    flipped = [-d for _, d in rest[:len(order)]] == [d for _, d in order]
+    return not sort or same or flipped
+
+
+@pytest.mark.parametrize("name,collection,query,sort", db._hot_queries(), ids=lambda v: v if isinstance(v, str) else "")
+def test_hot_query_is_served_by_a_declared_index(name, collection, query, sort):
+    # mongomock has no explain(); `python -m app.db --explain` checks the real plans
+    served = [opts["name"] for keys, opts in db.INDEXES.get(collection, []) if _serves(keys, query, sort)]
+    assert served, f"{name}: no index in db.INDEXES[{collection!r}] covers {query} sorted by {sort}"
+
+
+def test_index_check_rejects_uncovered_queries():
+    keys = [("source", ASCENDING), ("ingested_at", DESCENDING)]
+    assert _serves(keys, {"source": "x"}, [("ingested_at", ASCENDING)])
+    assert not _serves(keys, {}, [("ingested_at", DESCENDING)])
+    assert not _serves(keys, {"source": "x"}, [("updated_at", DESCENDING)])
+    assert not _serves(keys, {"ingested_at": {"$gte": 0}}, None)
+    assert not _serves([("a", ASCENDING), ("b", DESCENDING)], {}, [("a", ASCENDING), ("b", ASCENDING)])
@@ -0,0 +1,39 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+
+JOB = {"title": "Data Engineer", "company": "Acme", "description_text": "Python, Airflow and AWS."}
+
+
+@pytest.fixture
+def client(mongo):
+    return TestClient(main.app)
+
+
+def _ndjson(rows):
+    return "\n".join(r if isinstance(r, str) else json.dumps(r) for r in rows).encode("utf-8")
+
+
+def _ingest(client, body):
+    response = client.post("/jobs/ingest_bulk", content=body, headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_malformed_line_is_a_row_error(client, mongo):
+    result = _ingest(client, _ndjson([{**JOB, "url": "https://x/1"}, "{not json", {**JOB, "url": "https://x/2"}]))
+    assert result["received"] == 3 and result["inserted"] == 2
+    assert [e["index"] for e in result["errors"]] == [1]
+    assert mongo.jobs.count_documents({}) == 2
+
+
+def test_retried_ingest_does_not_duplicate_urlless_rows(client, mongo):
+    body = _ndjson([JOB, JOB, {**JOB, "title": "Data Analyst"}])
+    first = _ingest(client, body)
+    assert first["inserted"] == 2 and first["unchanged"] == 1
+    retry = _ingest(client, body)
+    assert retry["inserted"] == 0 and retry["unchanged"] == 3
+    assert mongo.jobs.count_documents({}) == 2
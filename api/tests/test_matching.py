@@ -0,0 +1,56 @@
+import asyncio
+
+from app import db
+from app.matching import RANKER, get_matches
+
+
+def _job(i, **fields):
+    return {
+        "url": f"https://jobs.example/{i}",
+        "title": f"Python Developer {i}",
+        "company": "Acme",
+        "skills_required": ["Python", "SQL"],
+        "description_text": "Build APIs in Python with SQL databases.",
+        **fields,
+    }
+
+
+CANDIDATE = {"full_name": "Jane Doe", "skills_detected": ["Python", "SQL"], "summary": "Backend developer"}
+
+
+def test_reingesting_unchanged_jobs_keeps_version(mongo):
+    jobs = [_job(i) for i in range(3)] + [{"title": "No url", "description_text": "x"}]
+    first = db.save_jobs_bulk([dict(j) for j in jobs])
+    assert (first["inserted"], first["updated"]) == (4, 0)
+    version = db.get_jobs_version()
+
+    again = db.save_jobs_bulk([dict(j) for j in jobs[:3]])
+    assert again == {"inserted": 0, "updated": 0, "unchanged": 3, "errors": []}
+    assert db.get_jobs_version() == version
+
+    changed = db.save_jobs_bulk([_job(0, title="Senior Python Developer")])
+    assert (changed["updated"], changed["unchanged"]) == (1, 0)
+    assert db.get_jobs_version() == version + 1
+    stored = mongo.jobs.find_one({"url": _job(0)["url"]})
+    assert stored["title"] == "Senior Python Developer" and stored["updated_at"] >= stored["ingested_at"]
+
+
+def test_near_dup_fields_are_set_on_insert_only(mongo):
+    db.save_jobs_bulk([_job(1, dup_cluster="https://jobs.example/0", dup_similarity=0.9)])
+    result = db.save_jobs_bulk([_job(1, dup_cluster="https://jobs.example/0", dup_similarity=1.0)])
+    assert result["unchanged"] == 1
+    assert mongo.jobs.find_one({"url": _job(1)["url"]})["dup_similarity"] == 0.9
+
+
+def test_unparsable_ranking_is_not_stored(mongo, fake_llm):
+    db.save_jobs_bulk([_job(i) for i in range(3)])
+    fake_llm.malformed_rate = 1.0
+    result = asyncio.run(get_matches("c1", CANDIDATE))
+    assert result["matches"] == [] and not result["cached"]
+    assert mongo.matches.count_documents({}) == 0
+
+    fake_llm.malformed_rate = 0.0
+    result = asyncio.run(get_matches("c1", CANDIDATE))
+    assert result["matches"] and not result["cached"]
+    assert asyncio.run(get_matches("c1", CANDIDATE))["cached"]
+    assert mongo.matches.find_one({"candidate_id": "c1"})["model"] == RANKER
@@ -0,0 +1,40 @@
+import math
+
+import pytest
+
+from app import near_dup
+
+import url_index
+
+DESCRIPTION = (
+    "We are looking for a data engineer to build and run our batch and streaming pipelines "
+    "on Spark and Airflow, with a strong focus on data quality and observability."
+)
+
+
+@pytest.mark.parametrize("value", [None, math.nan, 42])
+def test_dup_text_non_string_fields(value):
+    assert near_dup.dup_text({"title": value, "description_text": value}) == "\n"
+    sig = near_dup.signature(near_dup.dup_text({"title": "Data Engineer", "description_text": value}))
+    assert sig.shape == (near_dup.NUM_PERM,)
+
+
+def test_same_offer_clusters_together():
+    index = near_dup.NearDupIndex()
+    a = near_dup.signature(near_dup.dup_text({"title": "Data Engineer", "description_text": DESCRIPTION}))
+    b = near_dup.signature(near_dup.dup_text({"title": "Data Engineer", "description_text": DESCRIPTION.upper()}))
+    c = near_dup.signature(near_dup.dup_text({"title": "Nurse", "description_text": "Night shifts in a hospital."}))
+    assert index.assign("a", a) == ("a", 0.0)
+    cluster, sim = index.assign("b", b)
+    assert cluster == "a" and sim >= near_dup.THRESHOLD
+    assert index.assign("c", c)[0] == "c"
+
+
+def test_url_index_assign_cluster_nan_description(tmp_path):
+    index = url_index.UrlIndex(str(tmp_path / "jobs.urls.sqlite"))
+    assert index.assign_cluster("u1", {"title": "Data Engineer", "description": math.nan}) == ("u1", 0.0)
+    assert index.assign_cluster("u2", {"title": None, "description": None})[0] == "u2"
+    cluster, _ = index.assign_cluster("u3", {"title": "Data Engineer", "description": DESCRIPTION})
+    assert cluster == "u3"
+    assert index.assign_cluster("u4", {"title": "Data Engineer", "description": DESCRIPTION})[0] == "u3"
+    index.commit()
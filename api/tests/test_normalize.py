@@ -0,0 +1,97 @@
+import json
+import os
+
+import pytest
+
+import jobspy_normalize_jobs as normalize
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Titles of the rows sent to the API (every batch is delivered)."""
+    titles = []
+
+    def send_batch(session, batch):
+        titles.extend(p["title"] for p in batch)
+        return len(batch), 0, True
+
+    monkeypatch.setattr(normalize, "send_batch", send_batch)
+    return titles
+
+
+def _line(title) -> bytes:
+    return (json.dumps({"title": title, "job_url": f"https://jobs/{title}"}) + "\n").encode()
+
+
+def _run(fp, checkpoint):
+    """One normalizer pass over `fp`: (reason, rows sent), checkpoint updated."""
+    stats = {"sent": 0, "skipped": 0}
+    offset, reason = normalize.resume_offset(fp, normalize.checkpoint_entry(checkpoint, fp))
+    end = normalize.ingest_file(None, fp, offset, stats)
+    checkpoint[os.path.abspath(fp)] = normalize.file_entry(fp, end)
+    return reason, stats["sent"]
+
+
+def test_appended_lines_are_read_once(tmp_path, sent):
+    fp = str(tmp_path / "jobspy_all.jsonl")
+    checkpoint = {}
+    with open(fp, "wb") as f:
+        f.write(_line("a") + _line("b"))
+    assert _run(fp, checkpoint) == ("nouveau", 2)
+
+    with open(fp, "ab") as f:
+        f.write(_line("c"))
+    assert _run(fp, checkpoint) == ("reprise", 1)
+    assert _run(fp, checkpoint) == ("reprise", 0)
+    assert sent == ["a", "b", "c"]
+
+
+def test_partial_line_is_read_once_complete(tmp_path, sent):
+    fp = str(tmp_path / "jobspy_all.jsonl")
+    checkpoint = {}
+    line = _line("b")
+    with open(fp, "wb") as f:
+        f.write(_line("a") + line[:10])
+    assert _run(fp, checkpoint) == ("nouveau", 1)
+    assert checkpoint[os.path.abspath(fp)]["offset"] == len(_line("a"))
+
+    with open(fp, "ab") as f:
+        f.write(line[10:])
+    assert _run(fp, checkpoint) == ("reprise", 1)
+    assert sent == ["a", "b"]
+
+
+def test_truncated_file_is_read_again(tmp_path, sent):
+    fp = str(tmp_path / "jobspy_all.jsonl")
+    checkpoint = {}
+    with open(fp, "wb") as f:
+        f.write(_line("a") + _line("b"))
+    _run(fp, checkpoint)
+
+    with open(fp, "wb") as f:  # same inode, smaller than the offset
+        f.write(_line("c"))
+    assert _run(fp, checkpoint) == ("troncature", 1)
+    assert sent == ["a", "b", "c"]
+
+
+def test_rotated_file_resumes_under_its_new_name(tmp_path, sent):
+    fp = str(tmp_path / "jobspy_all.jsonl")
+    rotated = str(tmp_path / "jobspy_2024-05-01.jsonl")
+    checkpoint = {}
+    with open(fp, "wb") as f:
+        f.write(_line("a"))
+    _run(fp, checkpoint)
+
+    # rotation: the file is renamed (one more line written first), a new one takes its path
+    with open(fp, "ab") as f:
+        f.write(_line("b"))
+    os.rename(fp, rotated)
+    with open(fp, "wb") as f:
+        f.write(_line("c"))
+
+    entries = {p: normalize.checkpoint_entry(checkpoint, p) for p in (fp, rotated)}
+    assert normalize.resume_offset(fp, entries[fp]) == (0, "rotation")
+    assert normalize.resume_offset(rotated, entries[rotated]) == (len(_line("a")), "reprise")
+    assert _run(rotated, checkpoint) == ("reprise", 1)
+    assert _run(fp, checkpoint) == ("rotation", 1)
+    assert sent == ["a", "b", "c"]
@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app import metrics
+from app.llm import openrouter_client
+from app.llm.openrouter_client import call_openrouter
+
+PING = [{"role": "user", "content": "Say YES"}]
+
+
+def test_new_event_loop_closes_previous_pool(fake_llm):
+    client = openrouter_client.get_client()
+    assert asyncio.run(call_openrouter("m", PING)) == "YES"
+    first = client._http
+    assert asyncio.run(call_openrouter("m", PING)) == "YES"
+    assert first.is_closed and client._http is not first
+    asyncio.run(client.aclose())
+
+
+def test_usage_records_estimated_cost(monkeypatch):
+    monkeypatch.setitem(openrouter_client.PRICES, "test/model", [1.0, 2.0])
+    before = metrics.LLM_COST.labels("test/model")._value.get()
+    usage = {"usage": {"prompt_tokens": 1000, "completion_tokens": 500}}
+    openrouter_client.OpenRouterClient._record_usage("test/model", usage, 0, 0.1)
+    assert metrics.LLM_COST.labels("test/model")._value.get() - before == pytest.approx(0.002)
+
+
+def test_identical_concurrent_calls_share_one_request(fake_llm):
+    fake_llm.latency = 0.05
+    client = openrouter_client.get_client()
+
+    async def run():
+        return await asyncio.gather(
+            client.chat("m", PING, max_tokens=5),
+            client.chat("m", [{"role": "USER", "content": " Say YES "}], max_tokens=5),
+            client.chat("m", PING, max_tokens=6),
+        )
+
+    first, same, other = asyncio.run(run())
+    assert fake_llm.stats["requests"] == 2
+    assert first == same and first is not same
+    assert other["choices"]
+    asyncio.run(client.aclose())
+
+
+def test_cancelled_waiter_does_not_cancel_shared_request(fake_llm):
+    fake_llm.latency = 0.05
+    client = openrouter_client.get_client()
+
+    async def run():
+        leader = asyncio.ensure_future(client.chat("m", PING))
+        follower = asyncio.ensure_future(client.chat("m", PING))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run())["choices"][0]["message"]["content"] == "YES"
+    assert fake_llm.stats["requests"] == 1
+    asyncio.run(client.aclose())
+
+
+def test_backoff_releases_the_model_slot():
+    # one slot per model: a request sleeping before its retry must not hold it
+    client = openrouter_client.OpenRouterClient(base_url="http://llm.invalid", model_concurrency=1, max_retries=1)
+    calls = []
+
+    def handler(request):
+        content = json.loads(request.content)["messages"][0]["content"]
+        calls.append(content)
+        if content == "retry" and calls.count("retry") == 1:
+            return httpx.Response(503, headers={"Retry-After": "0.2"}, text="busy")
+        message = {"role": "assistant", "content": content.upper()}
+        return httpx.Response(200, json={"choices": [{"message": message}], "usage": {}})
+
+    async def run():
+        await client._ensure_loop()
+        client._http = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler))
+        done = []
+
+        async def call(content):
+            data = await client.chat("m", [{"role": "user", "content": content}])
+            done.append(data["choices"][0]["message"]["content"])
+
+        retried = asyncio.ensure_future(call("retry"))
+        await asyncio.sleep(0.05)
+        await asyncio.wait_for(call("other"), timeout=0.1)  # served during the backoff
+        await retried
+        await client.aclose()
+        return done
+
+    assert asyncio.run(run()) == ["OTHER", "RETRY"]
+    assert calls == ["retry", "other", "retry"]
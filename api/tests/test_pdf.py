@@ -0,0 +1,39 @@
+import asyncio
+
+import fitz
+import pytest
+
+from app import pdf
+
+
+def _pdf(n_pages: int) -> bytes:
+    doc = fitz.open()
+    for i in range(n_pages):
+        doc.new_page().insert_text((40, 50), f"Page {i} Python SQL Docker", fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_oversized_pdf_is_rejected_before_parsing(monkeypatch):
+    data = _pdf(1)
+    monkeypatch.setattr(pdf, "MAX_PDF_BYTES", len(data) - 1)
+    with pytest.raises(pdf.PDFTooLarge, match="bytes"):
+        asyncio.run(pdf.extract_text(data))
+
+
+def test_too_many_pages(monkeypatch):
+    monkeypatch.setattr(pdf, "MAX_PDF_PAGES", 3)
+    assert "Page 2" in asyncio.run(pdf.extract_text(_pdf(3)))
+    with pytest.raises(pdf.PDFTooLarge, match="4 pages"):
+        asyncio.run(pdf.extract_text(_pdf(4)))
+
+
+@pytest.mark.parametrize("pages_per_task", [1, 3, 8])
+def test_parallel_chunks_match_a_sequential_extraction(monkeypatch, pages_per_task):
+    data = _pdf(7)
+    n_pages, sequential = pdf._extract_pages(data, 0, 7, pdf.MAX_PDF_PAGES)
+    assert n_pages == 7
+    monkeypatch.setattr(pdf, "PAGES_PER_TASK", pages_per_task)
+    assert asyncio.run(pdf.extract_text(data)) == sequential
+    assert [f"Page {i}" in sequential for i in range(7)] == [True] * 7
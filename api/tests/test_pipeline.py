@@ -0,0 +1,61 @@
+import random
+import asyncio
+from datetime import datetime
+
+from app import cv_worker, db, metrics, pipeline
+from bench.corpus import make_cv_pdf
+
+PDF = make_cv_pdf(0, random.Random(0))
+
+
+def test_worker_retry_after_saved_reuses_candidate(mongo, fake_llm, monkeypatch):
+    job_id = db.enqueue_cv_job(PDF, "Jane Doe", "jane.pdf")
+    get_matches = pipeline.get_matches
+    calls = []
+
+    async def flaky_matches(*args, **kwargs):
+        calls.append(args[0])
+        if len(calls) == 1:
+            raise RuntimeError("ranking unavailable")
+        return await get_matches(*args, **kwargs)
+
+    monkeypatch.setattr(pipeline, "get_matches", flaky_matches)
+    retries = metrics.CV_JOBS.labels("retry")._value.get()
+    assert asyncio.run(cv_worker.process_one("w1"))
+    job = db.load_cv_job(job_id)
+    assert job["status"] == "queued" and "saved" in job["stages"]
+    assert metrics.CV_JOBS.labels("retry")._value.get() == retries + 1
+
+    mongo.cv_jobs.update_one({"_id": job["_id"]}, {"$set": {"available_at": datetime.utcnow()}})
+    assert asyncio.run(cv_worker.process_one("w1"))
+    job = db.load_cv_job(job_id)
+    assert job["status"] == "done"
+    assert mongo.candidates.count_documents({}) == 1
+    assert calls[0] == calls[1] == job["result"]["candidate_id"]
+
+
+def _stream(data):
+    async def collect():
+        return [item async for item in pipeline.stream_cv_pipeline(data, "Jane Doe")]
+    return asyncio.run(collect())
+
+
+def test_stream_runs_the_pipeline_stages(mongo, fake_llm):
+    events = _stream(PDF)
+    names = [event for event, _ in events]
+    assert names[-1] == "matches" and "saved" not in names
+    assert names.index("extracted") < names.index("candidate") < names.index("matches")
+    candidate = dict(events)["candidate"]
+    assert dict(events)["matches"]["candidate_id"] == candidate["candidate_id"]
+    assert dict(events)["matches"]["jobs_version"] is not None
+    assert mongo.candidates.count_documents({}) == 1
+
+
+def test_stream_error_is_the_last_event(mongo, fake_llm, monkeypatch):
+    async def failing_matches(*args, **kwargs):
+        raise RuntimeError("ranking unavailable")
+
+    monkeypatch.setattr(pipeline, "get_matches", failing_matches)
+    events = _stream(PDF)
+    assert [event for event, _ in events][-2:] == ["candidate", "error"]
+    assert events[-1][1] == {"detail": "ranking unavailable"}
@@ -0,0 +1,32 @@
+import asyncio
+
+from app.llm.matcher_openrouter import match_candidate_to_jobs, rank_jobs_sharded
+from app.matching import normalize_candidate
+
+CANDIDATE = normalize_candidate({"full_name": "Jane Doe", "skills_detected": ["Python"], "summary": "Developer"})
+JOBS = [{"_id": f"j{i}", "title": f"Python Developer {i}", "description_text": "Python APIs."} for i in range(12)]
+
+
+def test_single_mode_honours_top_k(fake_llm):
+    matches = asyncio.run(match_candidate_to_jobs(CANDIDATE, JOBS, top_k=8))
+    assert len(matches) == 8
+    assert all(m["job_id"] == f"j{m['job_index'] - 1}" for m in matches)
+
+
+def test_single_mode_unparsable_answer(fake_llm):
+    fake_llm.malformed_rate = 1.0
+    assert asyncio.run(match_candidate_to_jobs(CANDIDATE, JOBS)) is None
+
+
+def test_sharded_partial_and_total_failure(fake_llm):
+    shards = []
+
+    async def on_shard(matches):
+        shards.append(matches)
+
+    matches = asyncio.run(rank_jobs_sharded(CANDIDATE, JOBS, top_k=7, shard_size=5, on_shard=on_shard))
+    assert len(matches) == 7 and len(shards) == 3
+    assert [m["score"] for m in matches] == sorted((m["score"] for m in matches), reverse=True)
+
+    fake_llm.malformed_rate = 1.0
+    assert asyncio.run(rank_jobs_sharded(CANDIDATE, JOBS, shard_size=5, retries=0)) is None
@@ -0,0 +1,72 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.retrieval import HashedBM25Index
+from app.skill_index import NICE_WEIGHT, SkillIndex
+from app.skills import TAXONOMY
+
+VOCAB = sorted(TAXONOMY)
+
+
+def _brute_force(jobs, skills, top_k, min_row=0):
+    """Reference ranking: every live row scored in Python."""
+    wanted = {s.lower() for s in skills}
+    scored = []
+    for row, (doc_id, required, nice) in enumerate(jobs):
+        if row < min_row or doc_id is None:
+            continue
+        required = {s.lower() for s in required}
+        nice = {s.lower() for s in nice} - required
+        matched = len(required & wanted) + NICE_WEIGHT * len(nice & wanted)
+        total = (len(required) + NICE_WEIGHT * len(nice)) or 1.0
+        if matched:
+            scored.append((-(matched / total), -matched, row, doc_id))
+    return [doc_id for _, _, _, doc_id in sorted(scored)[:top_k]]
+
+
+@pytest.mark.parametrize("top_k,min_row", [(1, 0), (10, 0), (25, 700), (5000, 0)])
+def test_search_matches_brute_force(top_k, min_row):
+    rng = random.Random(top_k)
+    index, jobs = SkillIndex(), []
+    weights = [1.0 / (i + 1) for i in range(len(VOCAB))]
+    for i in range(3000):
+        skills = rng.choices(VOCAB, weights=weights, k=rng.randint(0, 8))
+        jobs.append((i, skills[:4], skills[4:]))
+        index.add(i, skills[:4], skills[4:])
+    for _ in range(20):
+        query = rng.sample(VOCAB, 6)
+        hits = index.search(query, top_k=top_k, min_row=min_row)
+        assert [doc_id for doc_id, _, _ in hits] == _brute_force(jobs, query, top_k, min_row)
+
+
+def test_skill_index_compacts_replaced_rows():
+    index = SkillIndex(compact_ratio=0.25)
+    for i in range(100):
+        index.add(i, ["Python"] if i % 2 else ["Java"])
+    for _ in range(3):
+        for i in range(100):
+            index.add(i, ["Java"] if i % 2 else ["Python"])
+    assert len(index) == 100
+    # 300 replacements, never more than a quarter of the rows retired
+    assert len(index._retired) <= 0.25 * len(index.doc_ids) and len(index.doc_ids) <= 134
+    assert {doc_id for doc_id, _, _ in index.search(["Java"], top_k=100)} == set(range(1, 100, 2))
+
+
+def test_bm25_compaction_recomputes_statistics():
+    index = HashedBM25Index(compact_ratio=0.25)
+    for i in range(50):
+        index.add(i, "kotlin developer")
+    for i in range(50):
+        index.add(i, "scala developer")
+        index.search("scala")
+    assert len(index._retired) <= 0.25 * len(index.doc_ids) and len(index.doc_ids) <= 67
+    assert index.search("kotlin") == []
+    fresh = HashedBM25Index()
+    for i in range(50):
+        fresh.add(i, "scala developer")
+    expected = fresh.search("scala developer", top_n=3)
+    index._compact()
+    assert np.array_equal(index._df, fresh._df)
+    assert index.search("scala developer", top_n=3) == pytest.approx(expected)
@@ -0,0 +1,47 @@
+import pytest
+
+from app.skills import canonicalize_skills, extract_skills
+
+PROSE = (
+    "Sales Manager\n"
+    "You will excel at closing deals, react quickly to customer feedback and be the central node "
+    "between teams. Swift decision making. Rust belt region. 50 ml samples."
+)
+
+
+def test_common_words_are_not_skills():
+    assert extract_skills(PROSE) == ([], [])
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Stack: Python, React, Node, Excel", ["Excel", "Node.js", "Python", "React"]),
+    ("Experience with React and TypeScript required.", ["React", "TypeScript"]),
+    ("Compétences : React / Node.js / ML", ["Machine Learning", "Node.js", "React"]),
+    ("Maîtrise d'Excel et SAP", ["Excel", "SAP"]),
+    ("Skills: Rust", ["Rust"]),
+    ("iOS developer (Swift, SwiftUI)", ["Swift"]),
+    ("Excel in Python", ["Python"]),
+    ("You will react to incidents. Python developer.", ["Python"]),
+])
+def test_ambiguous_skills_in_context(text, expected):
+    assert extract_skills(text)[0] == expected
+
+
+def test_nice_to_have_split():
+    required, nice = extract_skills("Python and SQL required.\nNice to have: Swift, Kotlin")
+    assert required == ["Python", "SQL"]
+    assert nice == ["Kotlin", "Swift"]
+
+
+def test_nice_lines_inside_a_paragraph():
+    # "; " and ". " end a line too; "plus de" / "plusieurs" are not markers
+    text = "Python; Docker serait un plus. Plus de 5 ans sur Kafka. Bonus : Airflow, React. Plusieurs projets Spark"
+    required, nice = extract_skills(text)
+    assert required == ["Kafka", "Python", "Spark"]
+    assert nice == ["Airflow", "Docker", "React"]
+
+
+def test_canonicalize_skill_lists():
+    assert canonicalize_skills(["react", "React hooks", "node", "excel", "k8s", "Cobol"]) == [
+        "React", "Node.js", "Excel", "Kubernetes", "Cobol",
+    ]
@@ -0,0 +1,52 @@
+import io
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main, pdf
+
+
+@pytest.fixture
+def client(mongo):
+    return TestClient(main.app)
+
+
+def _zip(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+    return buf.getvalue()
+
+
+def test_batch_refuses_oversized_zip(client, monkeypatch):
+    monkeypatch.setattr(main, "MAX_ZIP_BYTES", 100)
+    data = _zip([("a.pdf", b"%PDF" + bytes(range(256)) * 4)])
+    response = client.post("/upload_cv/batch", files=[("files", ("cvs.zip", data, "application/zip"))])
+    assert response.status_code == 413
+
+
+def test_batch_refuses_zip_bomb(client, monkeypatch):
+    monkeypatch.setattr(main, "MAX_BATCH_BYTES", 10_000)
+    data = _zip([(f"{i}.pdf", b"\0" * 4_000) for i in range(5)])
+    assert len(data) < 1_000
+    response = client.post("/upload_cv/batch", files=[("files", ("cvs.zip", data, "application/zip"))])
+    assert response.status_code == 413
+    assert "decompress" in response.json()["detail"]
+
+
+def test_batch_refuses_too_many_zip_entries(client, monkeypatch):
+    monkeypatch.setattr(pdf, "MAX_ZIP_MEMBERS", 3)
+    data = _zip([(f"{i}.txt", b"x") for i in range(4)])
+    response = client.post("/upload_cv/batch", files=[("files", ("cvs.zip", data, "application/zip"))])
+    assert response.status_code == 413
+
+
+def test_batch_reads_pdfs_up_to_the_limit(client, monkeypatch):
+    monkeypatch.setattr(main, "MAX_PDF_BYTES", 10)
+    monkeypatch.setattr(main, "MAX_BATCH_BYTES", 25)
+    small = [("files", (f"{i}.pdf", b"%PDF" + b"x" * 100, "application/pdf")) for i in range(2)]
+    assert client.post("/upload_cv/batch", files=small).status_code == 200
+    many = [("files", (f"{i}.pdf", b"%PDF" + b"x" * 100, "application/pdf")) for i in range(3)]
+    assert client.post("/upload_cv/batch", files=many).status_code == 413
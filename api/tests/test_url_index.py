@@ -0,0 +1,60 @@
+import json
+
+import url_index
+
+DESCRIPTION = "Build and run batch and streaming pipelines on Spark and Airflow, with a focus on data quality."
+
+
+def _write_jsonl(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(row if isinstance(row, str) else json.dumps(row) + "\n")
+
+
+def test_insert_and_lookup(tmp_path):
+    index = url_index.UrlIndex(str(tmp_path / "jobs.urls.sqlite"))
+    urls = [f"https://jobs/{i}" for i in range(2 * url_index.CHUNK + 7)]
+    index.add_many(urls)
+    # more probes than sqlite parameters per query: looked up in chunks
+    probe = urls[::2] + [f"https://other/{i}" for i in range(url_index.CHUNK)]
+    assert index.contains_many(probe) == set(urls[::2])
+    assert index.contains_many([]) == set()
+    assert len(index) == len(urls)
+
+
+def test_duplicates_are_stored_once_and_persist(tmp_path):
+    path = str(tmp_path / "jobs.urls.sqlite")
+    index = url_index.UrlIndex(path)
+    index.add_many(["https://jobs/1", "https://jobs/2", "https://jobs/1"])
+    index.add_many(["https://jobs/2"])
+    index.commit()
+    index.close()
+
+    index = url_index.UrlIndex(path)
+    assert len(index) == 2
+    assert index.contains_many({"https://jobs/1", "https://jobs/3"}) == {"https://jobs/1"}
+
+
+def test_open_index_rebuilds_from_history_once(tmp_path):
+    jsonl = str(tmp_path / "jobspy_all.jsonl")
+    _write_jsonl(jsonl, [
+        {"job_url": "https://jobs/1", "title": "Data Engineer", "description": DESCRIPTION},
+        {"job_url": "https://jobs/1", "title": "Data Engineer", "description": DESCRIPTION},
+        "not json\n",
+        {"title": "no url"},
+        {"job_url": "https://jobs/2", "title": "Data Engineer", "description": DESCRIPTION},
+    ])
+    index = url_index.open_index(jsonl)
+    assert index.path == str(tmp_path / "jobspy_all.urls.sqlite")
+    assert len(index) == 2
+    # the repost at another url was clustered with the first offer during the rebuild
+    assert index.assign_cluster("https://jobs/2", {})[0] == "https://jobs/1"
+    index.close()
+
+    # an existing index is opened as is: history is not scanned again
+    _write_jsonl(jsonl, [{"job_url": "https://jobs/3"}])
+    index = url_index.open_index(jsonl)
+    assert len(index) == 2
+    assert index.rebuild(jsonl) == 1
+    assert index.contains_many({"https://jobs/1", "https://jobs/3"}) == {"https://jobs/3"}
+    index.close()
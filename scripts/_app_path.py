@@ -0,0 +1,17 @@
+"""
+Rend le package `app` (api/app) importable depuis les scripts :
+- en local : <repo>/api/app
+- conteneur api : /app/app (scripts montés dans /app/scripts)
+- conteneurs Airflow : /workspace/app (monté par docker-compose)
+"""
+import os
+import sys
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+for _root in (os.path.join(_HERE, "..", "api"), os.path.join(_HERE, "..")):
+    _root = os.path.abspath(_root)
+    if os.path.isfile(os.path.join(_root, "app", "skills.py")):
+        if _root not in sys.path:
+            sys.path.append(_root)
+        break
@@ -1,32 +1,24 @@
-import os, argparse, json
+import os, argparse, json, time, shutil, hashlib, threading
+from collections import defaultdict
 from datetime import date
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 from jobspy import scrape_jobs
 
+from url_index import open_index, near_dup
+
 DATA_LAKE = os.environ.get("DATA_LAKE_ROOT", "./ops/datalake")
 RAW_DIR = os.path.join(DATA_LAKE, "raw", "jobs")
+RUNS_DIR = os.path.join(RAW_DIR, "_runs")
+PARQUET_DIR = os.path.join(RAW_DIR, "parquet")
 os.makedirs(RAW_DIR, exist_ok=True)
 
 def _csv(s: str):
     parts = [t for t in (s or "").split(",")]
     return [p.strip() for p in parts if p is not None]
 
-def _existing_urls(jsonl_path: str) -> set:
-    urls = set()
-    if not os.path.isfile(jsonl_path):
-        return urls
-    with open(jsonl_path, "r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                u = json.loads(line).get("job_url")
-                if u:
-                    urls.add(u)
-            except Exception:
-                continue
-    return urls
-
-def _append_jsonl(jsonl_path: str, df: pd.DataFrame):
-    with open(jsonl_path, "a", encoding="utf-8") as f:
+def _append_jsonl(jsonl_path: str, df: pd.DataFrame, mode: str = "a"):
+    with open(jsonl_path, mode, encoding="utf-8") as f:
         for rec in df.to_dict(orient="records"):
             # Convert non-serializable objects (dates, timestamps) to strings
             for k, v in rec.items():
@@ -35,6 +27,241 @@ def _append_jsonl(jsonl_path: str, df: pd.DataFrame):
             f.write(json.dumps(rec, ensure_ascii=False) + "\n")
 
 
+class JsonlSink:
+    """Appends merged rows to the single JSON Lines file."""
+
+    def __init__(self, path: str, append: bool):
+        self.path = path
+        self.f = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, line: str, rec: dict):
+        self.f.write(line)
+
+    def commit(self):
+        """Make the rows written so far durable."""
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def close(self):
+        self.commit()
+        self.f.close()
+
+
+class ParquetSink:
+    """
+    Lands merged rows as zstd-compressed Parquet, partitioned by posting date
+    (run date when unknown) and scraped country:
+    parquet/date=YYYY-MM-DD/country=<c>/part-<run_id>-<n>.parquet
+
+    One ParquetWriter per partition; rows are buffered per partition and
+    written as a row group every `row_group_rows`, so memory stays bounded
+    by partitions × row_group_rows instead of the whole merge.
+    """
+
+    def __init__(self, root: str, run_id: str, row_group_rows: int = 5000):
+        self.root = root
+        self.run_id = run_id
+        self.row_group_rows = max(row_group_rows, 1)
+        self.run_date = date.today().isoformat()
+        self.buffers = defaultdict(list)
+        self.writers = {}  # (day, country) -> (writer, path)
+        self.rows = 0
+        self.partitions = set()
+
+    def write(self, line: str, rec: dict):
+        posted = str(rec.get("date_posted") or "")[:10]
+        day = posted if len(posted) == 10 and posted[4] == "-" else self.run_date
+        part = (day, rec.get("search_country") or "unknown")
+        self.buffers[part].append(rec)
+        if len(self.buffers[part]) >= self.row_group_rows:
+            self._write_group(part)
+
+    def _open(self, part):
+        day, country = part
+        part_dir = os.path.join(self.root, f"date={day}", f"country={country}")
+        os.makedirs(part_dir, exist_ok=True)
+        n = 0
+        while any(os.path.exists(os.path.join(part_dir, f"part-{self.run_id}-{n}.parquet{ext}")) for ext in ("", ".tmp")):
+            n += 1  # resumed run: never overwrite an earlier merge
+        return os.path.join(part_dir, f"part-{self.run_id}-{n}.parquet")
+
+    def _write_group(self, part):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        recs = self.buffers.pop(part, None)
+        if not recs:
+            return
+        writer, path = self.writers.get(part, (None, None))
+        table = None
+        if writer is not None:
+            try:
+                # later row groups follow the schema of the first one (missing columns → null)
+                table = pa.Table.from_pylist(recs, schema=writer.schema)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+                # a column changed type: finish this file, the rows go to a new one
+                self._finish(part)
+                writer = None
+        if writer is None:
+            table = pa.Table.from_pylist(recs)
+            # all-null columns of the first group would reject later values
+            schema = pa.schema([
+                pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in table.schema
+            ])
+            if "dup_cluster" not in schema.names:
+                schema = schema.append(pa.field("dup_cluster", pa.string()))
+            table = pa.Table.from_pylist(recs, schema=schema)
+            path = self._open(part)
+            writer = pq.ParquetWriter(path + ".tmp", schema, compression="zstd")
+            self.writers[part] = (writer, path)
+        writer.write_table(table)
+        self.rows += len(recs)
+        self.partitions.add(part)
+
+    def _finish(self, part):
+        writer, path = self.writers.pop(part)
+        writer.close()
+        os.replace(path + ".tmp", path)
+
+    def commit(self):
+        """Write the buffered rows and publish the open part files (later rows go to new parts)."""
+        for part in list(self.buffers):
+            self._write_group(part)
+        for part in list(self.writers):
+            self._finish(part)
+
+    def close(self):
+        self.commit()
+        print(f"[PARQUET] {self.rows} rows in {len(self.partitions)} partitions → {self.root}")
+
+
+class HostRateLimiter:
+    """
+    Thread-safe token bucket per host: `rate` acquisitions/s, bursts up to
+    `burst`. The collector acquires once per cell (scrape_jobs paginates
+    inside one call), so the rate bounds cells started per host.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, host: str):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                tokens, updated = self._buckets.get(host, (self.burst, time.monotonic()))
+                now = time.monotonic()
+                tokens = min(self.burst, tokens + (now - updated) * self.rate)
+                if tokens >= 1:
+                    self._buckets[host] = (tokens - 1, now)
+                    return
+                self._buckets[host] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            time.sleep(wait)
+
+
+class RunManifest:
+    """Progress of one collection run: completed cells survive a crash."""
+
+    def __init__(self, run_dir: str):
+        self.path = os.path.join(run_dir, "manifest.json")
+        self._lock = threading.Lock()
+        self.data = {"cells": {}}
+        if os.path.isfile(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+
+    def is_done(self, key: str) -> bool:
+        return key in self.data["cells"]
+
+    def unmerged(self):
+        return [k for k, c in self.data["cells"].items() if not c.get("merged")]
+
+    def mark(self, key: str, **info):
+        with self._lock:
+            self.data["cells"][key] = {**info, "merged": False}
+            self._save()
+
+    def mark_merged(self, keys):
+        with self._lock:
+            for key in keys:
+                self.data["cells"][key]["merged"] = True
+            self._save()
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+
+def prune_runs(runs_dir: str, keep_days: float, current: str = None) -> list:
+    """
+    Remove the run directories (manifest + leftover cells) not modified for
+    `keep_days` days: merged runs, or attempts nobody resumed. Returns their ids.
+    """
+    if keep_days <= 0 or not os.path.isdir(runs_dir):
+        return []
+    cutoff = time.time() - keep_days * 86400
+    removed = []
+    for run_id in sorted(os.listdir(runs_dir)):
+        path = os.path.join(runs_dir, run_id)
+        if run_id == current or not os.path.isdir(path):
+            continue
+        manifest = os.path.join(path, "manifest.json")
+        if os.path.getmtime(manifest if os.path.isfile(manifest) else path) < cutoff:
+            shutil.rmtree(path)
+            removed.append(run_id)
+    return removed
+
+
+def _cell_key(q: str, loc: str, country: str) -> str:
+    return hashlib.sha1(f"{q}|{loc}|{country}".encode("utf-8")).hexdigest()[:16]
+
+
+def _scrape_cell(q, loc, country, args, per_site, limiter, cells_dir, manifest):
+    """Scrape one (query, location, country) cell and flush it to disk right away."""
+    key = _cell_key(q, loc, country)
+    label = f"'{q or '(all)'}' @ {loc} ({country})"
+    limiter.acquire(f"indeed:{country}")  # one token per cell: its pages are fetched inside scrape_jobs
+    df = scrape_jobs(
+        site_name=["indeed"],
+        search_term=q,
+        location=loc,
+        results_wanted=per_site,
+        hours_old=args.days * 24,
+        country_indeed=country,
+        description_format="markdown",  # include job descriptions
+    )
+    if df is None or df.empty:
+        manifest.mark(key, label=label, rows=0)
+        print(f"[WARN] 0 rows for {label}")
+        return 0
+    df["search_country"] = country
+
+    cell_path = os.path.join(cells_dir, f"{key}.jsonl")
+    # "w": a .tmp left by a crashed attempt of this cell must not be appended to
+    _append_jsonl(cell_path + ".tmp", df, mode="w")
+    os.replace(cell_path + ".tmp", cell_path)
+    manifest.mark(key, label=label, rows=len(df))
+    print(f"[OK] {len(df)} rows for {label}")
+    return len(df)
+
+
+def _iter_cell_records(cells_dir: str, keys):
+    for key in sorted(keys):
+        path = os.path.join(cells_dir, f"{key}.jsonl")
+        if not os.path.isfile(path):
+            continue  # empty cell
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                yield line, json.loads(line)
+
+
 def main():
     p = argparse.ArgumentParser("JobSpy Indeed collector (24h, append, dedup)")
     p.add_argument("--queries", default=(
@@ -49,6 +276,20 @@ def main():
     p.add_argument("--days", type=int, default=1)
     p.add_argument("--outfile", default=f"jobspy_all.jsonl")
     p.add_argument("--append", type=int, default=1)
+    p.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl",
+                   help="jsonl: append to --outfile; parquet: date/country partitions under raw/jobs/parquet")
+    p.add_argument("--row-group-rows", type=int, default=5000, help="Parquet: rows per row group and partition")
+    p.add_argument("--commit-rows", type=int, default=None,
+                   help="Merge rows per sink + url index commit (default 1000 jsonl, 50000 parquet)")
+    p.add_argument("--workers", type=int, default=4, help="Parallel scrape cells")
+    p.add_argument("--cell-rate", "--rate", dest="cell_rate", type=float, default=0.5,
+                   help="Max cells started/s per host (0 = unlimited); each cell pages through up to --pages requests")
+    p.add_argument("--run-id", default=None, help="Defaults to today's date + grid hash")
+    p.add_argument("--resume", type=int, default=1, help="Skip cells completed by a previous attempt of this run")
+    p.add_argument("--keep-runs-days", type=float, default=14,
+                   help="Remove _runs/<run_id> dirs untouched for this many days (0: keep all)")
+    p.add_argument("--near-dup", choices=["flag", "drop", "off"], default="flag",
+                   help="Reposts of an already-collected offer (MinHash/LSH): annotate dup_cluster, skip, or ignore")
     args = p.parse_args()
 
     queries   = _csv(args.queries)
@@ -57,63 +298,131 @@ def main():
     per_site  = min(50 * args.pages, 1000)
     out_path  = os.path.join(RAW_DIR, args.outfile)
 
+    grid = [(q, loc, country) for q in queries for loc in locations for country in countries]
+    grid_hash = hashlib.sha1(json.dumps([grid, per_site, args.days, args.outfile]).encode("utf-8")).hexdigest()[:8]
+    run_id = args.run_id or f"{date.today().isoformat()}_{grid_hash}"
+    run_dir = os.path.join(RUNS_DIR, run_id)
+    cells_dir = os.path.join(run_dir, "cells")
+    if not args.resume and os.path.isdir(run_dir):
+        shutil.rmtree(run_dir)
+    os.makedirs(cells_dir, exist_ok=True)
+    removed = prune_runs(RUNS_DIR, args.keep_runs_days, current=run_id)
+    if removed:
+        print(f"[INFO] Removed {len(removed)} runs older than {args.keep_runs_days} days: {', '.join(removed)}")
+
     print(f"[INFO] Output file: {out_path}")
-    parts = []
-
-    for q in queries:
-        for loc in locations:
-            for country in countries:
-                try:
-                    df = scrape_jobs(
-                        site_name=["indeed"],
-                        search_term=q,
-                        location=loc,
-                        results_wanted=per_site,
-                        hours_old=args.days * 24,
-                        country_indeed=country,
-                        description_format="markdown",  # include job descriptions
-                    )
-                    if df is None or df.empty:
-                        print(f"[WARN] 0 rows for '{q or '(all)'}' @ {loc} ({country})")
-                        continue
-                    parts.append(df)
-                    print(f"[OK] {len(df)} rows for '{q or '(all)'}' @ {loc} ({country})")
-                except Exception as e:
-                    print(f"[ERROR] {e}")
-
-    if not parts:
+    print(f"[INFO] Run: {run_dir} ({len(grid)} cells, {args.workers} workers, {args.cell_rate} cells/s/host)")
+
+    manifest = RunManifest(run_dir)
+    todo = [cell for cell in grid if not manifest.is_done(_cell_key(*cell))]
+    if not todo and not manifest.unmerged():
+        print("[INFO] Run already complete, nothing to do (use --resume 0 to start over).")
+        return
+    if len(todo) < len(grid):
+        print(f"[RESUME] {len(grid) - len(todo)} cells already done, {len(todo)} left")
+
+    limiter = HostRateLimiter(args.cell_rate)
+    with ThreadPoolExecutor(max_workers=max(args.workers, 1)) as pool:
+        futures = {
+            pool.submit(_scrape_cell, q, loc, country, args, per_site, limiter, cells_dir, manifest): (q, loc, country)
+            for q, loc, country in todo
+        }
+        for fut in as_completed(futures):
+            try:
+                fut.result()
+            except Exception as e:
+                # not marked done: retried when the run is resumed
+                print(f"[ERROR] {futures[fut]}: {e}")
+
+    # ---- merge completed cells, streaming (no DataFrame kept in memory) ----
+    keys = manifest.unmerged()
+    total = sum(manifest.data["cells"][k].get("rows", 0) for k in keys)
+    failed = len(grid) - len(manifest.data["cells"])
+    if failed:
+        print(f"[WARN] {failed} cells failed; rerun with the same --run-id to retry them")
+    if not total:
         print("No results.")
+        manifest.mark_merged(keys)
         return
 
-    new_df = pd.concat(parts, ignore_index=True)
-    if "job_url" in new_df.columns:
-        before = len(new_df)
-        new_df = new_df.drop_duplicates(subset=["job_url"])
-        print(f"[BATCH DEDUP] {before} → {len(new_df)} unique")
+    # history dedup against the persistent url index: O(new rows), no history scan
+    index = open_index(out_path)
+    if not args.append and args.format == "jsonl":
+        index.clear()
+    print(f"[HIST DEDUP] {len(index)} urls in index")
 
-    if args.append:
-        seen = _existing_urls(out_path)
-        if seen and "job_url" in new_df.columns:
-            new_df = new_df[~new_df["job_url"].isin(seen)]
-            print(f"[HIST DEDUP] {len(new_df)} new unique rows vs history")
+    if args.format == "parquet":
+        sink = ParquetSink(PARQUET_DIR, run_id, args.row_group_rows)
+    else:
+        sink = JsonlSink(out_path, append=bool(args.append))
 
-        if len(new_df) == 0:
-            print("[APPEND] No new rows to append.")
-            return
+    near_dup_mode = args.near_dup if near_dup is not None else "off"
+    # every parquet commit closes the open part files: bigger chunks, fewer files
+    commit_rows = args.commit_rows or (50000 if args.format == "parquet" else 1000)
+    written = 0
+    near_dups = 0
+    chunk = []
+
+    def flush():
+        nonlocal written, near_dups
+        urls = {rec.get("job_url") for _, rec in chunk if rec.get("job_url")}
+        known = index.contains_many(urls)
+        new_urls = set()
+        for line, rec in chunk:
+            u = rec.get("job_url")
+            if u:
+                if u in known or u in new_urls:
+                    continue
+                new_urls.add(u)
+                if near_dup_mode != "off":
+                    cluster, _ = index.assign_cluster(u, rec)
+                    if cluster != u:
+                        near_dups += 1
+                        if near_dup_mode == "drop":
+                            continue
+                        rec["dup_cluster"] = cluster
+                        line = json.dumps(rec, ensure_ascii=False) + "\n"
+            sink.write(line, rec)
+            written += 1
+        index.add_many(new_urls)
+        chunk.clear()
+
+    def commit():
+        # rows first, then their urls: a resumed merge skips every committed
+        # url, and a crash between the two can repeat a chunk but never lose it
+        sink.commit()
+        index.commit()
+
+    pending = 0
+    for item in _iter_cell_records(cells_dir, keys):
+        chunk.append(item)
+        if len(chunk) >= 1000:
+            pending += len(chunk)
+            flush()
+        if pending >= commit_rows:
+            commit()
+            pending = 0
+    flush()
+    sink.close()
+
+    index.commit()
+    index.close()
+
+    print(f"[BATCH DEDUP] {total} → {written} unique new rows")
+    if near_dup_mode != "off":
+        print(f"[NEAR DUP] {near_dups} reposts of known offers ({'dropped' if near_dup_mode == 'drop' else 'flagged dup_cluster'})")
+    manifest.mark_merged(keys)
+    for key in keys:
+        path = os.path.join(cells_dir, f"{key}.jsonl")
+        if os.path.isfile(path):
+            os.remove(path)
 
-        tmp = out_path + ".tmp"
-        _append_jsonl(tmp, new_df)
-        if not os.path.exists(out_path):
-            os.replace(tmp, out_path)
-        else:
-            with open(out_path, "a", encoding="utf-8") as fout, open(tmp, "r", encoding="utf-8") as fin:
-                for line in fin:
-                    fout.write(line)
-            os.remove(tmp)
-        print(f"[APPEND] +{len(new_df)} rows → {out_path}")
+    if args.format == "parquet":
+        print(f"[WRITE] +{written} rows → {PARQUET_DIR}")
+    elif args.append:
+        print(f"[APPEND] +{written} rows → {out_path}")
     else:
-        new_df.to_json(out_path, orient="records", lines=True, force_ascii=False)
-        print(f"[WRITE] {len(new_df)} rows → {out_path}")
+        print(f"[WRITE] {written} rows → {out_path}")
 
 if __name__ == "__main__":
     main()
@@ -2,15 +2,40 @@ import os
 import glob
 import json
 import math
+import hashlib
+import argparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import _app_path  # noqa: F401  (rend api/app importable)
+try:
+    from app.skills import extract_skills
+except ImportError:
+    extract_skills = None  # l'API extrait alors les compétences à l'ingestion
 
 # ✅ Chemin du Data Lake (injecté via Docker-compose)
 DATA_LAKE = os.environ.get("DATA_LAKE_ROOT", "/workspace/datalake")
 RAW_DIR = os.path.join(DATA_LAKE, "raw", "jobs")
+PARQUET_DIR = os.path.join(RAW_DIR, "parquet")
+
+# ✅ Seules colonnes utilisées par map_row : les seules lues dans le Parquet
+PARQUET_COLUMNS = [
+    "site", "job_url", "title", "company", "location", "is_remote",
+    "description", "job_type", "date_posted", "search_country",
+]
 
 # ✅ API FastAPI interne au Docker-compose
 API = os.environ.get("API_URL", "http://api:8000")
 
+# ✅ Taille des lots envoyés à /jobs/ingest_bulk
+BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", "500"))
+
+# ✅ Checkpoint : offset déjà ingéré + identité de chaque fichier
+STATE_DIR = os.path.join(DATA_LAKE, "state")
+CHECKPOINT_PATH = os.path.join(STATE_DIR, "normalize_checkpoint.json")
+HEAD_BYTES = 4096
+
 def map_row(row):
     """Transforme une ligne brute en format normalisé, robustement."""
 
@@ -24,6 +49,9 @@ def map_row(row):
         loc["city"] = loc_raw.get("city") or None
         loc["country"] = loc_raw.get("country") or None
 
+    if not loc["country"] and isinstance(row.get("search_country"), str):
+        loc["country"] = row["search_country"]
+
     if row.get("is_remote") in [True, "true", "full", "FULL"]:
         loc["remote"] = "full"
 
@@ -38,6 +66,11 @@ def map_row(row):
     def safe(x):
         return x if isinstance(x, str) else ""
 
+    # --- Skills (taxonomie locale, déterministe) ---
+    skills_required, skills_nice = [], []
+    if extract_skills is not None:
+        skills_required, skills_nice = extract_skills(f"{safe(row.get('title'))}\n{desc}")
+
     return {
         "source": safe(row.get("site")) or "jobspy",
         "url": safe(row.get("job_url")),
@@ -46,54 +79,270 @@ def map_row(row):
         "location": loc,
         "contract_type": safe(row.get("job_type")),
         "seniority": None,
-        "skills_required": [],
-        "skills_nice": [],
+        "skills_required": skills_required,
+        "skills_nice": skills_nice,
         "description_text": desc,
         "collected_at": safe(str(row.get("date_posted"))),
     }
 
+def clean_payload(payload):
+    """Remplace les NaN/inf (pandas → JSON) par None, récursivement."""
+    if isinstance(payload, dict):
+        return {k: clean_payload(v) for k, v in payload.items()}
+    if isinstance(payload, list):
+        return [clean_payload(v) for v in payload]
+    if isinstance(payload, float) and (math.isnan(payload) or math.isinf(payload)):
+        return None
+    return payload
+
+
+def make_session():
+    """Session HTTP keep-alive avec pool de connexions et retries."""
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=1, status_forcelist=[502, 503, 504], allowed_methods=["POST"])
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def send_batch(session, batch):
+    """
+    Envoie un lot NDJSON à /jobs/ingest_bulk.
+    Retourne (insérés+maj, erreurs, livré) ; livré=False si le lot n'a pas atteint l'API.
+    """
+    body = "\n".join(json.dumps(p, ensure_ascii=False) for p in batch).encode("utf-8")
+    try:
+        r = session.post(
+            f"{API}/jobs/ingest_bulk",
+            data=body,
+            headers={"Content-Type": "application/x-ndjson"},
+            timeout=120,
+        )
+    except requests.RequestException as e:
+        print(f"[WARN] Lot de {len(batch)} lignes non envoyé ({type(e).__name__}): {e}")
+        return 0, len(batch), False
+
+    if r.status_code != 200:
+        print(f"[WARN] HTTP {r.status_code} pour un lot de {len(batch)} lignes")
+        return 0, len(batch), False
+
+    res = r.json()
+    for err in res.get("errors", [])[:5]:
+        print(f"[WARN] Ligne rejetée ({batch[err['index']].get('title')}): {err['error'][:200]}")
+    errors = len(res.get("errors", []))
+    return len(batch) - errors, errors, True
+
+
+# ============================
+# CHECKPOINT
+# ============================
+def load_checkpoint():
+    if not os.path.isfile(CHECKPOINT_PATH):
+        return {}
+    with open(CHECKPOINT_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(checkpoint):
+    """Écriture atomique (tmp + rename) pour survivre à un crash."""
+    os.makedirs(STATE_DIR, exist_ok=True)
+    tmp = CHECKPOINT_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp, CHECKPOINT_PATH)
+
+
+def head_hash(fp, length):
+    with open(fp, "rb") as f:
+        return hashlib.sha1(f.read(length)).hexdigest()
+
+
+def file_entry(fp, offset):
+    """Identité du fichier (device/inode/taille/hash de l'entête) à un offset donné."""
+    st = os.stat(fp)
+    head_len = min(HEAD_BYTES, offset)
+    return {
+        "dev": st.st_dev,
+        "inode": st.st_ino,
+        "size": st.st_size,
+        "offset": offset,
+        "head_len": head_len,
+        "head_sha1": head_hash(fp, head_len),
+    }
+
+
+def checkpoint_entry(checkpoint, fp):
+    """
+    Entrée du checkpoint de `fp` : par chemin, sinon par device/inode (fichier
+    renommé par une rotation, repris à son offset au lieu d'être relu en entier).
+    """
+    entry = checkpoint.get(os.path.abspath(fp))
+    st = os.stat(fp)
+    if entry and (entry.get("dev"), entry.get("inode")) == (st.st_dev, st.st_ino):
+        return entry
+    for other in checkpoint.values():
+        if not other.get("parquet") and (other.get("dev"), other.get("inode")) == (st.st_dev, st.st_ino):
+            return other
+    return entry
+
+
+def resume_offset(fp, entry):
+    """
+    Offset de reprise pour `fp`. Repart de 0 si le fichier est nouveau, a été
+    remplacé (inode différent), tronqué (plus petit que l'offset) ou réécrit
+    (entête différente).
+    """
+    if not entry:
+        return 0, "nouveau"
+    st = os.stat(fp)
+    if (st.st_dev, st.st_ino) != (entry["dev"], entry["inode"]):
+        return 0, "rotation"
+    if st.st_size < entry["offset"]:
+        return 0, "troncature"
+    if head_hash(fp, entry["head_len"]) != entry["head_sha1"]:
+        return 0, "réécrit"
+    return entry["offset"], "reprise"
+
+
+# ============================
+# INGESTION
+# ============================
+def ingest_file(session, fp, offset, stats):
+    """
+    Lit `fp` à partir de `offset` (lignes complètes uniquement) et envoie des
+    lots. Retourne l'offset jusqu'où tout a été livré à l'API.
+    """
+    committed = offset
+    batch = []
+
+    def flush(end_offset):
+        ok, ko, delivered = send_batch(session, batch)
+        stats["sent"] += ok
+        stats["skipped"] += ko
+        batch.clear()
+        return end_offset if delivered else None
+
+    with open(fp, "rb") as f:
+        f.seek(offset)
+        position = offset
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # ligne en cours d'écriture : reprise au prochain run
+            position += len(line)
+            try:
+                row = json.loads(line)
+
+                payload = map_row(row)
+                payload = clean_payload(payload)
+                batch.append(payload)
+
+            except Exception as e:
+                stats["skipped"] += 1
+                print(f"[WARN] Ligne ignorée ({type(e).__name__}): {e}")
+
+            if len(batch) >= BATCH_SIZE:
+                done = flush(position)
+                if done is None:
+                    return committed
+                committed = done
+
+    if batch:
+        done = flush(position)
+        if done is None:
+            return committed
+    return position
+
+
+# ============================
+# PARQUET (partitions date=/country=)
+# ============================
+def parquet_files(since=None, countries=None):
+    """Fichiers des partitions retenues : élagage sur le chemin, rien n'est lu."""
+    files = []
+    for day_dir in sorted(glob.glob(os.path.join(PARQUET_DIR, "date=*"))):
+        if since and os.path.basename(day_dir)[len("date="):] < since:
+            continue
+        for country_dir in sorted(glob.glob(os.path.join(day_dir, "country=*"))):
+            if countries and os.path.basename(country_dir)[len("country="):] not in countries:
+                continue
+            files += sorted(glob.glob(os.path.join(country_dir, "*.parquet")))
+    return files
+
+
+def ingest_parquet_file(session, fp, stats):
+    """Envoie un fichier Parquet (colonnes utiles seulement). True si tout a été livré."""
+    import pyarrow.parquet as pq
+
+    names = set(pq.read_schema(fp).names)
+    table = pq.read_table(fp, columns=[c for c in PARQUET_COLUMNS if c in names])
+
+    for record_batch in table.to_batches(max_chunksize=BATCH_SIZE):
+        batch = [clean_payload(map_row(row)) for row in record_batch.to_pylist()]
+        ok, ko, delivered = send_batch(session, batch)
+        stats["sent"] += ok
+        stats["skipped"] += ko
+        if not delivered:
+            return False
+    return True
+
+
 def main():
+    p = argparse.ArgumentParser("JobSpy normalizer (incremental, checkpointed)")
+    p.add_argument("--full-rescan", action="store_true", help="Ignore le checkpoint et relit tout")
+    p.add_argument("--source", choices=["jsonl", "parquet", "all"], default="all")
+    p.add_argument("--since", default=None, help="Parquet : partitions date >= YYYY-MM-DD seulement")
+    p.add_argument("--countries", default="", help="Parquet : partitions country à lire (csv)")
+    args = p.parse_args()
+
     print(f"[INFO] DATA_LAKE = {DATA_LAKE}")
     print(f"[INFO] RAW_DIR = {RAW_DIR}")
     print(f"[INFO] API = {API}")
 
     # ✅ On charge TOUTES les sources possibles
-    files = glob.glob(os.path.join(RAW_DIR, "jobspy_*.jsonl"))
-    files += glob.glob(os.path.join(RAW_DIR, "jobspy_all.jsonl"))
+    files = []
+    if args.source in ("jsonl", "all"):
+        files = glob.glob(os.path.join(RAW_DIR, "jobspy_*.jsonl"))
+        files += glob.glob(os.path.join(RAW_DIR, "jobspy_all.jsonl"))
+        files = sorted(set(files))
 
-    if not files:
-        print("[ERROR] ❌ Aucun fichier JSONL trouvé")
-        return
-
-    print(f"[INFO] Fichiers trouvés : {files}")
-
-    sent = 0
-    skipped = 0
+    countries = [c.strip() for c in args.countries.split(",") if c.strip()]
+    pq_files = parquet_files(args.since, countries) if args.source in ("parquet", "all") else []
 
-    for fp in files:
-        print(f"[INFO] Lecture fichier : {fp}")
+    if not files and not pq_files:
+        print("[ERROR] ❌ Aucun fichier JSONL/Parquet trouvé")
+        return
 
-        with open(fp, "r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    row = json.loads(line)
+    print(f"[INFO] Fichiers trouvés : {files} + {len(pq_files)} fichiers Parquet")
 
-                    payload = map_row(row)
-                    payload = clean_payload(payload)
+    checkpoint = {} if args.full_rescan else load_checkpoint()
+    stats = {"sent": 0, "skipped": 0}
+    session = make_session()
 
-                    r = requests.post(f"{API}/jobs/ingest", json=payload, timeout=30)
+    # Les fichiers Parquet sont immuables : ingérés une fois, puis ignorés
+    for fp in pq_files:
+        key = os.path.abspath(fp)
+        size = os.path.getsize(fp)
+        if checkpoint.get(key, {}).get("size") == size:
+            continue
+        print(f"[INFO] Lecture Parquet : {fp}")
+        if ingest_parquet_file(session, fp, stats):
+            checkpoint[key] = {"parquet": True, "size": size}
+            save_checkpoint(checkpoint)
 
-                    if r.status_code == 200:
-                        sent += 1
-                    else:
-                        skipped += 1
-                        print(f"[WARN] HTTP {r.status_code} pour {payload.get('title')}")
+    # entrées lues avant toute mise à jour : un fichier renommé garde la sienne
+    entries = {fp: checkpoint_entry(checkpoint, fp) for fp in files}
+    for fp in files:
+        key = os.path.abspath(fp)
+        offset, reason = resume_offset(fp, entries[fp])
+        print(f"[INFO] Lecture fichier : {fp} (offset {offset}, {reason})")
 
-                except Exception as e:
-                    skipped += 1
-                    print(f"[WARN] Ligne ignorée ({type(e).__name__}): {e}")
+        end = ingest_file(session, fp, offset, stats)
+        checkpoint[key] = file_entry(fp, end)
+        save_checkpoint(checkpoint)
+        print(f"[INFO] {fp} : {end - offset} octets ingérés")
 
-    print(f"[DONE] ✅ Ingested: {sent} lignes, Skipped: {skipped} lignes")
+    print(f"[DONE] ✅ Ingested: {stats['sent']} lignes, Skipped: {stats['skipped']} lignes")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,183 @@
+"""
+Persistent URL dedup index for the raw jobs lake (sqlite, next to the JSONL),
+plus MinHash/LSH tables clustering near-duplicate offers across urls.
+
+    python url_index.py rebuild [--outfile jobspy_all.jsonl]
+    python url_index.py bench   [--outfile jobspy_all.jsonl] [--sample 5000]
+"""
+import os, argparse, json, time, random, sqlite3
+
+import _app_path  # noqa: F401  (rend api/app importable)
+try:
+    from app import near_dup
+except ImportError:
+    near_dup = None  # pas de clustering near-dup, dédup exacte sur l'url seulement
+
+DATA_LAKE = os.environ.get("DATA_LAKE_ROOT", "./ops/datalake")
+RAW_DIR = os.path.join(DATA_LAKE, "raw", "jobs")
+
+CHUNK = 500  # sqlite host parameters per IN (...) query
+
+
+def index_path(jsonl_path: str) -> str:
+    return os.path.splitext(jsonl_path)[0] + ".urls.sqlite"
+
+
+def scan_urls(jsonl_path: str) -> set:
+    """Baseline: parse the whole JSONL history to collect its urls."""
+    urls = set()
+    if not os.path.isfile(jsonl_path):
+        return urls
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                u = json.loads(line).get("job_url")
+                if u:
+                    urls.add(u)
+            except Exception:
+                continue
+    return urls
+
+
+class UrlIndex:
+    """Exact set of already-collected urls, stored as a sqlite primary key."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY) WITHOUT ROWID")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS minhash (url TEXT PRIMARY KEY, cluster TEXT, sig BLOB) WITHOUT ROWID"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS bands (key INTEGER, url TEXT, PRIMARY KEY (key, url)) WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def contains_many(self, urls) -> set:
+        """Subset of `urls` already in the index: O(len(urls) log N)."""
+        urls = list(urls)
+        found = set()
+        for i in range(0, len(urls), CHUNK):
+            chunk = urls[i:i + CHUNK]
+            q = f"SELECT url FROM urls WHERE url IN ({','.join('?' * len(chunk))})"
+            found.update(r[0] for r in self.conn.execute(q, chunk))
+        return found
+
+    def add_many(self, urls):
+        self.conn.executemany("INSERT OR IGNORE INTO urls (url) VALUES (?)", ((u,) for u in urls))
+
+    def assign_cluster(self, url: str, rec: dict):
+        """
+        (cluster, similarity) of a raw row: the url of the most similar
+        already-collected offer when above near_dup.THRESHOLD, else its own
+        url. Only band candidates are compared; the row is then indexed.
+        """
+        known = self.conn.execute("SELECT cluster FROM minhash WHERE url = ?", (url,)).fetchone()
+        if known:
+            return known[0], 1.0
+
+        job = {"title": rec.get("title"), "description_text": rec.get("description")}
+        sig = near_dup.signature(near_dup.dup_text(job))
+        keys = near_dup.band_keys(sig)
+        q = (
+            "SELECT DISTINCT m.url, m.cluster, m.sig FROM bands b JOIN minhash m ON m.url = b.url "
+            f"WHERE b.key IN ({','.join('?' * len(keys))})"
+        )
+        cluster, best = url, 0.0
+        for other, other_cluster, other_sig in self.conn.execute(q, keys):
+            sim = near_dup.similarity(sig, near_dup.from_bytes(other_sig))
+            if sim >= near_dup.THRESHOLD and sim > best:
+                cluster, best = other_cluster, sim
+
+        self.conn.execute(
+            "INSERT INTO minhash (url, cluster, sig) VALUES (?, ?, ?)", (url, cluster, near_dup.to_bytes(sig))
+        )
+        self.conn.executemany("INSERT OR IGNORE INTO bands (key, url) VALUES (?, ?)", ((k, url) for k in keys))
+        return cluster, best
+
+    def commit(self):
+        self.conn.commit()
+
+    def clear(self):
+        for table in ("urls", "minhash", "bands"):
+            self.conn.execute(f"DELETE FROM {table}")
+        self.conn.commit()
+
+    def rebuild(self, jsonl_path: str) -> int:
+        """Reload the index from the JSONL history (one full scan)."""
+        self.clear()
+        self.add_many(scan_urls(jsonl_path))
+        if near_dup is not None and os.path.isfile(jsonl_path):
+            with open(jsonl_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue
+                    if rec.get("job_url"):
+                        self.assign_cluster(rec["job_url"], rec)
+        self.commit()
+        return len(self)
+
+    def close(self):
+        self.conn.close()
+
+
+def open_index(jsonl_path: str) -> UrlIndex:
+    """Open the index of `jsonl_path`, building it from history the first time."""
+    path = index_path(jsonl_path)
+    fresh = not os.path.isfile(path)
+    index = UrlIndex(path)
+    if fresh and os.path.isfile(jsonl_path):
+        n = index.rebuild(jsonl_path)
+        print(f"[URL INDEX] built from history: {n} urls → {path}")
+    return index
+
+
+def bench(jsonl_path: str, sample: int):
+    """Compare the full-history scan against the index for `sample` new rows."""
+    t0 = time.perf_counter()
+    seen = scan_urls(jsonl_path)
+    probe = random.sample(sorted(seen), min(sample // 2, len(seen)))
+    probe += [f"https://example.invalid/new/{i}" for i in range(sample - len(probe))]
+    dup_scan = sum(1 for u in probe if u in seen)
+    t_scan = time.perf_counter() - t0
+
+    index = open_index(jsonl_path)
+    t0 = time.perf_counter()
+    dup_index = len(index.contains_many(probe))
+    t_index = time.perf_counter() - t0
+    index.close()
+
+    print(f"history urls   : {len(seen)}")
+    print(f"probe rows     : {len(probe)} ({dup_scan} duplicates)")
+    print(f"full scan      : {t_scan * 1000:.1f} ms")
+    print(f"sqlite index   : {t_index * 1000:.1f} ms ({dup_index} duplicates)")
+    if t_index:
+        print(f"speedup        : x{t_scan / t_index:.1f}")
+
+
+def main():
+    p = argparse.ArgumentParser("URL dedup index")
+    p.add_argument("command", choices=["rebuild", "bench"])
+    p.add_argument("--outfile", default="jobspy_all.jsonl")
+    p.add_argument("--sample", type=int, default=5000)
+    args = p.parse_args()
+
+    jsonl_path = os.path.join(RAW_DIR, args.outfile)
+    if args.command == "rebuild":
+        index = UrlIndex(index_path(jsonl_path))
+        print(f"[URL INDEX] rebuilt: {index.rebuild(jsonl_path)} urls → {index.path}")
+        index.close()
+    else:
+        bench(jsonl_path, args.sample)
+
+
+if __name__ == "__main__":
+    main()